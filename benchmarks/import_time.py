@@ -0,0 +1,149 @@
+# benchmarks/import_time.py
+"""
+Benchmark del arranque en frío (tiempo de import) del bot y de main.py.
+
+Lanza `python -X importtime -c "import <módulo>"` varias veces en procesos
+limpios y guarda, por objetivo:
+  - tiempo de pared del proceso (mediana y mínimo)
+  - total acumulado según -X importtime
+  - los módulos con más tiempo acumulado (para ver qué se cuela)
+
+Resultados en benchmarks/results/import_<fecha>_<commit>.json.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --targets bot --runs 10 --top 30
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmarks.reel_render import ROOT, RESULTS_DIR, _git_commit
+
+TARGETS = {
+    "bot": "review.telegram_review",
+    "main": "main",
+}
+
+# import time:       self [us] |  cumulative | imported package
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    rows = []
+    for line in stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if not m:
+            continue
+        self_us, cum_us, indent, name = m.groups()
+        rows.append({
+            "module": name,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cum_us) / 1000,
+            "depth": (len(indent) - 1) // 2,
+        })
+    return rows
+
+
+def run_once(module: str) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    wall = time.perf_counter() - t0
+
+    rows = parse_importtime(proc.stderr)
+    error = None
+    if proc.returncode != 0:
+        error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "exit != 0"
+
+    return {
+        "wall_ms": round(wall * 1000, 1),
+        # Los módulos de nivel superior (depth 0) suman el total del import
+        "import_ms": round(sum(r["cumulative_ms"] for r in rows if r["depth"] == 0), 1),
+        "rows": rows,
+        "error": error,
+    }
+
+
+def bench_target(module: str, runs: int, top: int) -> Dict[str, Any]:
+    results = [run_once(module) for _ in range(runs)]
+    # El último run (caché de disco caliente) para el detalle por módulo
+    last = results[-1]
+    heaviest = sorted(last["rows"], key=lambda r: r["cumulative_ms"], reverse=True)[:top]
+
+    walls = [r["wall_ms"] for r in results]
+    imports = [r["import_ms"] for r in results]
+    return {
+        "module": module,
+        "runs": runs,
+        "wall_ms_median": round(statistics.median(walls), 1),
+        "wall_ms_min": min(walls),
+        "import_ms_median": round(statistics.median(imports), 1),
+        "modules_loaded": len(last["rows"]),
+        "error": last["error"],
+        "heaviest": heaviest,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> Path:
+    ap = argparse.ArgumentParser(description="Benchmark de tiempo de import")
+    ap.add_argument("--targets", default=",".join(TARGETS), help="bot,main")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=20, help="Módulos más lentos a guardar")
+    ap.add_argument("--out", default=None, help="Ruta del JSON de resultados")
+    args = ap.parse_args(argv)
+
+    commit = _git_commit()
+    report: Dict[str, Any] = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "targets": {},
+    }
+
+    for name in [t.strip() for t in args.targets.split(",") if t.strip()]:
+        module = TARGETS.get(name, name)
+        print(f"▶ {name} ({module}) x{args.runs}")
+        res = bench_target(module, args.runs, args.top)
+        report["targets"][name] = res
+        if res["error"]:
+            print(f"   ⚠️ El import falla: {res['error']}")
+        print(
+            f"   wall={res['wall_ms_median']:.0f} ms (min {res['wall_ms_min']:.0f}), "
+            f"import={res['import_ms_median']:.0f} ms, {res['modules_loaded']} módulos"
+        )
+        for row in res["heaviest"][:5]:
+            print(f"     {row['cumulative_ms']:8.1f} ms  {row['module']}")
+
+    if args.out:
+        out_json = Path(args.out)
+    else:
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        out_json = RESULTS_DIR / f"import_{stamp}_{commit or 'nogit'}.json"
+    out_json.parent.mkdir(parents=True, exist_ok=True)
+    with out_json.open("w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"💾 Resultados en {out_json}")
+    return out_json
+
+
+if __name__ == "__main__":
+    main()
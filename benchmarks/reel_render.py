@@ -0,0 +1,308 @@
+# benchmarks/reel_render.py
+"""
+Benchmark del render de reels con fixtures fijos (sin red ni S3).
+
+Renderiza vuelos sintéticos con imágenes de media/images a través de
+vg_new.create_reel_for_flight y vg_old.create_reel_for_flight, cubriendo:
+  - modos de hook (band / pill / sin hook) en la variante new
+  - pill de origen on/off
+  - perfiles de encode (preview / publish)
+  - ejecución serie (un proceso limpio por caso) y paralela (ProcessPool,
+    como el pre-render del bot)
+
+Por caso mide frames/s, pico de RSS y tamaño del MP4, y guarda todo en
+benchmarks/results/<fecha>_<commit>.json para comparar entre commits.
+
+Uso (desde la raíz del repo):
+    python -m benchmarks.reel_render
+    python -m benchmarks.reel_render --duration 2 --profiles preview --mode serial
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource  # no existe en Windows
+except ImportError:
+    resource = None
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+LOGO_PATH = "media/images/EscapGo_circ_logo_transparent.png"
+
+# Vuelos fijos: mismos textos/fechas en cada ejecución
+FIXTURE_FLIGHTS: List[Dict[str, Any]] = [
+    {
+        "origin": "PMI",
+        "destination": "BER",
+        "start_date": "2025-03-14",
+        "end_date": "2025-03-16",
+        "price": 38.0,
+        "discount_pct": 45.0,
+        "category": "weekend",
+        "bg_image_path": "media/images/BER1.jpg",
+        "hook_text": "Berlín por menos de lo que cuesta una cena",
+    },
+    {
+        "origin": "MAD",
+        "destination": "BLQ",
+        "start_date": "2025-04-04",
+        "end_date": "2025-04-07",
+        "price": 61.0,
+        "discount_pct": None,
+        "category": "long_weekend",
+        "bg_image_path": "media/images/BLQ1.jpg",
+        "hook_text": "Bolonia: pasta, torres y 3 días sin prisas",
+    },
+]
+
+HOOK_MODES = ["band", "pill", None]  # None → sin hook
+ENCODE_PROFILES = ["preview", "publish"]
+
+
+# ---------------------------------------------------------------------------
+# Casos
+# ---------------------------------------------------------------------------
+
+def build_cases(profiles: List[str], generators: List[str]) -> List[Dict[str, Any]]:
+    cases = []
+    for fi, flight in enumerate(FIXTURE_FLIGHTS):
+        for profile in profiles:
+            if "new" in generators:
+                for hook_mode in HOOK_MODES:
+                    for pill in (True, False):
+                        cases.append({
+                            "name": (
+                                f"new/f{fi}/{profile}/hook={hook_mode or 'none'}"
+                                f"/pill={'on' if pill else 'off'}"
+                            ),
+                            "generator": "new",
+                            "flight_idx": fi,
+                            "encode_profile": profile,
+                            "hook_mode": hook_mode,
+                            "origin_pill": pill,
+                        })
+            if "old" in generators:
+                cases.append({
+                    "name": f"old/f{fi}/{profile}",
+                    "generator": "old",
+                    "flight_idx": fi,
+                    "encode_profile": profile,
+                    "hook_mode": None,
+                    "origin_pill": False,
+                })
+    return cases
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    """Pico de RSS del proceso actual (ru_maxrss: KB en Linux, bytes en macOS)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_case(case: Dict[str, Any], duration: float, out_dir: str) -> Dict[str, Any]:
+    """
+    Se ejecuta en un proceso hijo. Los imports pesados van aquí dentro para
+    que su coste no cuente en el tiempo de render.
+    """
+    os.chdir(ROOT)
+    import media.video_generator as vg_new
+    import media.old_video_generator as vg_old
+
+    flight = dict(FIXTURE_FLIGHTS[case["flight_idx"]])
+    bg = flight.pop("bg_image_path")
+    hook_text = flight.pop("hook_text")
+    out_mp4 = str(Path(out_dir) / (case["name"].replace("/", "_") + ".mp4"))
+
+    t0 = time.perf_counter()
+    if case["generator"] == "new":
+        vg_new.create_reel_for_flight(
+            flight,
+            out_mp4_path=out_mp4,
+            logo_path=LOGO_PATH,
+            duration=duration,
+            hook_text=hook_text if case["hook_mode"] else None,
+            hook_mode=case["hook_mode"] or "band",
+            force_origin_pill=case["origin_pill"],
+            encode_profile=case["encode_profile"],
+            bg_image_path=bg,
+        )
+    else:
+        vg_old.create_reel_for_flight(
+            flight,
+            out_mp4_path=out_mp4,
+            logo_path=LOGO_PATH,
+            duration=duration,
+            encode_profile=case["encode_profile"],
+            bg_image_path=bg,
+        )
+    wall = time.perf_counter() - t0
+
+    frames = int(round(duration * vg_new.FPS))
+    return {
+        **case,
+        "duration_s": duration,
+        "frames": frames,
+        "wall_s": round(wall, 3),
+        "fps": round(frames / wall, 2) if wall > 0 else None,
+        "peak_rss_bytes": _peak_rss_bytes(),
+        "output_bytes": Path(out_mp4).stat().st_size,
+        "pid": os.getpid(),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Modos de ejecución
+# ---------------------------------------------------------------------------
+
+def run_serial(cases, duration, out_dir) -> List[Dict[str, Any]]:
+    """
+    Un proceso "spawn" nuevo por caso: así el pico de RSS es el del caso
+    y no arrastra memoria de renders anteriores.
+    """
+    results = []
+    ctx = mp.get_context("spawn")
+    for case in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            try:
+                res = pool.submit(run_case, case, duration, out_dir).result()
+            except Exception as e:
+                res = {**case, "error": str(e)}
+        res["mode"] = "serial"
+        _print_result(res)
+        results.append(res)
+    return results
+
+
+def run_parallel(cases, duration, out_dir, workers: int) -> Dict[str, Any]:
+    """
+    Todos los casos en un ProcessPool de `workers` procesos.
+    El pico de RSS por caso es el del worker (puede incluir casos previos).
+    """
+    ctx = mp.get_context("spawn")
+    results = []
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = {pool.submit(run_case, c, duration, out_dir): c for c in cases}
+        for fut in as_completed(futures):
+            case = futures[fut]
+            try:
+                res = fut.result()
+            except Exception as e:
+                res = {**case, "error": str(e)}
+            res["mode"] = f"parallel_{workers}"
+            _print_result(res)
+            results.append(res)
+    wall = time.perf_counter() - t0
+
+    total_frames = sum(r.get("frames", 0) for r in results if "error" not in r)
+    return {
+        "workers": workers,
+        "wall_s": round(wall, 3),
+        "throughput_fps": round(total_frames / wall, 2) if wall > 0 else None,
+        "cases": sorted(results, key=lambda r: r["name"]),
+    }
+
+
+def _print_result(res: Dict[str, Any]) -> None:
+    if "error" in res:
+        print(f"❌ {res['name']}: {res['error']}")
+        return
+    rss = res["peak_rss_bytes"]
+    rss_txt = f"{rss / 2**20:.0f} MB" if rss else "n/d"
+    print(
+        f"   {res['name']:<42} {res['fps']:>6.1f} fps  "
+        f"rss={rss_txt:>7}  mp4={res['output_bytes'] / 1024:.0f} KB"
+    )
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> Path:
+    ap = argparse.ArgumentParser(description="Benchmark del render de reels")
+    ap.add_argument("--duration", type=float, default=6.0, help="Segundos por reel")
+    ap.add_argument("--profiles", default=",".join(ENCODE_PROFILES), help="preview,publish")
+    ap.add_argument("--generators", default="new,old", help="new,old")
+    ap.add_argument("--mode", choices=["serial", "parallel", "both"], default="both")
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--keep-videos", action="store_true", help="No borrar los MP4 generados")
+    ap.add_argument("--out", default=None, help="Ruta del JSON de resultados")
+    args = ap.parse_args(argv)
+
+    profiles = [p.strip() for p in args.profiles.split(",") if p.strip()]
+    generators = [g.strip() for g in args.generators.split(",") if g.strip()]
+    cases = build_cases(profiles, generators)
+    commit = _git_commit()
+
+    print(f"🏁 Benchmark de reels: {len(cases)} casos, {args.duration}s/reel, commit={commit}")
+
+    report: Dict[str, Any] = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "duration_s": args.duration,
+    }
+
+    tmp = None
+    if args.keep_videos:
+        out_dir = ROOT / "benchmarks" / "out"
+        out_dir.mkdir(parents=True, exist_ok=True)
+    else:
+        tmp = tempfile.TemporaryDirectory(prefix="reel_bench_")
+        out_dir = Path(tmp.name)
+
+    try:
+        if args.mode in ("serial", "both"):
+            print("▶ Serie")
+            report["serial"] = run_serial(cases, args.duration, str(out_dir))
+        if args.mode in ("parallel", "both"):
+            print(f"▶ Paralelo ({args.workers} workers)")
+            report["parallel"] = run_parallel(cases, args.duration, str(out_dir), args.workers)
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    if args.out:
+        out_json = Path(args.out)
+    else:
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        out_json = RESULTS_DIR / f"{stamp}_{commit or 'nogit'}.json"
+    out_json.parent.mkdir(parents=True, exist_ok=True)
+    with out_json.open("w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if "parallel" in report:
+        print(f"⚡ Paralelo: {report['parallel']['throughput_fps']} fps agregados")
+    print(f"💾 Resultados en {out_json}")
+    return out_json
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# config/lazy_import.py
+"""
+Importación perezosa de módulos pesados del proyecto.
+
+    vg = lazy_module("media.video_generator")
+
+devuelve el módulo sin ejecutarlo: el código (y MoviePy/NumPy/...) se
+carga la primera vez que se accede a un atributo (vg.create_reel_v4).
+Así el bot y main.py arrancan sin pagar imports que quizá no usen.
+
+Solo para alias de módulo usados como `mod.atributo`; un
+`from x import y` fuerza la carga igualmente.
+
+En Python 3.11 LazyLoader no es thread-safe: si dos hilos hacen el primer
+acceso a la vez, uno puede ver el módulo a medio cargar (AttributeError).
+Los procesos con hilos (bot, main.py) llaman a preload() antes de
+arrancarlos.
+"""
+from __future__ import annotations
+
+import importlib.util
+import sys
+import threading
+from types import ModuleType
+
+_lock = threading.Lock()
+
+
+def lazy_module(name: str) -> ModuleType:
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    with _lock:
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+
+        spec = importlib.util.find_spec(name)
+        if spec is None or spec.loader is None:
+            raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+
+        loader = importlib.util.LazyLoader(spec.loader)
+        spec.loader = loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        loader.exec_module(module)
+
+        # Igual que un import normal: el submódulo queda como atributo del paquete
+        parent, _, child = name.rpartition(".")
+        if parent:
+            setattr(sys.modules[parent], child, module)
+        return module
+
+
+def preload(*modules: ModuleType) -> None:
+    """Fuerza ya, en este hilo, la carga de módulos devueltos por lazy_module."""
+    for module in modules:
+        getattr(module, "__name__")
@@ -1,6 +1,6 @@
 # config/markets.py
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Tuple
 from config.settings import PMI_IG_USER_ID, PMI_PAGE_TOKEN, ES_IG_USER_ID, ES_PAGE_TOKEN
 
 
@@ -19,6 +19,8 @@ class MarketConfig:
     distance_mapping_path: str | None = None  # si lo usas para scoring
     min_discount_pct: float = 40.0
     ab_ratio_new: float = 0.5
+    # proveedores de vuelos activos (claves de flights.providers.PROVIDERS)
+    providers: Tuple[str, ...] = ("ryanair", "kiwi")
 
 
 MARKETS = {
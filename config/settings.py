@@ -56,3 +56,41 @@ PUBLIC_JSON_BASE_URL = os.getenv(
     "PUBLIC_JSON_BASE_URL",
     "https://escapadasgo-public.s3.eu-west-1.amazonaws.com",
 )
+
+# --- Caché de captions (content/caption_cache.py) ---
+# Variantes distintas que se guardan por payload antes de empezar a reutilizarlas
+CAPTION_CACHE_VARIANTS = int(os.getenv("CAPTION_CACHE_VARIANTS", "3"))
+# Días que vive un caption en caché (0 = caché desactivada)
+CAPTION_CACHE_TTL_DAYS = float(os.getenv("CAPTION_CACHE_TTL_DAYS", "14"))
+
+# --- Proveedores de vuelos (flights/providers.py) ---
+# Fallos seguidos que abren el circuito de un proveedor
+PROVIDER_FAILURE_THRESHOLD = int(os.getenv("PROVIDER_FAILURE_THRESHOLD", "3"))
+# Segundos con el circuito abierto antes de la petición de prueba (half-open)
+PROVIDER_RESET_SEC = float(os.getenv("PROVIDER_RESET_SEC", "900"))
+# Ryanair: "pairs" (una llamada ida/vuelta por par) o "legs" (tramos sueltos
+# + join local; usa internals de ryanair-py, si faltan se vuelve a "pairs")
+RYANAIR_FETCH_MODE = os.getenv("RYANAIR_FETCH_MODE", "pairs")
+
+# --- Record/replay (offline/, main.py --record / --offline) ---
+OFFLINE_FIXTURES_DIR = os.getenv("OFFLINE_FIXTURES_DIR", "offline/fixtures")
+# Salidas de los sustitutos locales (S3, Telegram) en modo replay
+OFFLINE_OUT_DIR = os.getenv("OFFLINE_OUT_DIR", "offline/out")
+
+# --- Verificación de precios en vivo (flights/live_check.py) ---
+# Candidatos por categoría que se verifican antes de renderizar
+LIVE_CHECK_TOP_K = int(os.getenv("LIVE_CHECK_TOP_K", "3"))
+LIVE_CHECK_WORKERS = int(os.getenv("LIVE_CHECK_WORKERS", "6"))
+# Vida del resultado de booking/check por booking_token
+LIVE_CHECK_TTL_SEC = float(os.getenv("LIVE_CHECK_TTL_SEC", "900"))
+
+# --- Tarifas retenidas + refresco incremental (flights/fare_store.py) ---
+FARE_STORE_ENABLED = os.getenv("FARE_STORE_ENABLED", "1") not in ("0", "false", "False", "")
+
+# --- Pool de candidatos para review (aggregator.get_top_by_category_scored) ---
+# Alternativas por categoría (destinos distintos) que llegan a "🔁 Otro"
+REVIEW_POOL_PER_CATEGORY = int(os.getenv("REVIEW_POOL_PER_CATEGORY", "4"))
+# Tope total de candidatos por job
+REVIEW_POOL_MAX = int(os.getenv("REVIEW_POOL_MAX", "20"))
+# Candidatos que se pre-renderizan por delante del actual
+PRERENDER_AHEAD = int(os.getenv("PRERENDER_AHEAD", "4"))
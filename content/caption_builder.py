@@ -1,9 +1,12 @@
 import json
 import os
-from openai import OpenAI
+from functools import lru_cache
 from typing import Union
 from datetime import datetime
 from .destinations import get_city
+from . import caption_cache
+import offline
+from offline import services as offline_services
 import re
 
 
@@ -11,7 +14,13 @@ FlightLike = Union[dict, object]
 
 from config.settings import OPENAI_API_KEY  # 👈 nuevo import
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+
+@lru_cache(maxsize=1)
+def _client():
+    # openai tarda en importarse: se crea el cliente en la primera llamada
+    from openai import OpenAI
+
+    return OpenAI(api_key=OPENAI_API_KEY)
 
 
 def _extract_json_object(text: str) -> str:
@@ -135,7 +144,7 @@ Reglas IMPORTANTES:
 
 {json.dumps(payload, ensure_ascii=False)}
 """
-    resp = client.chat.completions.create(
+    resp = _client().chat.completions.create(
         model="gpt-4.1-mini",
         messages=[
             {"role": "system", "content": system_prompt},
@@ -267,12 +276,16 @@ def build_caption_for_flight(
     category_code: str | None = None,
     tone: str = "emocional",
     hashtags_base: list[str] | None = None,
+    use_cache: bool = True,
 ) -> str:
     """
     Capa de alto nivel:
     - toma un Flight o un dict (como el candidate de review)
     - construye el payload
     - genera el caption final (hook + cuerpo) con tus funciones existentes.
+
+    Con use_cache, un payload ya visto reutiliza captions guardados en vez
+    de llamar otra vez al modelo (ver content/caption_cache.py).
     """
 
     if hashtags_base is None:
@@ -334,7 +347,12 @@ def build_caption_for_flight(
         "dates_block": dates_block,
     }
 
-    cj = build_caption_json(payload)
+    if offline.mode() != "live":
+        cj = offline_services.caption_json(payload, build_caption_json)
+    elif use_cache:
+        cj = caption_cache.get_or_generate(payload, build_caption_json)
+    else:
+        cj = build_caption_json(payload)
     # hook = build_hook(payload)
     # caption_text = build_caption_text(cj, hook_override=hook)
     caption_text = build_caption_text(cj, None)
@@ -0,0 +1,144 @@
+# content/caption_cache.py
+"""
+Caché persistente de captions generados por el LLM.
+
+Clave = hash del payload normalizado + CAPTION_PROMPT_VERSION (subir la
+versión al cambiar el prompt invalida todo lo anterior).
+
+Por clave se guardan hasta CAPTION_CACHE_VARIANTS captions distintos:
+mientras no se llega al máximo se sigue pidiendo al modelo (el copy va
+rotando); después se sirve la variante que lleva más tiempo sin usarse.
+Las entradas más antiguas que CAPTION_CACHE_TTL_DAYS se borran.
+
+SQLite (como review/job_store.py) porque lo comparten main.py y el bot.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from config.settings import CAPTION_CACHE_TTL_DAYS, CAPTION_CACHE_VARIANTS
+
+DB_PATH = Path("content/cache/captions.sqlite3")
+
+# Cambiar al modificar el prompt/modelo de build_caption_json
+CAPTION_PROMPT_VERSION = "v1-gpt-4.1-mini"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS captions (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    cache_key   TEXT NOT NULL,
+    caption     TEXT NOT NULL,
+    created_at  REAL NOT NULL,
+    served_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_captions_key ON captions(cache_key, served_at);
+CREATE INDEX IF NOT EXISTS idx_captions_created ON captions(created_at);
+"""
+
+_initialized: set[str] = set()
+
+
+@contextmanager
+def _connect(db_path: Path = DB_PATH):
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        key = str(db_path.resolve())
+        if key not in _initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            _initialized.add(key)
+        yield conn
+    finally:
+        conn.close()
+
+
+def _normalize(value: Any) -> Any:
+    """Quita diferencias que no cambian el caption (espacios, 45.0 vs 45, ...)."""
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in sorted(value.items()) if v not in (None, "")}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else round(value, 2)
+    if isinstance(value, str):
+        return " ".join(value.split()) if "\n" not in value else value.strip()
+    return value
+
+
+def cache_key(payload: Dict[str, Any], version: str = CAPTION_PROMPT_VERSION) -> str:
+    blob = json.dumps(
+        {"v": version, "payload": _normalize(payload)},
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def evict_expired(
+    ttl_days: float = CAPTION_CACHE_TTL_DAYS,
+    now: Optional[float] = None,
+    db_path: Path = DB_PATH,
+) -> int:
+    now = now or time.time()
+    with _connect(db_path) as conn:
+        cur = conn.execute(
+            "DELETE FROM captions WHERE created_at < ?", (now - ttl_days * 86400,)
+        )
+        return cur.rowcount
+
+
+def get_or_generate(
+    payload: Dict[str, Any],
+    generate: Callable[[Dict[str, Any]], Dict[str, Any]],
+    variants: int = CAPTION_CACHE_VARIANTS,
+    ttl_days: float = CAPTION_CACHE_TTL_DAYS,
+    db_path: Path = DB_PATH,
+) -> Dict[str, Any]:
+    """
+    Devuelve el caption (dict JSON) para el payload: generate(payload) si
+    aún faltan variantes para esta clave, o la variante menos usada si no.
+    Si la caché falla, se genera sin caché.
+    """
+    if variants <= 0 or ttl_days <= 0:
+        return generate(payload)
+
+    key = cache_key(payload)
+    now = time.time()
+
+    try:
+        evict_expired(ttl_days, now=now, db_path=db_path)
+        with _connect(db_path) as conn:
+            rows = conn.execute(
+                "SELECT id, caption FROM captions WHERE cache_key = ? ORDER BY served_at ASC",
+                (key,),
+            ).fetchall()
+            if len(rows) >= variants:
+                row = rows[0]
+                conn.execute("UPDATE captions SET served_at = ? WHERE id = ?", (now, row["id"]))
+                print(f"♻️ Caption desde caché ({len(rows)} variantes, key={key[:10]})")
+                return json.loads(row["caption"])
+    except Exception as e:
+        print(f"⚠️ Caché de captions no disponible: {e}")
+        return generate(payload)
+
+    cj = generate(payload)
+
+    try:
+        with _connect(db_path) as conn:
+            conn.execute(
+                "INSERT INTO captions (cache_key, caption, created_at, served_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(cj, ensure_ascii=False), now, now),
+            )
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar el caption en caché: {e}")
+
+    return cj
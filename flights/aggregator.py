@@ -1,15 +1,20 @@
 # flights/aggregator.py
 
-from typing import List, Optional, Tuple
+from typing import Iterable, List, Optional, Set, Tuple
 from datetime import date, timedelta
 
 from flights.base import Flight
-from flights.api_ryanair import RyanairAPI
-from flights.api_kiwi import KiwiAPI
+import flights.providers as providers
+from flights.merge import merge_flights
+import flights.live_check as live_check
+from config.settings import FARE_STORE_ENABLED, LIVE_CHECK_TOP_K
+import flights.fare_store as fare_store
+import offline
 
 from datetime import datetime
 # from flights.base import Flight
 import random
+import heapq
 from typing import Dict, Any, List
 
 from collections import defaultdict
@@ -265,35 +270,211 @@ def generate_weekend_date_pairs(start_date: date, end_date: date) -> List[Tuple[
     return pairs
 
 
-def get_available_flights(start_date: date, end_date: date, origin_iata: str) -> List[Flight]:
+# Vuelos de Kiwi ya pedidos en lote para varios markets (prefetch_kiwi):
+# (origen, inicio, fin) → vuelos. get_available_flights los consume una vez.
+_KIWI_PREFETCH: Dict[Tuple[str, date, date], List[Flight]] = {}
+
+
+def _use_fare_store() -> bool:
+    # record/replay trabajan siempre con la ventana entera
+    return FARE_STORE_ENABLED and offline.mode() == "live"
+
+
+def _record_fetch(
+    name: str,
+    origin: str,
+    pairs: List[Tuple[date, date]],
+    flights: List[Flight],
+    failed: Set[Tuple[date, date]],
+) -> None:
     """
-    Llama a todas las APIs para todos los combos de fechas
-    generados en el rango [start_date, end_date].
+    Guarda en fare_store solo los pares que el proveedor contestó: los
+    fallidos (api.failed_for) conservan sus tarifas retenidas y se vuelven
+    a pedir la próxima vez, en vez de quedar "frescos" y vacíos.
     """
+    answered = [p for p in pairs if p not in failed]
+    if failed:
+        print(f"⚠️ [{name}] {origin}: {len(failed)} pares fallidos, no se guardan")
+    try:
+        fare_store.record_fetch(
+            name, origin, answered,
+            [f for f in flights if fare_store.flight_pair(f) not in failed],
+        )
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar en fare_store ({name} {origin}): {e}")
 
-    apis = [
-        RyanairAPI(origin=origin_iata),
-        KiwiAPI(origin=origin_iata),
-    ]
 
-    all_flights: List[Flight] = []
+def _apply_cooldown(flights: List[Flight], cooldown=None) -> List[Flight]:
+    if cooldown is None:
+        return flights
+    return [f for f in flights if not cooldown.is_recently_published(f)]
 
-    date_pairs = generate_weekend_date_pairs(start_date, end_date)
 
-    for depart_date, return_date in date_pairs:
-        depart_str = depart_date.isoformat()
-        return_str = return_date.isoformat()
+def _load_retained(name: str, origin: str, pairs, cooldown=None) -> List[Flight]:
+    """Tarifas retenidas de fare_store, sin las que están en cooldown."""
+    return _apply_cooldown(fare_store.load_fares(name, origin, pairs), cooldown)
 
-        print(f"🗓  Buscando vuelos {depart_str} → {return_str}...")
 
-        for api in apis:
-            try:
-                flights = api.search(depart_str, return_str)
-                if flights:
-                    all_flights.extend(flights)
-            except Exception as e:
-                print(f"❌ Error consultando {api.__class__.__name__}: {e}")
+def _provider_cooldown(cooldown):
+    """
+    Con fare_store los proveedores no filtran el cooldown: se guarda la
+    respuesta completa (como RecordingFlightAPI) y el cooldown se aplica al
+    devolver/cargar. Si no, una ruta que sale de cooldown seguiría vacía
+    en fare_store hasta que caducara el par.
+    """
+    return None if _use_fare_store() else cooldown
+
+
+def _search_incremental(
+    name: str,
+    api,
+    origin: str,
+    date_pairs: List[Tuple[date, date]],
+    cooldown=None,
+) -> List[Flight]:
+    """
+    Solo pide al proveedor los pares caducados (fare_store.plan_refresh);
+    el resto sale de las tarifas retenidas. Lo pedido se guarda sin filtrar
+    y el cooldown se aplica después.
+    """
+    if not _use_fare_store():
+        return api.search_window(date_pairs)
 
+    stale, fresh = fare_store.plan_refresh(name, origin, date_pairs)
+    flights = _load_retained(name, origin, fresh, cooldown)
+    print(
+        f"🗃  [{name}] {origin}: {len(stale)}/{len(date_pairs)} pares a refrescar, "
+        f"{len(flights)} vuelos retenidos"
+    )
+    if not stale:
+        return flights
+
+    try:
+        fetched = api.search_window(stale)
+    except Exception as e:
+        print(f"❌ Error consultando {api.__class__.__name__}: {e}; se usan las tarifas retenidas")
+        return flights + _load_retained(name, origin, stale, cooldown)
+
+    failed = api.failed_for(origin)
+    _record_fetch(name, origin, stale, fetched, failed)
+    # pares fallidos: lo retenido (merge_flights quita duplicados con lo
+    # poco que hubiera llegado)
+    retained_failed = _load_retained(name, origin, [p for p in stale if p in failed], cooldown)
+    return flights + _apply_cooldown(fetched, cooldown) + retained_failed
+
+
+def prefetch_kiwi(origins: List[str], start_date: date, end_date: date) -> int:
+    """
+    Una sola búsqueda de Kiwi (fly_from con todos los orígenes) para la
+    ventana; el resultado se reparte por origen y queda en caché para el
+    get_available_flights de cada market. Devuelve cuántos vuelos hay.
+    Con fare_store solo se piden los pares caducados en algún origen.
+    Si Kiwi no está disponible (sin key, circuito abierto) no hace nada.
+    """
+    origins = [o.upper() for o in origins if o]
+    if not origins:
+        return 0
+
+    cooldown = ph.get_cooldown_index()
+    api = providers.build_provider("kiwi", origins[0], cooldown=_provider_cooldown(cooldown))
+    if api is None:
+        return 0
+
+    date_pairs = generate_weekend_date_pairs(start_date, end_date)
+    retained: Dict[str, List[Flight]] = {o: [] for o in origins}
+    to_fetch = date_pairs
+
+    if _use_fare_store():
+        stale_union = set()
+        fresh_by_origin = {}
+        for origin in origins:
+            stale, fresh = fare_store.plan_refresh("kiwi", origin, date_pairs)
+            fresh_by_origin[origin] = fresh
+            stale_union.update(stale)
+        to_fetch = [p for p in date_pairs if p in stale_union]
+        for origin, fresh in fresh_by_origin.items():
+            retained[origin] = _load_retained(
+                "kiwi", origin, [p for p in fresh if p not in stale_union], cooldown
+            )
+        print(f"🗃  [kiwi] {len(to_fetch)}/{len(date_pairs)} pares a refrescar para {','.join(origins)}")
+
+    by_origin: Dict[str, List[Flight]] = {}
+    if to_fetch:
+        try:
+            by_origin = api.search_window_multi(origins, to_fetch)
+        except Exception as e:
+            print(f"❌ Error en prefetch de KiwiAPI ({','.join(origins)}): {e}")
+            if not _use_fare_store():
+                return 0
+            by_origin = {o: _load_retained("kiwi", o, to_fetch, cooldown) for o in origins}
+        else:
+            if _use_fare_store():
+                for origin in origins:
+                    failed = api.failed_for(origin)
+                    _record_fetch("kiwi", origin, to_fetch, by_origin.get(origin, []), failed)
+                    by_origin[origin] = _apply_cooldown(by_origin.get(origin, []), cooldown)
+                    if failed:
+                        by_origin[origin] = by_origin.get(origin, []) + _load_retained(
+                            "kiwi", origin, [p for p in to_fetch if p in failed], cooldown
+                        )
+
+    for origin in origins:
+        _KIWI_PREFETCH[(origin, start_date, end_date)] = retained[origin] + by_origin.get(origin, [])
+    return sum(len(_KIWI_PREFETCH[(o, start_date, end_date)]) for o in origins)
+
+
+def get_available_flights(
+    start_date: date,
+    end_date: date,
+    origin_iata: str,
+    provider_names: Optional[Iterable[str]] = None,
+) -> List[Flight]:
+    """
+    Llama a los proveedores activos (provider_names, por defecto
+    providers.DEFAULT_PROVIDERS) para todos los combos de fechas
+    generados en el rango [start_date, end_date].
+    Solo se piden los pares caducados; el resto viene de flights/fare_store.
+    Los proveedores con el circuito abierto o desactivados se saltan (se
+    usan sus tarifas retenidas, si las hay).
+    Si prefetch_kiwi ya trajo este origen/ventana, Kiwi no se vuelve a pedir.
+    """
+    all_flights: List[Flight] = []
+    names = [n.lower() for n in (provider_names or providers.DEFAULT_PROVIDERS)]
+
+    prefetched = _KIWI_PREFETCH.pop((origin_iata.upper(), start_date, end_date), None)
+    if prefetched is not None and "kiwi" in names:
+        print(f"♻️ KiwiAPI: {len(prefetched)} vuelos de {origin_iata} ya pedidos en lote.")
+        all_flights.extend(prefetched)
+        names.remove("kiwi")
+
+    date_pairs = generate_weekend_date_pairs(start_date, end_date)
+    if _use_fare_store():
+        fare_store.prune()
+
+    # Rutas/fechas en cooldown de publicación: sin fare_store los proveedores
+    # no las piden (si pueden filtrar por destino) o las descartan al parsear;
+    # con fare_store se aplica al devolver (ver _provider_cooldown)
+    cooldown = ph.get_cooldown_index()
+
+    # Cada API decide cómo cubrir la ventana (Kiwi: una búsqueda amplia;
+    # el resto: una llamada por par de fechas)
+    built = providers.build_providers(origin_iata, names, cooldown=_provider_cooldown(cooldown))
+    for name, api in built:
+        try:
+            flights = _search_incremental(name, api, origin_iata, date_pairs, cooldown)
+            if flights:
+                all_flights.extend(flights)
+        except Exception as e:
+            print(f"❌ Error consultando {api.__class__.__name__}: {e}")
+
+    if _use_fare_store():
+        for name in set(names) - {n for n, _ in built}:
+            retained = _load_retained(name, origin_iata, date_pairs, cooldown)
+            if retained:
+                print(f"🗃  [{name}] no disponible: {len(retained)} vuelos retenidos")
+                all_flights.extend(retained)
+
+    providers.print_health()
     return all_flights
 
 
@@ -407,6 +588,8 @@ def get_best_flight_in_period(start_date: date, end_date: date, origin_iata) ->
         print("⚠️ No se encontraron vuelos en ninguna API.")
         return None
 
+    flights = merge_flights(flights)
+
     flights_sorted = sorted(flights, key=score_flight, reverse=True)
     best_flight = flights_sorted[0]
 
@@ -422,18 +605,26 @@ def get_best_flight_in_period(start_date: date, end_date: date, origin_iata) ->
     return best_flight
 
 
-def get_flights_in_period(start_date: date, end_date: date, origin_iata) -> List[Flight]:
+def get_flights_in_period(
+    start_date: date,
+    end_date: date,
+    origin_iata,
+    provider_names: Optional[Iterable[str]] = None,
+) -> List[Flight]:
     """
     Devuelve TODOS los vuelos encontrados en el rango [start_date, end_date]
     usando get_available_flights (que ya hace las combinaciones de días relevantes).
+    provider_names: proveedores del market (MarketConfig.providers).
     """
     print(f"🔎 Buscando vuelos entre {start_date} y {end_date}...")
 
-    flights = get_available_flights(start_date, end_date, origin_iata)
+    flights = get_available_flights(start_date, end_date, origin_iata, provider_names)
     if not flights:
         print("⚠️ No se encontraron vuelos en ninguna API.")
         return []
 
+    # Un vuelo por (ruta, horarios, aerolínea) antes de estadísticas y scoring
+    flights = merge_flights(flights)
     annotate_route_price_stats(flights)
 
     print(f"✅ Encontrados {len(flights)} vuelos en total.")
@@ -532,16 +723,58 @@ def get_best_by_category_cheapest(
 
     
 
-def get_best_by_category_scored(
+class _BoundedTopK:
+    """
+    Top-k por score con un min-heap de tamaño k (O(log k) por push) y como
+    mucho un item por destino: si llega uno mejor de un destino que ya está,
+    lo sustituye. A igualdad de score gana el que llegó antes.
+    """
+
+    def __init__(self, k: int):
+        self.k = max(1, k)
+        self.heap: List[tuple] = []              # (score, -seq, item)
+        self.by_dest: Dict[str, tuple] = {}
+
+    def push(self, score: float, seq: int, item: dict) -> None:
+        dest = item["flight"].destination
+        entry = (score, -seq, item)
+
+        current = self.by_dest.get(dest)
+        if current is not None:
+            if entry[:2] <= current[:2]:
+                return
+            # mismo destino y mejor: se cambia en su sitio (k es pequeño)
+            i = next(i for i, e in enumerate(self.heap) if e is current)
+            self.heap[i] = entry
+            heapq.heapify(self.heap)
+        elif len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif entry[:2] > self.heap[0][:2]:
+            evicted = heapq.heapreplace(self.heap, entry)
+            del self.by_dest[evicted[2]["flight"].destination]
+        else:
+            return
+        self.by_dest[dest] = entry
+
+    def ranked(self) -> List[dict]:
+        return [item for _, _, item in sorted(self.heap, key=lambda e: e[:2], reverse=True)]
+
+
+def get_top_by_category_scored(
     flights: List[Flight],
     cooldown_days: int = 14,
     route_cooldown_days: int = 5,
-    min_discount_pct: float = 40.0,  # ← aquí defines el mínimo (30–40%)
-) -> List[dict]:
-
-    best_per_cat: Dict[str, dict] = {}
+    min_discount_pct: float = 40.0,
+    top_k: int = 1,
+) -> Dict[str, List[dict]]:
+    """
+    Pool de candidatos: {categoría: hasta top_k items {"flight", "category",
+    "score"}} de destinos distintos, ordenados de mejor a peor score (a
+    igualdad, el que llegó antes). Una sola pasada, O(n log k).
+    """
+    per_cat: Dict[str, _BoundedTopK] = {}
 
-    for f in flights:
+    for seq, f in enumerate(flights):
         # 0) descartamos vuelos publicados hace poco
         if ph.is_recently_published(f, cooldown_days=cooldown_days, route_cooldown_days=route_cooldown_days):
             continue
@@ -562,15 +795,60 @@ def get_best_by_category_scored(
 
         score = score_flight_basic(f)
 
-        current = best_per_cat.get(code)
-        if current is None or score > current["score"]:
-            best_per_cat[code] = {
-                "flight": f,
-                "category": category,
-                "score": score,
-            }
+        top = per_cat.get(code)
+        if top is None:
+            top = per_cat[code] = _BoundedTopK(top_k)
+        top.push(score, seq, {
+            "flight": f,
+            "category": category,
+            "score": score,
+        })
 
-    return list(best_per_cat.values())
+    return {code: top.ranked() for code, top in per_cat.items()}
+
+
+def get_best_by_category_scored(
+    flights: List[Flight],
+    cooldown_days: int = 14,
+    route_cooldown_days: int = 5,
+    min_discount_pct: float = 40.0,  # ← aquí defines el mínimo (30–40%)
+) -> List[dict]:
+    ranked = get_top_by_category_scored(
+        flights,
+        cooldown_days=cooldown_days,
+        route_cooldown_days=route_cooldown_days,
+        min_discount_pct=min_discount_pct,
+        top_k=1,
+    )
+    return [items[0] for items in ranked.values()]
+
+
+def get_best_by_category_live(
+    flights: List[Flight],
+    cooldown_days: int = 14,
+    route_cooldown_days: int = 5,
+    min_discount_pct: float = 40.0,
+    top_k: int = LIVE_CHECK_TOP_K,
+    pool: Optional[Dict[str, List[dict]]] = None,
+) -> List[dict]:
+    """
+    Como get_best_by_category_scored, pero verifica en vivo los top_k de
+    cada categoría (flights/live_check.py) y se queda con el mejor que sigue
+    disponible, re-preciado si hace falta. Va antes de elegir el main, para
+    no gastar caption + render en tarifas caducadas.
+    pool: resultado de get_top_by_category_scored ya calculado (la
+    clasificación tiene azar: así main y alternativas salen del mismo pool).
+    """
+    if pool is None:
+        pool = get_top_by_category_scored(
+            flights,
+            cooldown_days=cooldown_days,
+            route_cooldown_days=route_cooldown_days,
+            min_discount_pct=min_discount_pct,
+            top_k=top_k,
+        )
+    ranked = {code: items[:top_k] for code, items in pool.items()}
+    return live_check.pick_live_by_category(ranked, min_discount_pct, score_fn=score_flight_basic)
 
 
 
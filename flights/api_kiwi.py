@@ -1,29 +1,38 @@
 # flights/api_kiwi.py
 
 import requests
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import urlencode, quote
 
-from flights.base import Flight, FlightAPI
+from flights.base import Flight, FlightAPI, ProviderError
 # from config.settings import KIWI_API_KEY
 
 from config.settings import KIWI_API_KEY,KIWI_API_BASE 
 
+# Modo ventana (search_window): días de salida por búsqueda, resultados
+# pedidos por búsqueda (máx. de Tequila: 1000) y vuelos que se quedan por
+# par de fechas (lo que devolvía antes cada búsqueda con limit=50)
+WINDOW_CHUNK_DAYS = 31
+WINDOW_LIMIT = 1000
+PAIR_LIMIT = 50
+
 
 class KiwiAPI(FlightAPI):
     """
     Implementación de FlightAPI usando Tequila (Kiwi).
     Usa el patrón search(depart_date, return_date) para encajar
-    con tu agregador de combinaciones de días.
+    con tu agregador de combinaciones de días; con window_mode (por
+    defecto) search_window cubre todos los pares con una búsqueda amplia.
     """
 
-    def __init__(self, origin: str = "PMI", currency: str = "EUR"):
+    def __init__(self, origin: str = "PMI", currency: str = "EUR", window_mode: bool = True):
         if not KIWI_API_KEY:
-            raise ValueError("KIWI_API_KEY no está configurada en .env / settings.")
+            raise ProviderError("KIWI_API_KEY no está configurada en .env / settings.")
 
         self.origin = origin
         self.currency = currency
+        self.window_mode = window_mode
         self.headers = {
             "apikey": KIWI_API_KEY,
             "Content-Type": "application/json",
@@ -63,107 +72,306 @@ class KiwiAPI(FlightAPI):
         }
         return params
 
+    def _request(self, params: dict) -> list:
+        r = requests.get(
+            f"{KIWI_API_BASE}/v2/search",
+            params=params,
+            headers=self.headers,
+            timeout=20,
+        )
+        r.raise_for_status()
+        return r.json().get("data", [])
+
+    def _get(self, params: dict, label: str) -> list:
+        """
+        Búsqueda en Tequila a través del circuit breaker.
+        Los errores se loguean y se propagan: quien llama marca los pares
+        como fallidos (un error no es "no hay vuelos"). ProviderError
+        (circuito abierto) corta además el resto de fechas.
+        """
+        try:
+            return self._call(self._request, params)
+        except ProviderError:
+            raise
+        except Exception as e:
+            print(f"❌ Error en KiwiAPI.search({label}): {e}")
+            raise
+
+    def _item_to_flight(self, item: dict, origin: Optional[str] = None) -> Optional[Flight]:
+        """
+        Convierte un resultado de Tequila en Flight.
+        Solo aceptamos viajes tipo PMI -> X -> PMI
+        (misma ciudad X a la ida y a la vuelta); None si no encaja.
+        origin: aeropuerto de salida esperado (por defecto self.origin).
+        """
+        origin = origin or self.origin
+        price = float(item.get("price", 0.0))
+        route = item.get("route", [])
+        booking_token = item.get("booking_token")
+
+        if not route or price <= 0:
+            return None
+
+        first_leg = route[0]
+        last_leg = route[-1]
+
+        # --- 1) Filtrar solo PMI -> X -> PMI (misma ciudad X) ---
+
+        origin_airport = first_leg.get("flyFrom")          # ej. PMI
+        outbound_city_to = first_leg.get("cityTo")         # ej. Barcelona
+        inbound_city_from = last_leg.get("cityFrom")       # ej. Santander o Barcelona
+        final_destination_airport = last_leg.get("flyTo")  # debe ser PMI si es ida/vuelta
+
+        # queremos:
+        #  - que el origen sea nuestro PMI
+        #  - que la vuelta termine en PMI
+        #  - que la ciudad de ida y la ciudad de vuelta sean la misma
+        if origin_airport != origin:
+            return None
+
+        if final_destination_airport != origin:
+            # no vuelve a PMI, descartamos
+            return None
+
+        if outbound_city_to != inbound_city_from:
+            # open-jaw: ej. ida a Barcelona y vuelta desde Santander → descartamos
+            return None
+
+        # --- 2) Construir el Flight correcto ---
+
+        destination_airport = first_leg.get("flyTo")       # ej. BCN
+        destination_city_code = first_leg.get("cityCodeTo")  # ej. BCN también normalmente
+
+        departure_time = first_leg.get("utc_departure") or first_leg.get("local_departure")
+        return_time = last_leg.get("utc_arrival") or last_leg.get("local_arrival")
+
+        airline = first_leg.get("airline", "Kiwi")
+
+        if not (destination_airport and departure_time and return_time):
+            return None
+
+        # en cooldown de publicación: ni distancia ni Flight
+        if self._in_cooldown(origin, destination_airport, departure_time, return_time):
+            return None
+   
+        # distancia (km)
+        distance_km = item.get("distance")
+        if distance_km is not None:
+            try:
+                distance_km = float(distance_km)
+            except Exception:
+                distance_km = None
+        
+        price_per_km = None
+        if distance_km and distance_km > 0:
+            price_per_km = price / distance_km
+
+        f = Flight(
+            origin=origin,
+            destination=destination_airport,  # IATA del aeropuerto destino (BCN)
+            price=price,
+            start_date=departure_time,
+            end_date=return_time,
+            airline=airline,
+            link=item.get("deep_link", ""),
+            distance_km=distance_km,
+            price_per_km=price_per_km,
+            provider="kiwi",
+            leg_times=(
+                first_leg.get("local_departure") or departure_time,
+                last_leg.get("local_departure") or return_time,
+            ),
+        )
+        
+        if booking_token:
+            f.booking_token = booking_token
+
+        return f
+
     def search(self, depart_date: str, return_date: str) -> List[Flight]:
         """
         depart_date y return_date: 'YYYY-MM-DD'
         Solo aceptamos viajes tipo PMI -> X -> PMI
         (misma ciudad X a la ida y a la vuelta).
         """
-    
         params = self._build_search_params(depart_date, return_date)
-    
-        try:
-            r = requests.get(
-                f"{KIWI_API_BASE}/v2/search",
-                params=params,
-                headers=self.headers,
-                timeout=20,
-            )
-            r.raise_for_status()
-        except Exception as e:
-            print(f"❌ Error en KiwiAPI.search({depart_date} -> {return_date}): {e}")
-            return []
-    
-        data = r.json().get("data", [])
+        data = self._get(params, f"{depart_date} -> {return_date}")
+
         flights: List[Flight] = []
-    
         for item in data:
-            price = float(item.get("price", 0.0))
-            route = item.get("route", [])
-            booking_token = item.get("booking_token")
-    
-            if not route or price <= 0:
-                continue
-    
-            first_leg = route[0]
-            last_leg = route[-1]
-    
-            # --- 1) Filtrar solo PMI -> X -> PMI (misma ciudad X) ---
-    
-            origin_airport = first_leg.get("flyFrom")          # ej. PMI
-            outbound_city_to = first_leg.get("cityTo")         # ej. Barcelona
-            inbound_city_from = last_leg.get("cityFrom")       # ej. Santander o Barcelona
-            final_destination_airport = last_leg.get("flyTo")  # debe ser PMI si es ida/vuelta
-    
-            # queremos:
-            #  - que el origen sea nuestro PMI
-            #  - que la vuelta termine en PMI
-            #  - que la ciudad de ida y la ciudad de vuelta sean la misma
-            if origin_airport != self.origin:
-                continue
-    
-            if final_destination_airport != self.origin:
-                # no vuelve a PMI, descartamos
-                continue
-    
-            if outbound_city_to != inbound_city_from:
-                # open-jaw: ej. ida a Barcelona y vuelta desde Santander → descartamos
-                continue
-    
-            # --- 2) Construir el Flight correcto ---
-    
-            origin = self.origin                     # PMI
-            destination_airport = first_leg.get("flyTo")       # ej. BCN
-            destination_city_code = first_leg.get("cityCodeTo")  # ej. BCN también normalmente
-    
-            departure_time = first_leg.get("utc_departure") or first_leg.get("local_departure")
-            return_time = last_leg.get("utc_arrival") or last_leg.get("local_arrival")
-    
-            airline = first_leg.get("airline", "Kiwi")
-    
-            if not (destination_airport and departure_time and return_time):
+            f = self._item_to_flight(item)
+            if f is not None:
+                flights.append(f)
+        return flights
+
+    # ---------- Modo ventana: una búsqueda amplia en vez de una por par ----------
+
+    def _build_window_params(
+        self,
+        date_from: date,
+        date_to: date,
+        nights_from: int,
+        nights_to: int,
+        out_days: set,
+        ret_days: set,
+    ) -> dict:
+        return {
+            "fly_from": self.origin,
+            "fly_to": "anywhere",
+            "date_from": date_from.strftime("%d/%m/%Y"),
+            "date_to": date_to.strftime("%d/%m/%Y"),
+            "nights_in_dst_from": nights_from,
+            "nights_in_dst_to": nights_to,
+            # Solo salidas en los días de los pares y vueltas en los suyos
+            # (Tequila: 0=domingo ... 6=sábado)
+            "fly_days": ",".join(str(x) for x in sorted({(d.weekday() + 1) % 7 for d in out_days})),
+            "fly_days_type": "departure",
+            "ret_fly_days": ",".join(str(x) for x in sorted({(d.weekday() + 1) % 7 for d in ret_days})),
+            "ret_fly_days_type": "departure",
+            "curr": self.currency,
+            "flight_type": "round",
+            "one_for_city": 0,   # queremos varias fechas por ciudad; se filtra en local
+            "sort": "price",
+            "max_stopovers": 0,
+            "limit": WINDOW_LIMIT,
+            "adults": 1,
+        }
+
+    @staticmethod
+    def _local_day(leg: dict) -> Optional[date]:
+        s = leg.get("local_departure") or leg.get("utc_departure")
+        if not s:
+            return None
+        try:
+            return datetime.fromisoformat(str(s).replace("Z", "")[:19]).date()
+        except ValueError:
+            return None
+
+    def search_window(self, date_pairs: List[Tuple[date, date]]) -> List[Flight]:
+        """
+        Cubre todos los pares (ida, vuelta) con una búsqueda por tramo de
+        WINDOW_CHUNK_DAYS días de salida (en vez de una por par), con el
+        rango de noches de los pares y limit=WINDOW_LIMIT.
+
+        Los resultados se reparten en local por par (fecha local de salida
+        de la ida y de la vuelta) y se deja, igual que antes, el más barato
+        por ciudad y como mucho PAIR_LIMIT por par.
+        """
+        if not self.window_mode:
+            return super().search_window(date_pairs)
+        return self.search_window_multi([self.origin], date_pairs).get(self.origin, [])
+
+    def search_window_multi(
+        self,
+        origins: List[str],
+        date_pairs: List[Tuple[date, date]],
+    ) -> Dict[str, List[Flight]]:
+        """
+        Igual que search_window pero para varios orígenes en la misma
+        búsqueda (fly_from="PMI,BCN,..."). Devuelve {origen: vuelos},
+        repartidos por el flyFrom de la ida. Los pares de los tramos que
+        fallan quedan en failed_pairs.
+        """
+        self.failed_pairs = None
+        origins = list(dict.fromkeys(o.upper() for o in origins if o))
+        if not date_pairs or not origins:
+            return {}
+
+        pairs = set(date_pairs)
+        out_days = {d for d, _ in pairs}
+        ret_days = {r for _, r in pairs}
+        nights = [(r - d).days for d, r in pairs]
+        nights_from, nights_to = max(min(nights), 1), max(nights)
+
+        first, last = min(out_days), max(out_days)
+        # (origen, par, ciudad) → Flight más barato
+        best: Dict[Tuple[str, Tuple[date, date], str], Flight] = {}
+        n_requests = 0
+
+        # Tramos (orígenes, primer día, último día) por pedir
+        queue: List[Tuple[Tuple[str, ...], date, date]] = []
+        chunk_start = first
+        while chunk_start <= last:
+            chunk_end = min(chunk_start + timedelta(days=WINDOW_CHUNK_DAYS - 1), last)
+            queue.append((tuple(origins), chunk_start, chunk_end))
+            chunk_start = chunk_end + timedelta(days=1)
+
+        while queue:
+            chunk_origins, chunk_start, chunk_end = queue.pop(0)
+            chunk_pairs = [p for p in pairs if chunk_start <= p[0] <= chunk_end]
+            if not chunk_pairs:
                 continue
-   
-            # distancia (km)
-            distance_km = item.get("distance")
-            if distance_km is not None:
-                try:
-                    distance_km = float(distance_km)
-                except Exception:
-                    distance_km = None
-            
-            price_per_km = None
-            if distance_km and distance_km > 0:
-                price_per_km = price / distance_km
-
-            f = Flight(
-                origin=origin,
-                destination=destination_airport,  # IATA del aeropuerto destino (BCN)
-                price=price,
-                start_date=departure_time,
-                end_date=return_time,
-                airline=airline,
-                link=item.get("deep_link", ""),
-                distance_km=distance_km,
-                price_per_km=price_per_km,
+            params = self._build_window_params(
+                chunk_start, chunk_end, nights_from, nights_to, out_days, ret_days
             )
-            
-            if booking_token:
-                f.booking_token = booking_token
-    
-            flights.append(f)
-    
-        return flights
+            params["fly_from"] = ",".join(chunk_origins)
+            print(
+                f"🗓  [KiwiAPI] Buscando vuelos {params['fly_from']} {chunk_start} → {chunk_end} "
+                f"({nights_from}-{nights_to} noches)..."
+            )
+            n_requests += 1
+            try:
+                data = self._get(params, f"{params['fly_from']} {chunk_start}..{chunk_end}")
+            except ProviderError:
+                raise
+            except Exception:
+                for origin in chunk_origins:
+                    self._mark_failed(origin, chunk_pairs)
+                continue
+
+            if len(data) >= WINDOW_LIMIT:
+                # Ordenado por precio: lo que falta son los orígenes/pares más
+                # caros. Se parte el tramo (primero por días, luego por
+                # orígenes) y se vuelve a pedir cada mitad.
+                if chunk_end > chunk_start:
+                    mid = chunk_start + timedelta(days=(chunk_end - chunk_start).days // 2)
+                    print(f"✂️  KiwiAPI: {len(data)} resultados (límite); se parte {chunk_start}..{chunk_end} por días")
+                    queue.append((chunk_origins, chunk_start, mid))
+                    queue.append((chunk_origins, mid + timedelta(days=1), chunk_end))
+                    continue
+                if len(chunk_origins) > 1:
+                    half = len(chunk_origins) // 2
+                    print(f"✂️  KiwiAPI: {len(data)} resultados (límite); se parte {params['fly_from']} por orígenes")
+                    queue.append((chunk_origins[:half], chunk_start, chunk_end))
+                    queue.append((chunk_origins[half:], chunk_start, chunk_end))
+                    continue
+                # un origen y un día: no se puede partir más. Se usan los
+                # vuelos, pero los pares no cuentan como completos
+                print(f"⚠️ KiwiAPI: {len(data)} resultados (límite) para {chunk_origins[0]} {chunk_start}; puede faltar algo")
+                self._mark_failed(chunk_origins[0], chunk_pairs)
+
+            for item in data:
+                route = item.get("route") or []
+                if not route:
+                    continue
+                origin = route[0].get("flyFrom")
+                if origin not in chunk_origins:
+                    continue
+                pair = (self._local_day(route[0]), self._local_day(route[-1]))
+                if pair not in pairs:
+                    continue
+                f = self._item_to_flight(item, origin=origin)
+                if f is None:
+                    continue
+                key = (origin, pair, route[0].get("cityCodeTo") or f.destination)
+                cur = best.get(key)
+                if cur is None or f.price < cur.price:
+                    best[key] = f
+
+        by_pair: Dict[Tuple[str, Tuple[date, date]], List[Flight]] = {}
+        for (origin, pair, _), f in best.items():
+            by_pair.setdefault((origin, pair), []).append(f)
+
+        result: Dict[str, List[Flight]] = {o: [] for o in origins}
+        for origin, pair in sorted(by_pair):
+            result[origin].extend(sorted(by_pair[(origin, pair)], key=lambda f: f.price)[:PAIR_LIMIT])
+
+        total = sum(len(v) for v in result.values())
+        print(
+            f"✅ KiwiAPI: {total} vuelos para {len(origins)} orígenes con {n_requests} búsquedas "
+            f"(antes {len(pairs) * len(origins)})."
+        )
+        return result
 
 
 # def build_kiwi_deep_link(origin_iata, dest_iata, start_date, end_date):
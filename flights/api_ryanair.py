@@ -1,15 +1,11 @@
 # flights/api_ryanair.py
 
-from typing import List
+from datetime import date, datetime
+from typing import Any, Dict, List, Tuple
 from pathlib import Path
-import pandas as pd
-
-from geopy.geocoders import Photon
-from geopy.distance import geodesic
-from ryanair import Ryanair
 from urllib.parse import urlencode
 
-from flights.base import Flight, FlightAPI
+from flights.base import Flight, FlightAPI, ProviderError
 
 
 
@@ -17,16 +13,23 @@ class RyanairAPI(FlightAPI):
     """
     Implementación de FlightAPI para Ryanair.
 
-    - Usa la librería `ryanair` para obtener vuelos ida/vuelta.
+    - Usa la librería `ryanair` para obtener vuelos ida/vuelta
+      (por par de fechas, o por tramos + join local con fetch_mode="legs").
     - Calcula distancia y price_per_km.
     - Genera un link navegable a Ryanair con las fechas y ruta correctas.
     """
 
     DISTANCE_FILE = Path("distance_mapping_pmi.csv")
 
-    def __init__(self, origin: str = "PMI", currency: str = "EUR"):
+    def __init__(self, origin: str = "PMI", currency: str = "EUR", fetch_mode: str = "pairs"):
+        # pandas/geopy/ryanair son lentos de importar: solo al crear el cliente
+        import pandas as pd
+        from geopy.geocoders import Photon
+        from ryanair import Ryanair
+
         self.origin = origin
         self.currency = currency
+        self.fetch_mode = fetch_mode  # "legs" (tramos + join) o "pairs" (una llamada por par)
         self.api = Ryanair(currency=currency)
         self.geolocator = Photon(user_agent="escapadas_mallorca_distance")
 
@@ -71,6 +74,7 @@ class RyanairAPI(FlightAPI):
         if not loc1 or not loc2:
             return 0.0
     
+        import pandas as pd
         from geopy.distance import geodesic
         distance = geodesic(
             (loc1.latitude, loc1.longitude),
@@ -150,6 +154,59 @@ class RyanairAPI(FlightAPI):
 
         return f"{base_url}?{urlencode(params)}"
 
+    def _build_flight(
+        self,
+        origin_iata: str,
+        destination_iata: str,
+        origin_full: str,
+        destination_full: str,
+        price: float,
+        out_dt,
+        in_dt,
+    ) -> Flight:
+        """Flight normalizado (distancia, price/km y link) a partir de ida + vuelta."""
+        # distancia + price_per_km
+        distance = self.get_distance(origin_full, destination_full)
+        price_per_km = None
+        if distance and distance > 0:
+            price_per_km = price / distance
+
+        # fechas (el wrapper suele devolver datetime)
+        # usamos .date() para el link y str() completo para Flight
+        try:
+            out_date_str = str(out_dt.date())
+            in_date_str = str(in_dt.date())
+            start_iso = str(out_dt)
+            end_iso = str(in_dt)
+        except Exception:
+            # fallback por si fueran strings ya
+            start_iso = str(out_dt)
+            end_iso = str(in_dt)
+            out_date_str = start_iso[:10]
+            in_date_str = end_iso[:10]
+
+        # link a Ryanair
+        link = self.build_ryanair_link(
+            origin_iata=origin_iata,
+            destination_iata=destination_iata,
+            depart_date=out_date_str,
+            return_date=in_date_str,
+        )
+
+        return Flight(
+            origin=origin_iata,
+            destination=destination_iata,
+            price=price,
+            start_date=start_iso,
+            end_date=end_iso,
+            airline="Ryanair",
+            link=link,
+            distance_km=distance if distance else None,
+            price_per_km=price_per_km,
+            provider="ryanair",
+            leg_times=(start_iso, end_iso),
+        )
+
     # -------------------------------
     # Búsqueda principal
     # -------------------------------
@@ -159,7 +216,8 @@ class RyanairAPI(FlightAPI):
         depart_date y return_date vienen de tu agregador como 'YYYY-MM-DD' (str).
         Se pasan a Ryanair como rango de un solo día ida/vuelta.
 
-        Devuelve una lista de Flight normalizados.
+        Devuelve una lista de Flight normalizados. Los errores se propagan:
+        search_window marca el par como fallido.
         """
 
         flights: List[Flight] = []
@@ -167,73 +225,189 @@ class RyanairAPI(FlightAPI):
         depart_str = str(depart_date)
         return_str = str(return_date)
 
-        try:
-            trips = self.api.get_cheapest_return_flights(
-                self.origin,
-                depart_str, depart_str,   # ida en ese día
-                return_str, return_str    # vuelta en ese día
-            )
-        except Exception as e:
-            print(f"❌ Error RyanairAPI para {depart_str} - {return_str}: {e}")
-            return []
+        trips = self._call(
+            self.api.get_cheapest_return_flights,
+            self.origin,
+            depart_str, depart_str,   # ida en ese día
+            return_str, return_str    # vuelta en ese día
+        )
 
         for tr in trips:
             outbound = tr.outbound
             inbound = tr.inbound
-            price = tr.totalPrice
-
-            # nombres completos de ciudad
-            origin_full = outbound.originFull
-            destination_full = outbound.destinationFull
+            if self._in_cooldown(outbound.origin, outbound.destination, outbound.departureTime, inbound.departureTime):
+                continue
+            flights.append(
+                self._build_flight(
+                    origin_iata=outbound.origin,
+                    destination_iata=outbound.destination,
+                    origin_full=outbound.originFull,
+                    destination_full=outbound.destinationFull,
+                    price=tr.totalPrice,
+                    out_dt=outbound.departureTime,
+                    in_dt=inbound.departureTime,
+                )
+            )
 
-            # códigos IATA
-            origin_iata = outbound.origin
-            destination_iata = outbound.destination
+        # guardamos cache de distancias si hay novedades
+        self.save_distance_cache()
+        return flights
 
-            # distancia + price_per_km
-            distance = self.get_distance(origin_full, destination_full)
-            price_per_km = None
-            if distance and distance > 0:
-                price_per_km = price / distance
+    # -------------------------------
+    # Modo "legs": tramos sueltos + join local
+    # -------------------------------
 
-            # fechas (el wrapper suele devolver datetime)
-            # usamos .date() para el link y str() completo para Flight
-            try:
-                out_dt = outbound.departureTime
-                in_dt = inbound.departureTime
-                out_date_str = str(out_dt.date())
-                in_date_str = str(in_dt.date())
-                start_iso = str(out_dt)
-                end_iso = str(in_dt)
-            except Exception:
-                # fallback por si fueran strings ya
-                start_iso = str(outbound.departureTime)
-                end_iso = str(inbound.departureTime)
-                out_date_str = start_iso[:10]
-                in_date_str = end_iso[:10]
-
-            # link a Ryanair
-            link = self.build_ryanair_link(
-                origin_iata=origin_iata,
-                destination_iata=destination_iata,
-                depart_date=out_date_str,
-                return_date=in_date_str,
-            )
+    def search_window(self, date_pairs: List[Tuple[date, date]]) -> List[Flight]:
+        """
+        fetch_mode="pairs": una llamada ida/vuelta por par (comportamiento base).
+        fetch_mode="legs": idas más baratas por día (una llamada por día de
+        salida) + vueltas por día de cada destino (cheapestPerDay, una por
+        destino y mes), y se combinan en local (join_legs). Añadir pares o
+        patrones de fin de semana no cuesta llamadas extra.
+        """
+        if self.fetch_mode != "legs" or not self._legs_supported():
+            return super().search_window(date_pairs)
+        self.failed_pairs = None
+        if not date_pairs:
+            return []
 
-            f = Flight(
-                origin=origin_iata,
-                destination=destination_iata,
-                price=price,
-                start_date=start_iso,
-                end_date=end_iso,
-                airline="Ryanair",
-                link=link,
-                distance_km=distance if distance else None,
-                price_per_km=price_per_km,
-            )
+        out_days = sorted({d for d, _ in date_pairs})
+        ret_days = sorted({r for _, r in date_pairs})
 
-            flights.append(f)
+        outbound = self._fetch_outbound_legs(out_days, date_pairs)
+        destinations = sorted({dest for dest, _ in outbound})
+        inbound = self._fetch_inbound_legs(destinations, ret_days, date_pairs)
 
-        # guardamos cache de distancias si hay novedades
+        flights = self.join_legs(outbound, inbound, date_pairs)
         self.save_distance_cache()
+
+        print(
+            f"✅ RyanairAPI (legs): {len(flights)} combinaciones de {len(outbound)} idas y "
+            f"{len(inbound)} vueltas con {getattr(self.api, 'num_queries', '?')} consultas "
+            f"(antes {len(date_pairs)} por origen)."
+        )
+        return flights
+
+    def _legs_supported(self) -> bool:
+        """
+        Las vueltas usan internals de ryanair-py (_retryable_query,
+        BASE_SERVICES_API_URL); si otra versión no los tiene, modo "pairs".
+        """
+        if hasattr(self.api, "_retryable_query") and hasattr(self.api, "BASE_SERVICES_API_URL"):
+            return True
+        print("⚠️ RyanairAPI: esta versión de ryanair-py no permite fetch_mode='legs'; se usa 'pairs'")
+        self.fetch_mode = "pairs"
+        return False
+
+    def _fetch_outbound_legs(
+        self,
+        days: List[date],
+        date_pairs: List[Tuple[date, date]],
+    ) -> Dict[Tuple[str, date], Any]:
+        """
+        (destino, día) → ida más barata de ese día (ryanair.types.Flight).
+        Los destinos en cooldown de ruta no entran: así tampoco se piden sus vueltas.
+        Si falla un día, sus pares quedan en failed_pairs.
+        """
+        legs: Dict[Tuple[str, date], Any] = {}
+        for day in days:
+            print(f"🗓  [RyanairAPI] Idas desde {self.origin} el {day}...")
+            try:
+                fares = self._call(self.api.get_cheapest_flights, self.origin, day, day)
+            except ProviderError:
+                raise
+            except Exception as e:
+                print(f"❌ Error RyanairAPI (idas {day}): {e}")
+                self._mark_failed(self.origin, [p for p in date_pairs if p[0] == day])
+                continue
+            for fl in fares:
+                if self._in_cooldown(self.origin, fl.destination):
+                    continue
+                key = (fl.destination, day)
+                cur = legs.get(key)
+                if cur is None or fl.price < cur.price:
+                    legs[key] = fl
+        return legs
+
+    def _fetch_inbound_legs(
+        self,
+        destinations: List[str],
+        days: List[date],
+        date_pairs: List[Tuple[date, date]],
+    ) -> Dict[Tuple[str, date], Dict[str, Any]]:
+        """
+        (destino, día) → {"price", "departure"} de la vuelta destino → origen.
+        Si falla un destino/mes, los pares que vuelven ese mes quedan en
+        failed_pairs (les puede faltar ese destino).
+        """
+        wanted = set(days)
+        months = sorted({d.replace(day=1) for d in days})
+        legs: Dict[Tuple[str, date], Dict[str, Any]] = {}
+
+        for dest in destinations:
+            for month in months:
+                url = f"{self.api.BASE_SERVICES_API_URL}oneWayFares/{dest}/{self.origin}/cheapestPerDay"
+                try:
+                    data = self._call(
+                        self.api._retryable_query,
+                        url, {"outboundMonthOfDate": month.isoformat(), "currency": self.currency},
+                    )
+                except ProviderError:
+                    raise
+                except Exception as e:
+                    print(f"❌ Error RyanairAPI (vueltas {dest} {month:%Y-%m}): {e}")
+                    self._mark_failed(
+                        self.origin,
+                        [p for p in date_pairs if p[1].replace(day=1) == month],
+                    )
+                    continue
+
+                for fare in (data.get("outbound") or {}).get("fares") or []:
+                    if fare.get("unavailable") or fare.get("soldOut") or not fare.get("price"):
+                        continue
+                    try:
+                        day = date.fromisoformat(fare["day"])
+                    except (KeyError, ValueError):
+                        continue
+                    if day not in wanted:
+                        continue
+                    legs[(dest, day)] = {
+                        "price": float(fare["price"]["value"]),
+                        "departure": datetime.fromisoformat(fare["departureDate"]),
+                    }
+        return legs
+
+    def join_legs(
+        self,
+        outbound: Dict[Tuple[str, date], Any],
+        inbound: Dict[Tuple[str, date], Dict[str, Any]],
+        date_pairs: List[Tuple[date, date]],
+    ) -> List[Flight]:
+        """
+        Hash join: por cada ida (destino, día) y cada par que sale ese día,
+        busca la vuelta (destino, día de vuelta) en el índice de vueltas.
+        """
+        returns_by_out_day: Dict[date, List[date]] = {}
+        for d, r in date_pairs:
+            returns_by_out_day.setdefault(d, []).append(r)
+
+        flights: List[Flight] = []
+        for (dest, out_day), out_leg in outbound.items():
+            for ret_day in returns_by_out_day.get(out_day, []):
+                in_leg = inbound.get((dest, ret_day))
+                if in_leg is None:
+                    continue
+                if self._in_cooldown(out_leg.origin, dest, out_leg.departureTime, in_leg["departure"]):
+                    continue
+                flights.append(
+                    self._build_flight(
+                        origin_iata=out_leg.origin,
+                        destination_iata=dest,
+                        origin_full=out_leg.originFull,
+                        destination_full=out_leg.destinationFull,
+                        price=round(out_leg.price + in_leg["price"], 2),
+                        out_dt=out_leg.departureTime,
+                        in_dt=in_leg["departure"],
+                    )
+                )
         return flights
@@ -1,8 +1,13 @@
 # flights/base.py
 from abc import ABC, abstractmethod
-from typing import Optional, List
+from datetime import date
+from typing import Dict, Iterable, Optional, List, Set, Tuple
 from dataclasses import dataclass
 
+class ProviderError(Exception):
+    """El proveedor no está disponible (circuit breaker abierto, sin credenciales...)."""
+
+
 @dataclass
 class Flight:
     origin: str
@@ -23,7 +28,49 @@ class Flight:
     category_code: Optional[float] = None
     category_label: Optional[float] = None
 
+    # Proveedor que lo devolvió ("ryanair", "kiwi", ...) y, tras
+    # flights.merge.merge_flights, precio visto en cada proveedor
+    provider: str = ""
+    sources: Optional[Dict[str, float]] = None
+    # Salida local de la ida y de la vuelta ("YYYY-MM-DDTHH:MM"): clave para
+    # deduplicar entre proveedores (start_date/end_date no son homogéneos)
+    leg_times: Optional[Tuple[str, str]] = None
+
 class FlightAPI(ABC):
+    # CircuitBreaker asignado por flights.providers (None = sin protección)
+    breaker = None
+
+    def _call(self, fn, *args, **kwargs):
+        """Petición a la API pasando por el circuit breaker, si lo hay."""
+        if self.breaker is None:
+            return fn(*args, **kwargs)
+        return self.breaker.call(fn, *args, **kwargs)
+
+    # CooldownIndex (flights.published_history) asignado por flights.providers:
+    # rutas/fechas que no se pueden publicar y no hace falta ni construir
+    cooldown = None
+
+    def _in_cooldown(self, origin: str, destination: str, start=None, end=None) -> bool:
+        """Sin fechas solo mira el cooldown de ruta."""
+        if self.cooldown is None:
+            return False
+        if start is None:
+            return self.cooldown.route_blocked(origin, destination)
+        return self.cooldown.blocked(origin, destination, start, end)
+
+    # Pares (ida, vuelta) por origen que la última search_window no pudo
+    # consultar (error de red, respuesta truncada...). Un par fallido no es
+    # un par sin vuelos: flights/fare_store no lo da por pedido.
+    failed_pairs: Optional[Dict[str, Set[Tuple[date, date]]]] = None
+
+    def _mark_failed(self, origin: str, pairs: Iterable[Tuple[date, date]]) -> None:
+        if self.failed_pairs is None:
+            self.failed_pairs = {}
+        self.failed_pairs.setdefault(origin.upper(), set()).update(pairs)
+
+    def failed_for(self, origin: str) -> Set[Tuple[date, date]]:
+        return set((self.failed_pairs or {}).get(origin.upper(), ()))
+
     @abstractmethod
     def search(self, depart_date, return_date) -> List[Flight]:
         """
@@ -32,3 +79,28 @@ class FlightAPI(ABC):
         pero el agregador siempre llamará con las mismas fechas para todas.
         """
         pass
+
+    def search_window(self, date_pairs: List[Tuple[date, date]]) -> List[Flight]:
+        """
+        Vuelos para todos los pares (ida, vuelta) de una ventana.
+        Por defecto una llamada a search() por par; las APIs que pueden
+        pedir la ventana entera de una vez (KiwiAPI) lo sobreescriben.
+        Los pares cuya búsqueda falla quedan en failed_pairs.
+        """
+        self.failed_pairs = None
+        origin = getattr(self, "origin", "")
+        flights: List[Flight] = []
+        for i, (depart_date, return_date) in enumerate(date_pairs):
+            depart_str = depart_date.isoformat()
+            return_str = return_date.isoformat()
+            print(f"🗓  [{self.__class__.__name__}] Buscando vuelos {depart_str} → {return_str}...")
+            try:
+                flights.extend(self.search(depart_str, return_str) or [])
+            except ProviderError as e:
+                print(f"⛔ {self.__class__.__name__} no disponible, se salta el resto de fechas: {e}")
+                self._mark_failed(origin, date_pairs[i:])
+                break
+            except Exception as e:
+                print(f"❌ Error consultando {self.__class__.__name__}: {e}")
+                self._mark_failed(origin, [(depart_date, return_date)])
+        return flights
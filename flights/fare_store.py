@@ -0,0 +1,222 @@
+# flights/fare_store.py
+"""
+Conjunto de tarifas retenido entre ejecuciones + planificador de refresco.
+
+Antes cada ejecución volvía a pedir la ventana entera a cada proveedor.
+Ahora, por (proveedor, origen, par ida/vuelta) se guarda cuándo se pidió
+y los vuelos que salieron, y solo se vuelven a pedir los pares "caducados":
+
+  - intervalo base según días hasta la salida (REFRESH_TIERS): lo cercano
+    cambia rápido, lo de dentro de dos meses apenas se mueve
+  - dividido por (1 + VOLATILITY_WEIGHT * volatilidad), donde volatilidad es
+    una media móvil del cambio relativo del precio mínimo del par entre
+    refrescos
+  - nunca por debajo de MIN_REFRESH_H
+
+get_available_flights junta lo recién pedido con lo retenido de los pares
+que siguen frescos. SQLite como review/job_store.py.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from flights.base import Flight
+from offline.fixtures import flight_from_dict, flight_to_dict
+
+DB_PATH = Path("flights/cache/fares.sqlite3")
+
+# (días hasta la salida como máximo, horas entre refrescos)
+REFRESH_TIERS: List[Tuple[int, float]] = [
+    (7, 6.0),
+    (21, 12.0),
+    (45, 24.0),
+    (10**6, 72.0),
+]
+MIN_REFRESH_H = 2.0
+VOLATILITY_WEIGHT = 10.0   # volatilidad 0.1 (10 %) → intervalo / 2
+VOLATILITY_ALPHA = 0.5     # peso del último cambio en la media móvil
+
+Pair = Tuple[date, date]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fetches (
+    provider    TEXT NOT NULL,
+    origin      TEXT NOT NULL,
+    depart      TEXT NOT NULL,
+    ret         TEXT NOT NULL,
+    fetched_at  REAL NOT NULL,
+    min_price   REAL,
+    volatility  REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (provider, origin, depart, ret)
+);
+CREATE TABLE IF NOT EXISTS fares (
+    provider    TEXT NOT NULL,
+    origin      TEXT NOT NULL,
+    depart      TEXT NOT NULL,
+    ret         TEXT NOT NULL,
+    data        TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fares_pair ON fares(provider, origin, depart, ret);
+"""
+
+_initialized: set[str] = set()
+
+
+@contextmanager
+def _connect(db_path: Path = DB_PATH):
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        key = str(db_path.resolve())
+        if key not in _initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            _initialized.add(key)
+        yield conn
+    finally:
+        conn.close()
+
+
+def refresh_interval_h(depart: date, volatility: float = 0.0, today: Optional[date] = None) -> float:
+    days = (depart - (today or date.today())).days
+    base = next(hours for max_days, hours in REFRESH_TIERS if days <= max_days)
+    return max(MIN_REFRESH_H, base / (1.0 + VOLATILITY_WEIGHT * max(volatility, 0.0)))
+
+
+def flight_pair(f: Flight) -> Optional[Pair]:
+    """Par (ida, vuelta) en fechas locales, como lo arman las APIs."""
+    out_time, in_time = f.leg_times or (f.start_date, f.end_date)
+    try:
+        return date.fromisoformat(str(out_time)[:10]), date.fromisoformat(str(in_time)[:10])
+    except ValueError:
+        return None
+
+
+def plan_refresh(
+    provider: str,
+    origin: str,
+    date_pairs: Iterable[Pair],
+    now: Optional[float] = None,
+    db_path: Path = DB_PATH,
+) -> Tuple[List[Pair], List[Pair]]:
+    """(pares a volver a pedir, pares que siguen frescos)."""
+    now = now or time.time()
+    date_pairs = list(date_pairs)
+    with _connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT depart, ret, fetched_at, volatility FROM fetches WHERE provider = ? AND origin = ?",
+            (provider, origin.upper()),
+        ).fetchall()
+    seen = {(r["depart"], r["ret"]): (r["fetched_at"], r["volatility"]) for r in rows}
+
+    stale: List[Pair] = []
+    fresh: List[Pair] = []
+    for pair in date_pairs:
+        hit = seen.get((pair[0].isoformat(), pair[1].isoformat()))
+        if hit is None:
+            stale.append(pair)
+            continue
+        fetched_at, volatility = hit
+        if now - fetched_at >= refresh_interval_h(pair[0], volatility) * 3600:
+            stale.append(pair)
+        else:
+            fresh.append(pair)
+    return stale, fresh
+
+
+def record_fetch(
+    provider: str,
+    origin: str,
+    date_pairs: Iterable[Pair],
+    flights: List[Flight],
+    now: Optional[float] = None,
+    db_path: Path = DB_PATH,
+) -> None:
+    """Sustituye los vuelos retenidos de esos pares y actualiza su volatilidad."""
+    now = now or time.time()
+    origin = origin.upper()
+    by_pair: Dict[Pair, List[Flight]] = defaultdict(list)
+    for f in flights:
+        pair = flight_pair(f)
+        if pair is not None:
+            by_pair[pair].append(f)
+
+    with _connect(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for pair in date_pairs:
+                d, r = pair[0].isoformat(), pair[1].isoformat()
+                pair_flights = by_pair.get(pair, [])
+                prices = [f.price for f in pair_flights if f.price]
+                min_price = min(prices) if prices else None
+
+                prev = conn.execute(
+                    "SELECT min_price, volatility FROM fetches "
+                    "WHERE provider = ? AND origin = ? AND depart = ? AND ret = ?",
+                    (provider, origin, d, r),
+                ).fetchone()
+                volatility = prev["volatility"] if prev else 0.0
+                if prev and prev["min_price"] and min_price:
+                    change = abs(min_price - prev["min_price"]) / prev["min_price"]
+                    volatility = VOLATILITY_ALPHA * change + (1 - VOLATILITY_ALPHA) * volatility
+
+                conn.execute(
+                    "INSERT OR REPLACE INTO fetches "
+                    "(provider, origin, depart, ret, fetched_at, min_price, volatility) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (provider, origin, d, r, now, min_price, volatility),
+                )
+                conn.execute(
+                    "DELETE FROM fares WHERE provider = ? AND origin = ? AND depart = ? AND ret = ?",
+                    (provider, origin, d, r),
+                )
+                conn.executemany(
+                    "INSERT INTO fares (provider, origin, depart, ret, data) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (provider, origin, d, r, json.dumps(flight_to_dict(f), ensure_ascii=False))
+                        for f in pair_flights
+                    ],
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def load_fares(
+    provider: str,
+    origin: str,
+    date_pairs: Iterable[Pair],
+    db_path: Path = DB_PATH,
+) -> List[Flight]:
+    wanted = {(d.isoformat(), r.isoformat()) for d, r in date_pairs}
+    if not wanted:
+        return []
+    with _connect(db_path) as conn:
+        rows = conn.execute(
+            "SELECT depart, ret, data FROM fares WHERE provider = ? AND origin = ?",
+            (provider, origin.upper()),
+        ).fetchall()
+    return [
+        flight_from_dict(json.loads(row["data"]))
+        for row in rows
+        if (row["depart"], row["ret"]) in wanted
+    ]
+
+
+def prune(before: Optional[date] = None, db_path: Path = DB_PATH) -> int:
+    """Borra lo que sale antes de `before` (por defecto hoy)."""
+    cutoff = (before or date.today()).isoformat()
+    with _connect(db_path) as conn:
+        conn.execute("DELETE FROM fares WHERE depart < ?", (cutoff,))
+        cur = conn.execute("DELETE FROM fetches WHERE depart < ?", (cutoff,))
+        return cur.rowcount
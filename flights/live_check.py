@@ -0,0 +1,150 @@
+# flights/live_check.py
+"""
+Verificación en vivo (Kiwi /v2/booking/check) de los mejores candidatos
+antes de gastar LLM + render en ellos.
+
+- Se comprueban a la vez los top-k de cada categoría (LIVE_CHECK_WORKERS
+  hilos), solo los que tienen booking_token (Kiwi); el resto se da por bueno.
+- Resultado cacheado por token durante LIVE_CHECK_TTL_SEC (vida del token).
+- Se aplica el resultado a todos los comprobados: si el precio ha cambiado
+  se re-precia (price, discount_pct, price_per_km), se vuelve a aplicar el
+  descuento mínimo y a puntuar; los caducados/inválidos se marcan como
+  descartados. Por categoría gana el vivo con mejor score.
+- Si la comprobación falla por nuestra parte (red, circuito abierto) el
+  candidato se mantiene: no se tiran chollos por un error de la API.
+  Un 403 (la key no tiene booking/check) desactiva la verificación.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import offline
+import flights.providers as providers
+from config.settings import LIVE_CHECK_TTL_SEC, LIVE_CHECK_WORKERS
+
+VERIFY_POOL = ThreadPoolExecutor(max_workers=LIVE_CHECK_WORKERS, thread_name_prefix="live-check")
+
+# booking_token → (caduca_en, resultado de verify_live_price)
+_CACHE: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+_cache_lock = threading.Lock()
+
+_BREAKER_NAME = "kiwi_check"
+
+
+def _cached(token: str) -> Optional[Dict[str, Any]]:
+    with _cache_lock:
+        hit = _CACHE.get(token)
+        if hit is None:
+            return None
+        if hit[0] < time.monotonic():
+            del _CACHE[token]
+            return None
+        return hit[1]
+
+
+def _check_token(token: str) -> Optional[Dict[str, Any]]:
+    """Resultado de verify_live_price (cacheado), o None si no se pudo comprobar."""
+    hit = _cached(token)
+    if hit is not None:
+        return hit
+
+    from flights.api_kiwi import verify_live_price
+
+    breaker = providers.get_breaker(_BREAKER_NAME)
+    try:
+        res = breaker.call(verify_live_price, token)
+    except Exception as e:
+        print(f"⚠️ No se pudo verificar el precio en vivo: {e}")
+        return None
+
+    if not res.get("ok") and res.get("reason") == "403_FORBIDDEN":
+        breaker.disable(res.get("hint") or "403 en booking/check")
+        return None
+
+    with _cache_lock:
+        _CACHE[token] = (time.monotonic() + LIVE_CHECK_TTL_SEC, res)
+    return res
+
+
+def _apply(item: Dict[str, Any], res: Optional[Dict[str, Any]], min_discount_pct: float) -> bool:
+    """Aplica el resultado al vuelo del item. False si hay que descartarlo."""
+    if res is None:
+        return True  # sin verificar: se mantiene
+
+    f = item["flight"]
+    if not res.get("ok"):
+        # 404 = token caducado: la tarifa ya no existe
+        return res.get("reason") != "404_NOT_FOUND"
+    if not res.get("is_valid", True):
+        return False
+
+    current = res.get("current_price")
+    try:
+        current = float(current) if current is not None else None
+    except (TypeError, ValueError):
+        current = None
+
+    if current is not None and current > 0 and abs(current - f.price) >= 0.01:
+        print(f"💱 {f.origin}→{f.destination}: {f.price}€ → {current}€ en vivo")
+        old_price = f.price
+        f.price = current
+        if f.price_per_km is not None and old_price:
+            f.price_per_km = f.price_per_km * current / old_price
+        typical = f.route_typical_price
+        if typical:
+            f.discount_pct = round((typical - current) / typical * 100.0, 1)
+        if f.discount_pct is None or f.discount_pct < min_discount_pct:
+            return False
+    return True
+
+
+def pick_live_by_category(
+    ranked: Dict[str, List[Dict[str, Any]]],
+    min_discount_pct: float,
+    score_fn=None,
+) -> List[Dict[str, Any]]:
+    """
+    ranked: {categoría: [items ordenados por score]} (top-k por categoría).
+    Devuelve un item por categoría, el mejor que sigue vivo.
+
+    Todos los items comprobados quedan marcados (item["live_checked"]) y,
+    si ya no están, item["dropped"]: to_review_candidates los usa para no
+    ofrecer alternativas caducadas. Los re-preciados se vuelven a puntuar y
+    la categoría se reordena antes de elegir.
+    """
+    tokens = {
+        item["flight"].booking_token
+        for items in ranked.values()
+        for item in items
+        if getattr(item["flight"], "booking_token", None)
+    }
+    results: Dict[str, Optional[Dict[str, Any]]] = {}
+    if tokens and not offline.is_offline() and providers.get_breaker(_BREAKER_NAME).available:
+        t0 = time.perf_counter()
+        futures = {tok: VERIFY_POOL.submit(_check_token, tok) for tok in tokens}
+        results = {tok: fut.result() for tok, fut in futures.items()}
+        print(f"🔎 Verificados {len(tokens)} precios en vivo en {time.perf_counter() - t0:.1f}s")
+
+    best: List[Dict[str, Any]] = []
+    for code, items in ranked.items():
+        live: List[Dict[str, Any]] = []
+        for item in items:
+            item["live_checked"] = True
+            token = getattr(item["flight"], "booking_token", None)
+            if _apply(item, results.get(token) if token else None, min_discount_pct):
+                if score_fn is not None:
+                    item["score"] = score_fn(item["flight"])
+                live.append(item)
+                continue
+            # marcado para que to_review_candidates no lo ofrezca
+            item["dropped"] = True
+            f = item["flight"]
+            print(f"🗑  [{code}] {f.origin}→{f.destination} {f.price}€ ya no está disponible")
+        if live:
+            # sort estable: a igualdad de score se respeta el ranking
+            live.sort(key=lambda it: it["score"], reverse=True)
+            best.append(live[0])
+    return best
@@ -0,0 +1,100 @@
+# flights/merge.py
+"""
+Deduplicado de vuelos entre proveedores.
+
+El mismo vuelo de Ryanair llega de RyanairAPI ("Ryanair") y de KiwiAPI
+("FR"). Si entran los dos en annotate_route_price_stats la ruta cuenta
+doble en el percentil, y el scoring trabaja dos veces.
+
+merge_flights recorre la lista una vez con un índice (dict) por
+(origen, destino, salida ida, salida vuelta, aerolínea) y deja un Flight
+por clave: el más barato, con Flight.sources = {proveedor: precio}.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from flights.base import Flight
+
+# Nombre de aerolínea → código IATA (Kiwi devuelve el código)
+CARRIER_CODES = {
+    "ryanair": "FR",
+    "vueling": "VY",
+    "iberia": "IB",
+    "iberia express": "I2",
+    "air europa": "UX",
+    "easyjet": "U2",
+    "wizz air": "W6",
+    "volotea": "V7",
+    "binter": "NT",
+    "transavia": "HV",
+    "eurowings": "EW",
+    "lufthansa": "LH",
+}
+
+FlightKey = Tuple[str, str, str, str, str]
+
+
+def _minute(value) -> str:
+    """'2025-03-06T18:30:00.000Z' / '2025-03-06 18:30:00' → '2025-03-06T18:30'."""
+    s = str(value or "").strip()
+    if s.endswith("Z"):
+        s = s[:-1]
+    try:
+        return datetime.fromisoformat(s).strftime("%Y-%m-%dT%H:%M")
+    except ValueError:
+        return s[:16].replace(" ", "T")
+
+
+def carrier_code(airline: Optional[str]) -> str:
+    name = (airline or "").strip()
+    if len(name) == 2:
+        return name.upper()
+    return CARRIER_CODES.get(name.lower(), name.upper())
+
+
+def flight_key(f: Flight) -> FlightKey:
+    out_time, in_time = f.leg_times or (f.start_date, f.end_date)
+    return (
+        (f.origin or "").upper(),
+        (f.destination or "").upper(),
+        _minute(out_time),
+        _minute(in_time),
+        carrier_code(f.airline),
+    )
+
+
+def merge_flights(flights: List[Flight]) -> List[Flight]:
+    """
+    Un Flight por clave (el más barato; a igualdad, el primero que llegó),
+    con sources = {proveedor: precio más barato visto}. Mantiene el orden
+    de primera aparición. O(n).
+    """
+    index: Dict[FlightKey, Flight] = {}
+    sources: Dict[FlightKey, Dict[str, float]] = {}
+
+    for f in flights:
+        key = flight_key(f)
+        provider = f.provider or "?"
+
+        seen = sources.setdefault(key, {})
+        if f.price is not None and (provider not in seen or f.price < seen[provider]):
+            seen[provider] = f.price
+
+        current = index.get(key)
+        if current is None:
+            index[key] = f
+        elif f.price is not None and (current.price is None or f.price < current.price):
+            # el nuevo ocupa el hueco del anterior (se conserva el orden)
+            index[key] = f
+
+    merged: List[Flight] = []
+    for key, f in index.items():
+        f.sources = sources[key]
+        merged.append(f)
+
+    dropped = len(flights) - len(merged)
+    if dropped:
+        print(f"🧬 Deduplicado: {len(flights)} → {len(merged)} vuelos ({dropped} repetidos entre proveedores)")
+    return merged
@@ -0,0 +1,264 @@
+# flights/providers.py
+"""
+Registro de proveedores de vuelos (Ryanair, Kiwi, ...) con circuit breaker.
+
+- PROVIDERS: nombre → factoría(origin) que construye el FlightAPI.
+  Cada market elige los suyos con MarketConfig.providers.
+- Un CircuitBreaker por proveedor y proceso: tras PROVIDER_FAILURE_THRESHOLD
+  fallos seguidos se abre y el proveedor se salta (sin esperar timeouts)
+  durante PROVIDER_RESET_SEC; después deja pasar una petición de prueba
+  (half-open) que lo cierra si va bien o lo vuelve a abrir si falla.
+- Si el proveedor no se puede construir (p. ej. falta KIWI_API_KEY) se
+  desactiva para el resto de la ejecución.
+
+Las APIs pasan cada petición por FlightAPI._call, que usa el breaker.
+En modo record/replay (offline/) build_provider devuelve el API envuelto
+que graba, o el que lee de fixtures.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import offline
+from config.settings import PROVIDER_FAILURE_THRESHOLD, PROVIDER_RESET_SEC, RYANAIR_FETCH_MODE
+from flights.base import FlightAPI, ProviderError
+from offline.providers import RecordingFlightAPI, ReplayFlightAPI
+
+
+class CircuitBreaker:
+    """
+    closed → open tras N fallos seguidos; open → half_open pasado reset_sec;
+    half_open → closed con un éxito u open con un fallo.
+    Además guarda estadísticas de latencia y errores del proveedor.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = PROVIDER_FAILURE_THRESHOLD,
+        reset_sec: float = PROVIDER_RESET_SEC,
+    ):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_sec = float(reset_sec)
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.disabled_reason: Optional[str] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+        # estadísticas
+        self.calls = 0
+        self.failures = 0
+        self.skipped = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.last_error: Optional[str] = None
+
+    # --- estado ---
+
+    def disable(self, reason: str) -> None:
+        """Desactiva el proveedor hasta que acabe el proceso."""
+        with self._lock:
+            self.disabled_reason = reason
+            self.state = self.OPEN
+            self.opened_at = float("inf")
+
+    @property
+    def available(self) -> bool:
+        """True si ahora mismo dejaría pasar una petición (sin consumir la prueba)."""
+        with self._lock:
+            if self.disabled_reason:
+                return False
+            if self.state == self.OPEN:
+                return time.monotonic() - self.opened_at >= self.reset_sec
+            return not (self.state == self.HALF_OPEN and self._probing)
+
+    def _allow(self) -> bool:
+        with self._lock:
+            if self.disabled_reason:
+                return False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_sec:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+            # half_open: una sola petición de prueba a la vez
+            if self._probing:
+                return False
+            self._probing = True
+            print(f"🔌 [{self.name}] circuito half-open: petición de prueba")
+            return True
+
+    def _record(self, latency: float, error: Optional[BaseException]) -> None:
+        with self._lock:
+            self.calls += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            self._probing = False
+
+            if error is None:
+                if self.state != self.CLOSED:
+                    print(f"✅ [{self.name}] circuito cerrado de nuevo")
+                self.state = self.CLOSED
+                self.consecutive_failures = 0
+                return
+
+            self.failures += 1
+            self.consecutive_failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                print(
+                    f"⛔ [{self.name}] circuito abierto tras {self.consecutive_failures} "
+                    f"fallo(s) seguidos ({self.last_error})"
+                )
+
+    # --- llamada protegida ---
+
+    def call(self, fn: Callable, *args, **kwargs):
+        if not self._allow():
+            with self._lock:
+                self.skipped += 1
+            raise ProviderError(
+                f"{self.name}: " + (self.disabled_reason or "circuito abierto")
+            )
+
+        t0 = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self._record(time.perf_counter() - t0, e)
+            raise
+        self._record(time.perf_counter() - t0, None)
+        return result
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "state": "disabled" if self.disabled_reason else self.state,
+                "calls": self.calls,
+                "failures": self.failures,
+                "skipped": self.skipped,
+                "error_rate": round(self.failures / self.calls, 3) if self.calls else 0.0,
+                "avg_latency": round(self.total_latency / self.calls, 3) if self.calls else None,
+                "max_latency": round(self.max_latency, 3),
+                "last_error": self.disabled_reason or self.last_error,
+            }
+
+
+# -------------------------------
+# Registro
+# -------------------------------
+
+def _ryanair(origin: str) -> FlightAPI:
+    from flights.api_ryanair import RyanairAPI
+    return RyanairAPI(origin=origin, fetch_mode=RYANAIR_FETCH_MODE)
+
+
+def _kiwi(origin: str) -> FlightAPI:
+    from flights.api_kiwi import KiwiAPI
+    return KiwiAPI(origin=origin)
+
+
+PROVIDERS: Dict[str, Callable[[str], FlightAPI]] = {
+    "ryanair": _ryanair,
+    "kiwi": _kiwi,
+}
+
+DEFAULT_PROVIDERS: Tuple[str, ...] = ("ryanair", "kiwi")
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def register_provider(name: str, factory: Callable[[str], FlightAPI]) -> None:
+    PROVIDERS[name.lower()] = factory
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    name = name.lower()
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(name)
+        if breaker is None:
+            breaker = _BREAKERS[name] = CircuitBreaker(name)
+        return breaker
+
+
+def build_provider(name: str, origin: str, cooldown=None) -> Optional[FlightAPI]:
+    """
+    FlightAPI del proveedor con su breaker, o None si no está registrado,
+    está desactivado o tiene el circuito abierto.
+    cooldown: CooldownIndex para que el proveedor descarte rutas en cooldown.
+    """
+    name = name.lower()
+    factory = PROVIDERS.get(name)
+    if factory is None:
+        print(f"⚠️ Proveedor desconocido: {name}")
+        return None
+
+    if offline.is_offline():
+        api = ReplayFlightAPI(name, origin)
+        api.cooldown = cooldown
+        return api
+
+    breaker = get_breaker(name)
+    if not breaker.available:
+        return None
+
+    try:
+        api = factory(origin)
+    except Exception as e:
+        print(f"⚠️ Proveedor {name} desactivado: {e}")
+        breaker.disable(str(e))
+        return None
+
+    api.breaker = breaker
+    if offline.is_recording():
+        # se graba todo; el cooldown se aplica al reproducir
+        return RecordingFlightAPI(name, api)
+    api.cooldown = cooldown
+    return api
+
+
+def build_providers(
+    origin: str,
+    names: Optional[Iterable[str]] = None,
+    cooldown=None,
+) -> List[Tuple[str, FlightAPI]]:
+    """(nombre, api) de los proveedores pedidos que están disponibles."""
+    out: List[Tuple[str, FlightAPI]] = []
+    for name in names or DEFAULT_PROVIDERS:
+        api = build_provider(name, origin, cooldown=cooldown)
+        if api is not None:
+            out.append((name.lower(), api))
+        elif name.lower() in _BREAKERS:
+            print(f"⏭  Proveedor {name} no disponible, se salta ({_BREAKERS[name.lower()].stats()['state']})")
+    return out
+
+
+def health_report() -> Dict[str, Dict[str, object]]:
+    with _BREAKERS_LOCK:
+        breakers = dict(_BREAKERS)
+    return {name: b.stats() for name, b in breakers.items()}
+
+
+def print_health() -> None:
+    for name, st in health_report().items():
+        lat = f"{st['avg_latency']:.2f}s" if st["avg_latency"] is not None else "-"
+        print(
+            f"🩺 {name}: {st['state']} | llamadas={st['calls']} fallos={st['failures']} "
+            f"saltadas={st['skipped']} lat_media={lat}"
+            + (f" | último error: {st['last_error']}" if st["last_error"] else "")
+        )
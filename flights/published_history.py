@@ -4,7 +4,7 @@ from __future__ import annotations
 import json
 from pathlib import Path
 from datetime import date, datetime
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Optional, Set, Tuple
 
 HISTORY_FILE = Path("published_deals.json")
 
@@ -101,50 +101,83 @@ def make_flight_key(f: Any) -> str:
     return f"{origin}-{dest}-{start}-{end}"
 
 
-def is_recently_published(
-    f: Any,
-    cooldown_days: int = 14,        # mismo origen+destino+fechas
-    route_cooldown_days: int = 5,   # mismo origen+destino (sin fechas)
-) -> bool:
+class CooldownIndex:
     """
-    True si:
-      1) se publicó EXACTAMENTE (origen+destino+fechas) en los últimos cooldown_days, o
-      2) se publicó (origen+destino) en los últimos route_cooldown_days (cualquier fecha)
+    Índice en memoria del histórico para preguntar por cooldowns en O(1):
+      - exact:  claves ORIGIN-DEST-ini-fin publicadas hace < cooldown_days
+      - routes: (ORIGIN, DEST) publicadas hace < route_cooldown_days
+    Se pasa a los proveedores (FlightAPI.cooldown) para no pedir ni
+    construir vuelos que luego no se podrían publicar.
     """
-    history = _load_history()
-    today = date.today()
 
-    # 1) cooldown exacto (ruta + fechas)
-    key = make_flight_key(f)
-    data = history.get(key)
-    if data:
-        pub_date = _parse_pub_date(data.get("published_at"))
-        if pub_date and (today - pub_date).days < cooldown_days:
+    def __init__(
+        self,
+        history: Dict[str, dict],
+        cooldown_days: int = 14,
+        route_cooldown_days: int = 5,
+        today: Optional[date] = None,
+    ):
+        today = today or date.today()
+        self.exact: Set[str] = set()
+        self.routes: Set[Tuple[str, str]] = set()
+
+        for k, v in history.items():
+            pub_date = _parse_pub_date(v.get("published_at"))
+            if not pub_date:
+                continue
+            age = (today - pub_date).days
+            if age < cooldown_days:
+                self.exact.add(k)
+            if route_cooldown_days and route_cooldown_days > 0 and age < route_cooldown_days:
+                o, d = _route_from_key(k)
+                self.routes.add((o.upper(), d.upper()))
+
+    def route_blocked(self, origin: str, dest: str) -> bool:
+        return ((origin or "").upper(), (dest or "").upper()) in self.routes
+
+    def blocked(self, origin: str, dest: str, start: Any, end: Any) -> bool:
+        """Mismo criterio que is_recently_published, con los campos sueltos."""
+        if self.route_blocked(origin, dest):
             return True
+        key = f"{(origin or '').upper()}-{(dest or '').upper()}-{_iso_date_yyyy_mm_dd(start)}-{_iso_date_yyyy_mm_dd(end)}"
+        return key in self.exact
 
-    # 2) cooldown por ruta (origen+destino) sin fechas
-    if route_cooldown_days and route_cooldown_days > 0:
-        origin_cur = (_fget(f, "origin", "") or _fget(f, "origin_iata", "") or "").upper()
-        dest_cur = (_fget(f, "destination", "") or _fget(f, "destination_iata", "") or "").upper()
+    def is_recently_published(self, f: Any) -> bool:
+        origin = _fget(f, "origin", "") or _fget(f, "origin_iata", "") or ""
+        dest = _fget(f, "destination", "") or _fget(f, "destination_iata", "") or ""
+        return self.route_blocked(origin, dest) or make_flight_key(f) in self.exact
 
-        if origin_cur and dest_cur:
-            newest: Optional[date] = None
-            for k, v in history.items():
-                o, d = _route_from_key(k)
-                if o.upper() != origin_cur or d.upper() != dest_cur:
-                    continue
 
-                pub_date = _parse_pub_date(v.get("published_at"))
-                if not pub_date:
-                    continue
+# (mtime_ns del histórico, hoy, cooldown_days, route_cooldown_days) → índice
+_INDEX_CACHE: Dict[Tuple[int, date, int, int], CooldownIndex] = {}
+
 
-                if newest is None or pub_date > newest:
-                    newest = pub_date
+def get_cooldown_index(cooldown_days: int = 14, route_cooldown_days: int = 5) -> CooldownIndex:
+    """Índice del histórico actual; se reconstruye si cambia el fichero o el día."""
+    mtime = HISTORY_FILE.stat().st_mtime_ns if HISTORY_FILE.exists() else 0
+    cache_key = (mtime, date.today(), cooldown_days, route_cooldown_days)
+    index = _INDEX_CACHE.get(cache_key)
+    if index is None:
+        _INDEX_CACHE.clear()
+        index = _INDEX_CACHE[cache_key] = CooldownIndex(
+            _load_history(),
+            cooldown_days=cooldown_days,
+            route_cooldown_days=route_cooldown_days,
+        )
+    return index
 
-            if newest and (today - newest).days < route_cooldown_days:
-                return True
 
-    return False
+def is_recently_published(
+    f: Any,
+    cooldown_days: int = 14,        # mismo origen+destino+fechas
+    route_cooldown_days: int = 5,   # mismo origen+destino (sin fechas)
+) -> bool:
+    """
+    True si:
+      1) se publicó EXACTAMENTE (origen+destino+fechas) en los últimos cooldown_days, o
+      2) se publicó (origen+destino) en los últimos route_cooldown_days (cualquier fecha)
+    """
+    return get_cooldown_index(cooldown_days, route_cooldown_days).is_recently_published(f)
 
 
 def register_publication(f: Any, category_code: str) -> None:
@@ -159,3 +192,4 @@ def register_publication(f: Any, category_code: str) -> None:
         "category": category_code,
     }
     _save_history(history)
+    _INDEX_CACHE.clear()
@@ -1,18 +1,32 @@
 # instagram/ig_client.py
 
+import asyncio
 import os
+import threading
 import time
 import requests
-from typing import Optional
+from typing import Dict, Iterable, Optional, Tuple
 
 from config.settings import ES_IG_USER_ID,ES_PAGE_TOKEN,GRAPH_BASE_URL
+from instagram.status_waiter import WaitState
+import offline
+from offline.services import LOCAL_GRAPH
+
+# Sesión compartida (keep-alive con graph.facebook.com) para todas las llamadas.
+# requests.Session es seguro para peticiones concurrentes sencillas como estas.
+SESSION = requests.Session()
+
+
+def _session():
+    """SESSION, o la Graph API local en modo offline (offline/services.py)."""
+    return LOCAL_GRAPH if offline.is_offline() else SESSION
 
 class InstagramClient:
     def __init__(self, ig_user_id: Optional[str] = None, page_token: Optional[str] = None):
         self.ig_user_id = ig_user_id or ES_IG_USER_ID
         self.page_token = page_token or ES_PAGE_TOKEN
 
-        if not self.ig_user_id or not self.page_token:
+        if (not self.ig_user_id or not self.page_token) and not offline.is_offline():
             raise ValueError("Faltan IG_USER_ID o PAGE_TOKEN en variables de entorno.")
 
     # ---------- 1) Crear contenedor de Reel ----------
@@ -33,7 +47,7 @@ class InstagramClient:
             # "share_to_feed": "true",  # para que salga también en el feed
         }
 
-        resp = requests.post(endpoint, data=payload, timeout=30)
+        resp = _session().post(endpoint, data=payload, timeout=30)
         try:
             resp.raise_for_status()
         except Exception as e:
@@ -47,44 +61,95 @@ class InstagramClient:
 
     # ---------- 2) Polling hasta que el contenedor esté listo ----------
 
-    def wait_until_ready(self, creation_id: str, timeout_sec: int = 300, poll_interval: int = 5) -> bool:
-        """
-        Hace polling hasta que el media container pasa a 'FINISHED' o falle.
-        Devuelve True si está listo, False si no.
-        """
-        endpoint = f"{GRAPH_BASE_URL}/{creation_id}"
-        params = {
+    def _status_params(self) -> dict:
+        return {
             "fields": "status_code,status",
             "access_token": self.page_token,
         }
 
-        start = time.time()
-        while True:
-            resp = requests.get(endpoint, params=params, timeout=15)
-            if resp.status_code != 200:
-                print("⚠️ Error al consultar estado del contenedor:", resp.text)
-                time.sleep(poll_interval)
-                continue
-
-            data = resp.json()
-            status_code = data.get("status_code")
-            status = data.get("status")
-
-            print(f"⏳ Estado contenedor {creation_id}: {status_code} ({status})")
-
-            if status_code == "FINISHED":
-                print("✅ Video procesado y listo para publicar.")
-                return True
+    def _poll_status(self, creation_id: str) -> Tuple[Optional[dict], Optional[str]]:
+        """Una consulta de estado: (data, None) si 200, (None, error) si no."""
+        try:
+            resp = _session().get(
+                f"{GRAPH_BASE_URL}/{creation_id}",
+                params=self._status_params(),
+                timeout=15,
+            )
+        except requests.RequestException as e:
+            return None, str(e)
+        if resp.status_code != 200:
+            return None, f"HTTP {resp.status_code}: {resp.text[:300]}"
+        return resp.json(), None
+
+    def wait_until_ready(
+        self,
+        creation_id: str,
+        timeout_sec: int = 300,
+        poll_interval: int = 15,
+        cancel_event: Optional[threading.Event] = None,
+        video_bytes: Optional[int] = None,
+        max_errors: int = 5,
+    ) -> bool:
+        """
+        Hace polling hasta que el media container pasa a 'FINISHED' o falle.
+        Devuelve True si está listo, False si no.
 
-            if status_code in ("ERROR", "EXPIRED"):
-                print("❌ Error procesando el vídeo:", data)
+        - La primera consulta y el ritmo posterior dependen del tiempo
+          estimado (video_bytes + histórico, ver status_waiter); poll_interval
+          es el intervalo máximo del backoff.
+        - timeout_sec es un límite duro: cuenta también los errores HTTP/red.
+        - Si se pasa cancel_event y se activa, deja de esperar y devuelve False.
+        """
+        st = WaitState(
+            creation_id,
+            timeout_sec=timeout_sec,
+            max_interval=poll_interval,
+            max_errors=max_errors,
+            video_bytes=video_bytes,
+        )
+        while True:
+            delay = st.next_delay()
+            cancelled = cancel_event.wait(delay) if cancel_event is not None else time.sleep(delay)
+            if cancelled:
+                print("⛔ Espera del contenedor cancelada.")
                 return False
 
-            if (time.time() - start) > timeout_sec:
-                print("⏰ Timeout esperando a que el vídeo esté listo.")
+            data, error = self._poll_status(creation_id)
+            done = st.on_error(error) if error is not None else st.on_status(data)
+            if done is not None:
+                return done
+
+    async def wait_until_ready_async(
+        self,
+        creation_id: str,
+        timeout_sec: int = 300,
+        poll_interval: int = 15,
+        cancel_event: Optional[threading.Event] = None,
+        video_bytes: Optional[int] = None,
+        max_errors: int = 5,
+    ) -> bool:
+        """
+        Igual que wait_until_ready pero sin bloquear el event loop: las
+        esperas son asyncio.sleep y la petición va a un hilo. Pensado para
+        esperar varios contenedores a la vez (ver wait_many).
+        """
+        st = WaitState(
+            creation_id,
+            timeout_sec=timeout_sec,
+            max_interval=poll_interval,
+            max_errors=max_errors,
+            video_bytes=video_bytes,
+        )
+        while True:
+            await asyncio.sleep(st.next_delay())
+            if cancel_event is not None and cancel_event.is_set():
+                print("⛔ Espera del contenedor cancelada.")
                 return False
 
-            time.sleep(poll_interval)
+            data, error = await asyncio.to_thread(self._poll_status, creation_id)
+            done = st.on_error(error) if error is not None else st.on_status(data)
+            if done is not None:
+                return done
 
     # ---------- 3) Publicar el Reel ----------
 
@@ -99,7 +164,7 @@ class InstagramClient:
             "access_token": self.page_token,
         }
 
-        resp = requests.post(endpoint, data=payload, timeout=30)
+        resp = _session().post(endpoint, data=payload, timeout=30)
         try:
             resp.raise_for_status()
         except Exception as e:
@@ -119,8 +184,50 @@ class InstagramClient:
             "fields": "permalink",
             "access_token": self.page_token,
         }
-        resp = requests.get(endpoint, params=params, timeout=15)
+        resp = _session().get(endpoint, params=params, timeout=15)
         if resp.status_code != 200:
             print("⚠️ Error obteniendo permalink:", resp.text)
             return None
         return resp.json().get("permalink")
+
+
+# ---------- Esperar varios contenedores a la vez (varios markets) ----------
+
+async def wait_many(
+    containers: Iterable[Tuple[InstagramClient, str, Optional[int]]],
+    timeout_sec: int = 300,
+    cancel_event: Optional[threading.Event] = None,
+) -> Dict[str, bool]:
+    """
+    containers: (cliente, creation_id, video_bytes) por reel.
+    Devuelve {creation_id: listo}. Un error en un contenedor no para los demás.
+    """
+    containers = list(containers)
+    results = await asyncio.gather(
+        *(
+            client.wait_until_ready_async(
+                creation_id,
+                timeout_sec=timeout_sec,
+                cancel_event=cancel_event,
+                video_bytes=video_bytes,
+            )
+            for client, creation_id, video_bytes in containers
+        ),
+        return_exceptions=True,
+    )
+    out: Dict[str, bool] = {}
+    for (_, creation_id, _), res in zip(containers, results):
+        if isinstance(res, Exception):
+            print(f"❌ Error esperando el contenedor {creation_id}: {res}")
+            res = False
+        out[creation_id] = bool(res)
+    return out
+
+
+def wait_many_ready(
+    containers: Iterable[Tuple[InstagramClient, str, Optional[int]]],
+    timeout_sec: int = 300,
+    cancel_event: Optional[threading.Event] = None,
+) -> Dict[str, bool]:
+    """Versión síncrona de wait_many (para main.py, fuera de un event loop)."""
+    return asyncio.run(wait_many(containers, timeout_sec=timeout_sec, cancel_event=cancel_event))
@@ -0,0 +1,187 @@
+# instagram/status_waiter.py
+"""
+Espera adaptativa del procesado de un contenedor de Reel en IG.
+
+- Estima cuánto tardará IG a partir del tamaño del MP4 y de las esperas
+  anteriores (PROCESSING_HISTORY_FILE), y no consulta antes de tiempo.
+- Backoff exponencial entre consultas (tope max_interval), apuntando a la
+  hora estimada de fin.
+- Deadline duro: los errores HTTP/red cuentan contra el timeout y, tras
+  max_errors seguidos, se abandona.
+
+WaitState no hace I/O: decide cuánto esperar y qué hacer con cada
+respuesta, para que InstagramClient.wait_until_ready (sync) y
+wait_until_ready_async compartan la misma lógica.
+"""
+from __future__ import annotations
+
+import json
+import statistics
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Optional, Tuple
+
+PROCESSING_HISTORY_FILE = Path("instagram/processing_history.json")
+HISTORY_SIZE = 50
+
+# Sin histórico: ~15 s fijos + ~4 s por MB
+DEFAULT_BASE_SEC = 15.0
+DEFAULT_SEC_PER_MB = 4.0
+
+MIN_INTERVAL = 2.0
+BACKOFF = 1.6
+
+
+class ProcessingEstimator:
+    """Histórico (MB, segundos) de procesados de IG, compartido por proceso."""
+
+    def __init__(self, path: Path = PROCESSING_HISTORY_FILE, size: int = HISTORY_SIZE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=size)
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                for mb, sec in json.load(f):
+                    self._samples.append((float(mb), float(sec)))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ Histórico de procesado IG ilegible ({self.path}): {e}")
+
+    def _save(self) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(list(self._samples), f)
+            tmp.replace(self.path)
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar el histórico de procesado IG: {e}")
+
+    def estimate(self, video_bytes: Optional[int]) -> float:
+        mb = (video_bytes or 0) / 2**20
+        with self._lock:
+            samples = list(self._samples)
+
+        if len(samples) < 3:
+            return DEFAULT_BASE_SEC + DEFAULT_SEC_PER_MB * mb
+
+        if not video_bytes:
+            return statistics.median(sec for _, sec in samples)
+
+        # segundos por MB (mediana, robusta a algún procesado atascado)
+        rate = statistics.median(sec / max(m, 0.5) for m, sec in samples)
+        return rate * max(mb, 0.5)
+
+    def record(self, video_bytes: Optional[int], seconds: float) -> None:
+        if not video_bytes or seconds <= 0:
+            return
+        with self._lock:
+            self._samples.append((round(video_bytes / 2**20, 3), round(seconds, 2)))
+            self._save()
+
+
+ESTIMATOR = ProcessingEstimator()
+
+
+class WaitState:
+    """
+    Plan de consultas para un contenedor.
+
+    Uso:
+        st = WaitState(...)
+        while True:
+            sleep(st.next_delay())
+            done = st.on_status(data) / st.on_error(msg)
+            if done is not None: return done
+    """
+
+    def __init__(
+        self,
+        creation_id: str,
+        timeout_sec: float = 300,
+        max_interval: float = 15,
+        max_errors: int = 5,
+        video_bytes: Optional[int] = None,
+        estimator: ProcessingEstimator = ESTIMATOR,
+    ):
+        self.creation_id = creation_id
+        self.video_bytes = video_bytes
+        self.estimator = estimator
+        self.max_interval = max(float(max_interval), MIN_INTERVAL)
+        self.max_errors = max_errors
+
+        self.started = time.monotonic()
+        self.deadline = self.started + float(timeout_sec)
+        self.expected = min(estimator.estimate(video_bytes), float(timeout_sec))
+        self.polls = 0
+        self.errors = 0
+        self._interval = MIN_INTERVAL
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        return self.deadline - time.monotonic()
+
+    def next_delay(self) -> float:
+        """Segundos a esperar antes de la siguiente consulta (0 = ya)."""
+        if self.polls == 0 and self.errors == 0:
+            # Primera consulta: a mitad de lo estimado (IG casi nunca es instantáneo)
+            delay = min(max(self.expected * 0.5, MIN_INTERVAL), 30.0)
+        else:
+            delay = self._interval
+            self._interval = min(self._interval * BACKOFF, self.max_interval)
+            # No pasarnos de la hora estimada de fin si aún no ha llegado
+            to_expected = self.expected - self.elapsed
+            if to_expected > MIN_INTERVAL:
+                delay = min(delay, to_expected)
+        return max(0.0, min(delay, self.remaining()))
+
+    def timed_out(self) -> bool:
+        return self.remaining() <= 0
+
+    def on_error(self, message: str) -> Optional[bool]:
+        """Respuesta no-200 o error de red. False si hay que abandonar."""
+        self.errors += 1
+        print(f"⚠️ Error al consultar estado del contenedor ({self.errors}/{self.max_errors}): {message}")
+        if self.errors >= self.max_errors:
+            print("❌ Demasiados errores consultando el contenedor.")
+            return False
+        if self.timed_out():
+            print("⏰ Timeout esperando a que el vídeo esté listo.")
+            return False
+        return None
+
+    def on_status(self, data: Dict[str, Any]) -> Optional[bool]:
+        """True si está listo, False si falló/timeout, None para seguir."""
+        self.polls += 1
+        self.errors = 0
+        status_code = data.get("status_code")
+        status = data.get("status")
+
+        print(
+            f"⏳ Estado contenedor {self.creation_id}: {status_code} ({status}) "
+            f"t={self.elapsed:.0f}s/~{self.expected:.0f}s"
+        )
+
+        if status_code == "FINISHED":
+            print("✅ Video procesado y listo para publicar.")
+            self.estimator.record(self.video_bytes, self.elapsed)
+            return True
+
+        if status_code in ("ERROR", "EXPIRED"):
+            print("❌ Error procesando el vídeo:", data)
+            return False
+
+        if self.timed_out():
+            print("⏰ Timeout esperando a que el vídeo esté listo.")
+            return False
+
+        return None
@@ -5,25 +5,24 @@ from pathlib import Path
 from datetime import date, timedelta
 
 import run_services as rn
-import flights.aggregator as ag
-import media.video_generator as vg
-import content.caption_builder as cb
+import offline
+import offline.fixtures as fixtures
+from config.lazy_import import lazy_module, preload
 import review.telegram_review as tr
-from instagram.ig_client import InstagramClient
-import affiliates.affiliates as af
-import web.exporter as ex
-import web.uploader as up
+import review.publisher as pub
+import review.candidate_builder as candidate_builder
 from flights.base import Flight
-from flights.published_history import is_recently_published, register_publication
+from flights.published_history import is_recently_published
 # from content.video_hook import build_video_hook
 # import content.video_hook_premium as vh
-from content.destinations import get_country
-import content.video_hook_curiosity as vh
-import media.reel_ab as rab
 from config.markets import MARKETS
+from config.settings import REVIEW_POOL_PER_CATEGORY
 import argparse
 from flights.published_history import make_flight_key
 
+# Módulos pesados: se cargan en el primer uso (ver config/lazy_import.py)
+ag = lazy_module("flights.aggregator")
+
 # LOGO_PATH = "media/images/EscapGo_circ_logo_transparent.png"
 # VIDEO_PATH = "media/videos/reel.mp4"
 # MARKET = "PMI"
@@ -43,11 +42,11 @@ def choose_random_search_window(min_months=1, max_months=1):
 # ----------------------------------------------
 # 2) Elegir main candidate
 # ----------------------------------------------
-def pick_main_candidate(cfg, min_discount_pct=40.0):
-    start, end = choose_random_search_window()
+def pick_main_candidate(cfg, min_discount_pct=40.0, window=None):
+    start, end = window or choose_random_search_window()
     print(f"🔎 [{cfg.code}] Buscando vuelos entre {start} y {end}")
 
-    flights = ag.get_flights_in_period(start, end, cfg.origin_iata)  # ✅ origin
+    flights = ag.get_flights_in_period(start, end, cfg.origin_iata, cfg.providers)  # ✅ origin
     print(f"   {len(flights)} vuelos encontrados")
 
     flights = [
@@ -63,73 +62,64 @@ def pick_main_candidate(cfg, min_discount_pct=40.0):
     if not flights:
         raise RuntimeError(f"[{cfg.code}] No hay vuelos nuevos")
 
-    best_by_cat = ag.get_best_by_category_scored(
-        flights, min_discount_pct=min_discount_pct
+    # Pool top-k por categoría (alternativas para "🔁 Otro"); el mejor de
+    # cada una se verifica en vivo antes de renderizar nada
+    pool = ag.get_top_by_category_scored(
+        flights, min_discount_pct=min_discount_pct, top_k=REVIEW_POOL_PER_CATEGORY
+    )
+    best_by_cat = ag.get_best_by_category_live(
+        flights, min_discount_pct=min_discount_pct, pool=pool
     )
 
     if not best_by_cat:
         raise RuntimeError(f"[{cfg.code}] No hay vuelos con descuento suficiente")
 
     main_item = ag.choose_main_candidate_prob(best_by_cat)
-    return main_item, best_by_cat, flights
+    return main_item, best_by_cat, flights, pool
 
 
 # ----------------------------------------------
 # 3–4) Generar VIDEO + CAPTION
 # ----------------------------------------------
-def build_video_and_caption(cfg, main_item):
+def build_video_and_caption(cfg, main_item, encode_profile="preview"):
     main_flight: Flight = main_item["flight"]
     main_category_code = (
         main_item.get("category_code")
         or main_item.get("category", {}).get("code")
     )
 
-    brand_handle = cfg.ig_handle
+    # Un vídeo por job: cfg.video_path es el mismo para todos los markets
+    job_id = main_item.setdefault("job_id", str(uuid.uuid4()))
+    video_path = tr.review_video_path(job_id, 0)
+    video_path.parent.mkdir(parents=True, exist_ok=True)
 
-    
-    # importlib.reload(cb)
-    caption_text = cb.build_caption_for_flight(
+    # Caption (OpenAI) y render en paralelo: ver review/candidate_builder.py
+    build = candidate_builder.build_candidate(
         main_flight,
+        out_path=video_path,
+        brand_handle=cfg.ig_handle,
         category_code=main_category_code,
-        tone="emocional",
-        brand_handle=cfg.ig_handle,   # 👈 si tu caption_builder lo soporta
-    )
-
-    video_hook = vh.build_video_hook_curiosity(
         category_label=str(main_category_code),
-        country=get_country(main_flight.destination),
-        discount_pct=getattr(main_flight, "discount_pct", None),
-        price=getattr(main_flight, "price", None),
-        start_date=str(main_flight.start_date)[:10],
-        end_date=str(main_flight.end_date)[:10],
-        max_len=44,
-    )
-
-    # importlib.reload(vg)
-    video_path_or_url, variant_used, origin_pill_variant = rab.create_reel_for_flight_ab(
-        main_flight,
-        out_mp4_path=cfg.video_path,
         logo_path=cfg.logo_path,
-        duration=6.0,
-        brand_line=brand_handle,
-        s3_bucket=None,
-        hook_text=video_hook,
-        hook_mode="band",
-        variant="auto",
-        ratio_new=cfg.ab_ratio_new,
-        key_mode="route_dates",
-        origin_pill_ab_ratio=1,  # ✅ pill A/B 50/50 (ajústalo si quieres por market)
+        ab_ratio_new=cfg.ab_ratio_new,
+        encode_profile=encode_profile,   # "preview" para review, "publish" para IG directo
     )
-    
-    print("AB variant:", variant_used, "| origin pill:", origin_pill_variant)
+    caption_text = build.caption
+    video_hook = build.video_hook
+    combined_variant = build.variant
+    origin_pill_variant = build.origin_pill_variant
+    # Fondo elegido aquí para poder repetir el mismo en el encode final
+    bg_image_path = build.bg_image_path
 
-    combined_variant = f"{variant_used}|{origin_pill_variant}"
+    print("AB variant:", combined_variant)
 
-    
     # guarda para telegram_review
     main_item["video_hook"] = video_hook
     main_item["variant_used"] = combined_variant
     main_item["origin_pill_variant"] = origin_pill_variant
+    main_item["encode_profile"] = encode_profile
+    main_item["bg_image_path"] = bg_image_path
+    main_item["video_path"] = str(video_path)
 
     return main_flight, main_category_code, caption_text
 
@@ -139,15 +129,15 @@ def build_video_and_caption(cfg, main_item):
 #   👉 Aquí reordenamos candidatos para que el main
 #      quede SIEMPRE en índice 0.
 # ----------------------------------------------
-def send_to_review(cfg, main_item, best_by_cat, caption_text):
+def send_to_review(cfg, main_item, best_by_cat, caption_text, pool=None):
     main_flight: Flight = main_item["flight"]
     main_cat_code = (
         main_item.get("category_code")
         or main_item.get("category", {}).get("code")
     )
 
-    job_id = str(uuid.uuid4())
-    review_candidates = tr.to_review_candidates(best_by_cat)
+    job_id = main_item.get("job_id") or str(uuid.uuid4())
+    review_candidates = tr.to_review_candidates(best_by_cat, pool)
 
     main_key = make_flight_key(main_flight)
     main_idx = 0
@@ -188,14 +178,19 @@ def send_to_review(cfg, main_item, best_by_cat, caption_text):
         # ✅ Resto como ya lo tenías
         flight=main_flight,
         caption=caption_text,
-        video_path=Path(cfg.video_path),
+        video_path=Path(main_item.get("video_path") or cfg.video_path),
         candidates=review_candidates,
         video_hook=main_item.get("video_hook"),
-        variant=main_item.get("variant_used")
+        variant=main_item.get("variant_used"),
+        encode_profile=main_item.get("encode_profile"),
+        bg_image_path=main_item.get("bg_image_path"),
     )
 
     tr.send_review_candidate(job_id)
     print(f"📲 [{cfg.code}] Enviado a review. job_id={job_id}")
+
+    # Pre-render en segundo plano del resto de candidatos ("🔁 Otro" instantáneo)
+    tr.start_prerender(job_id)
     return job_id
 
 
@@ -204,56 +199,41 @@ def send_to_review(cfg, main_item, best_by_cat, caption_text):
 # (esta función queda para modo auto_publish futuro)
 # ----------------------------------------------
 def publish_to_instagram_and_update_web(cfg, main_item, caption_text):
+    """
+    Publicación directa (sin review) con el mismo orquestador que el botón
+    "✅ Publicar": IG en serie, web + histórico en paralelo.
+    """
     main_flight = main_item["flight"]
 
-    print("📤 Subiendo vídeo a S3 para Instagram...")
-    video_url = vg.upload_reel_to_s3(
-        cfg.video_path,                 # ✅ por market
-        bucket="escapadasgo-reels",
-        prefix=cfg.s3_reels_prefix,     # ✅ pmi/ bcn/ ...
-    )
-
     print("📤 Publicando en Instagram...")
-    ig = InstagramClient(
+    req = pub.PublishRequest(
+        video_path=main_item.get("video_path") or cfg.video_path,
+        caption=caption_text,
         ig_user_id=cfg.ig_user_id,
         page_token=cfg.page_token,
-    )
-
-    creation_id = ig.create_reel_container(video_url=video_url, caption=caption_text)
-    if not ig.wait_until_ready(creation_id):
-        print("❌ Instagram no procesó el vídeo")
-        return None
-
-    print(f"[PUBLISH] market={cfg.code} handle={cfg.ig_handle} ig_user_id={cfg.ig_user_id} token_suffix={cfg.page_token[-10:]}")
-    
-    reel_id = ig.publish_reel(creation_id)
-    permalink = ig.get_media_permalink(reel_id)
-    print(f"   ✔ Publicado: {permalink}")
-
-    print("🗂 Actualizando web...")
-    affiliate_url = af.build_affiliate_url_for_flight(main_flight)
-
-    # ✅ JSON path por market (tú decides estructura)
-    json_path = cfg.web_json_path  # ej: "web/mallorca/flights_of_the_day.json" o "web/es/..."
-
-    data = ex.update_flights_json(
+        ig_handle=cfg.ig_handle,
+        flight=main_flight,
         main_item=main_item,
-        json_path=json_path,
-        market=cfg.code,                 # ✅ market real
-        reel_url=permalink,
-        affiliate_url=affiliate_url,
-        max_entries=5,
+        market=cfg.code,                           # ✅ market real
+        web_key_prefix=cfg.web_key_prefix,
+        category_code=(
+            main_item.get("category_code")
+            or (main_item.get("category") or {}).get("code")
+            or ""
+        ),
+        s3_prefix=cfg.s3_reels_prefix,             # ✅ pmi/ bcn/ ...
+        label=f"auto:{cfg.code}",
     )
+    result = pub.publish(req)
 
-    # ✅ subida S3 con key por market/prefix
-    up.upload_flights_json(data, key=f"{cfg.web_key_prefix}flights_of_the_day.json")
-
-    print("   ✔ Web actualizada")
+    if not result.ok:
+        print(f"❌ Instagram no procesó el vídeo: {result.error}")
+        return None
 
-    register_publication(main_flight, category_code=main_item.get("category_code"))
-    print("📝 Histórico actualizado")
+    for w in result.warnings:
+        print(f"⚠️ {w}")
 
-    return permalink
+    return result.permalink or result.video_url
 
 
 
@@ -305,20 +285,22 @@ def publish_to_instagram_and_update_web(cfg, main_item, caption_text):
 #         # Aquí podrías cerrar servicios si usas rn.start_services()
 #         pass
 
-def run_daily_workflow(cfg, auto_publish=False):
+def run_daily_workflow(cfg, auto_publish=False, window=None):
     print(f"🚀 Daily workflow market={cfg.code} origin={cfg.origin_iata}")
 
-    main_item, best_by_cat, flights = pick_main_candidate(
+    main_item, best_by_cat, flights, pool = pick_main_candidate(
         cfg=cfg,
         min_discount_pct=cfg.min_discount_pct,
+        window=window,
     )
 
     main_flight, main_category_code, caption_text = build_video_and_caption(
         cfg=cfg,
         main_item=main_item,
+        encode_profile="publish" if auto_publish else "preview",
     )
 
-    job_id = send_to_review(cfg, main_item, best_by_cat, caption_text)
+    job_id = send_to_review(cfg, main_item, best_by_cat, caption_text, pool)
     return job_id
 
 
@@ -330,19 +312,51 @@ def parse_markets_arg(s: str):
 
 
 if __name__ == "__main__":
-    print("🔧 Levantando servicios (web + Telegram)...")
-    proc = rn.start_services()  # UNA VEZ
-
     ap = argparse.ArgumentParser()
     ap.add_argument("--markets", default="PMI,BCN,MAD,VLC", help="Comma-separated markets")
     ap.add_argument("--auto_publish", action="store_true")
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument("--record", action="store_true", help="Graba respuestas de proveedores y captions en fixtures")
+    mode.add_argument("--offline", action="store_true", help="Sin red: reproduce los fixtures grabados")
     args = ap.parse_args()
 
+    if args.offline:
+        offline.enable("replay")
+    elif args.record:
+        offline.enable("record")
+
+    if offline.is_offline():
+        print("🧪 Modo offline: no se levantan servicios (web + Telegram)")
+    else:
+        print("🔧 Levantando servicios (web + Telegram)...")
+        proc = rn.start_services()  # UNA VEZ
+
     markets = parse_markets_arg(args.markets)
 
+    # Caption, render y pre-render usan hilos: módulos perezosos cargados ya
+    preload(ag)
+    candidate_builder.preload()
+
+    # Misma ventana para todos los markets: Kiwi se pide una vez para todos.
+    # En offline, la de la grabación (los fixtures van por ventana).
+    window = (fixtures.recorded_window() if offline.is_offline() else None) or choose_random_search_window()
+    if offline.is_recording():
+        fixtures.save_manifest(window, markets)
+    ag.prefetch_kiwi(
+        [
+            MARKETS[m].origin_iata
+            for m in markets
+            if m in MARKETS and "kiwi" in MARKETS[m].providers
+        ],
+        *window,
+    )
+
     for m in markets:
         cfg = MARKETS[m]
         try:
-            run_daily_workflow(cfg, auto_publish=args.auto_publish)
+            run_daily_workflow(cfg, auto_publish=args.auto_publish, window=window)
         except Exception as e:
-            print(f"❌ Error en market {m}: {e}")
\ No newline at end of file
+            print(f"❌ Error en market {m}: {e}")
+
+    # Los pre-renders van en hilos: hay que esperarlos antes de salir
+    tr.shutdown_prerender()
\ No newline at end of file
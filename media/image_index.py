@@ -0,0 +1,207 @@
+# media/image_index.py
+"""
+Índice de imágenes de fondo + caché de fondos ya ajustados a 1080x1920.
+
+- ImageIndex: lista media/images una vez y agrupa por prefijo; se
+  reconstruye solo si cambia el mtime del directorio (añadir/borrar fotos).
+  El prefijo se compara sin distinguir mayúsculas, igual que glob en Windows
+  (donde "DEFAULT*" también encuentra Default1.jpg).
+
+- fitted_background: devuelve el fondo ya recortado/escalado (cover) a
+  width x height. El resultado se guarda en media/cache/backgrounds como
+  array crudo (.npy), así que un render no vuelve a decodificar el JPEG ni
+  a hacer el LANCZOS de fit_cover.
+
+Pre-generar toda la caché (p.ej. tras añadir fotos):
+    python -m media.image_index
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+IMAGES_DIR = Path("media/images")
+BG_CACHE_DIR = Path("media/cache/backgrounds")
+
+# Longitud de la clave de bucket (los códigos IATA tienen 3 letras)
+_BUCKET_LEN = 3
+
+
+def fit_cover(img: Image.Image, target_w: int, target_h: int) -> Image.Image:
+    """
+    Resize estilo 'cover':
+    - Mantiene proporción
+    - Asegura que la imagen cubra completamente target_w x target_h
+    - Recorta el exceso por los lados
+    """
+    src_w, src_h = img.size
+    src_ratio = src_w / src_h
+    target_ratio = target_w / target_h
+
+    # Determinar si escalamos por ancho o por alto
+    if src_ratio > target_ratio:
+        # Imagen demasiado ancha → ajustar por altura
+        new_h = target_h
+        new_w = int(new_h * src_ratio)
+    else:
+        # Imagen demasiado alta → ajustar por anchura
+        new_w = target_w
+        new_h = int(new_w / src_ratio)
+
+    # Resize con alta calidad
+    img_resized = img.resize((new_w, new_h), Image.LANCZOS)
+
+    # Recorte centrado
+    x0 = (new_w - target_w) // 2
+    y0 = (new_h - target_h) // 2
+    x1 = x0 + target_w
+    y1 = y0 + target_h
+
+    return img_resized.crop((x0, y0, x1, y1))
+
+
+# ---------------------------------------------------------------------------
+# Índice IATA → fotos
+# ---------------------------------------------------------------------------
+
+class ImageIndex:
+    def __init__(self, images_dir: Path = IMAGES_DIR):
+        self.images_dir = Path(images_dir)
+        self._mtime_ns: Optional[int] = None
+        self._buckets: Dict[str, List[Path]] = {}
+        self._lock = threading.Lock()
+
+    def _refresh_if_needed(self) -> None:
+        try:
+            mtime_ns = self.images_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._mtime_ns, self._buckets = None, {}
+            return
+
+        if mtime_ns == self._mtime_ns:
+            return
+
+        with self._lock:
+            if mtime_ns == self._mtime_ns:
+                return
+            buckets: Dict[str, List[Path]] = {}
+            for p in sorted(self.images_dir.iterdir()):
+                # Igual que el antiguo glob("X*.*"): ficheros con extensión
+                if p.is_file() and "." in p.name:
+                    buckets.setdefault(p.name[:_BUCKET_LEN].upper(), []).append(p)
+            self._buckets = buckets
+            self._mtime_ns = mtime_ns
+
+    def candidates(self, prefix: str) -> List[Path]:
+        """Fotos cuyo nombre empieza por `prefix` (sin distinguir mayúsculas), ordenadas."""
+        self._refresh_if_needed()
+        prefix = (prefix or "").upper()
+        if not prefix:
+            return []
+        bucket = self._buckets.get(prefix[:_BUCKET_LEN], [])
+        return [p for p in bucket if p.name.upper().startswith(prefix)]
+
+
+_INDEXES: Dict[str, ImageIndex] = {}
+
+
+def get_index(images_dir: Path = IMAGES_DIR) -> ImageIndex:
+    key = str(Path(images_dir).resolve())
+    idx = _INDEXES.get(key)
+    if idx is None:
+        idx = _INDEXES.setdefault(key, ImageIndex(images_dir))
+    return idx
+
+
+# ---------------------------------------------------------------------------
+# Caché de fondos ajustados
+# ---------------------------------------------------------------------------
+
+def _cache_path(src: Path, width: int, height: int) -> Path:
+    st = src.stat()
+    key = f"{src.resolve()}|{st.st_mtime_ns}|{st.st_size}|{width}x{height}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return BG_CACHE_DIR / f"{src.stem}_{width}x{height}_{digest}.npy"
+
+
+def _fit_size(width: int, height: int, oversample: float) -> tuple[int, int]:
+    return int(round(width * oversample)), int(round(height * oversample))
+
+
+@lru_cache(maxsize=4)
+def _load_fitted(src_str: str, mtime_ns: int, width: int, height: int) -> Image.Image:
+    # mtime_ns forma parte de la clave para invalidar si se reemplaza la foto
+    src = Path(src_str)
+    cache_file = _cache_path(src, width, height)
+
+    if cache_file.exists():
+        try:
+            return Image.fromarray(np.load(cache_file), "RGB")
+        except Exception as e:
+            print(f"⚠️ Caché de fondo corrupta ({cache_file.name}): {e}. Regenerando…")
+
+    img = fit_cover(Image.open(src).convert("RGB"), width, height)
+
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # Escritura atómica: los workers de pre-render pueden coincidir
+        tmp = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+        with tmp.open("wb") as f:
+            np.save(f, np.asarray(img, dtype=np.uint8))
+        os.replace(tmp, cache_file)
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar el fondo en caché: {e}")
+
+    return img
+
+
+def fitted_background(
+    src_path: str | Path,
+    width: int,
+    height: int,
+    oversample: float = 1.0,
+) -> Image.Image:
+    """
+    Fondo RGB ya en modo cover a (width*oversample, height*oversample).
+    La imagen devuelta puede estar compartida (lru_cache): NO modificarla in-place.
+    """
+    src = Path(src_path)
+    w, h = _fit_size(width, height, oversample)
+    return _load_fitted(str(src), src.stat().st_mtime_ns, w, h)
+
+
+def prefit_all(
+    width: int,
+    height: int,
+    oversample: float = 1.0,
+    images_dir: Path = IMAGES_DIR,
+) -> int:
+    """Genera la caché para todas las fotos del índice. Devuelve cuántas hay."""
+    idx = get_index(images_dir)
+    idx._refresh_if_needed()
+    n = 0
+    for paths in idx._buckets.values():
+        for p in paths:
+            if p.suffix.lower() not in (".jpg", ".jpeg", ".png", ".webp"):
+                continue
+            try:
+                fitted_background(p, width, height, oversample)
+                n += 1
+            except Exception as e:
+                print(f"⚠️ {p.name}: {e}")
+    _load_fitted.cache_clear()
+    return n
+
+
+if __name__ == "__main__":
+    from media.video_generator import WIDTH, HEIGHT, BG_OVERSAMPLE
+
+    n = prefit_all(WIDTH, HEIGHT, BG_OVERSAMPLE)
+    print(f"✅ {n} fondos en caché ({BG_CACHE_DIR})")
@@ -0,0 +1,76 @@
+# media/masks.py
+"""
+Máscaras y capas de degradado precalculadas (NumPy) para los generadores
+de vídeo. Se cachean por (tamaño, opacidades) porque en un reel se repiten
+en todos los frames con los mismos parámetros.
+
+Las capas devueltas se comparten: NO modificarlas in-place
+(alpha_composite / Image.alpha_composite no las tocan).
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+
+@lru_cache(maxsize=16)
+def vertical_ramp(height: int, top_opacity: float, bottom_opacity: float) -> np.ndarray:
+    """
+    Alpha 0..255 (uint8, shape (height,)) que va linealmente de
+    top_opacity (fila 0) a bottom_opacity (última fila).
+    """
+    if height <= 1:
+        return np.array([int(top_opacity * 255)] * max(height, 0), dtype=np.uint8)
+    t = np.arange(height, dtype=np.float64) / (height - 1)
+    alpha = top_opacity * (1.0 - t) + bottom_opacity * t
+    # int() trunca, igual que el antiguo bucle con putpixel
+    return (alpha * 255).astype(np.uint8)
+
+
+@lru_cache(maxsize=16)
+def vertical_gradient_layer(
+    size: tuple[int, int],
+    top_opacity: float,
+    bottom_opacity: float,
+    color: tuple[int, int, int] = (0, 0, 0),
+) -> Image.Image:
+    """
+    Capa RGBA de tamaño `size` con `color` y el alpha de vertical_ramp,
+    lista para Image.alpha_composite(base, capa).
+    """
+    w, h = size
+    arr = np.empty((h, w, 4), dtype=np.uint8)
+    arr[..., :3] = color
+    arr[..., 3] = vertical_ramp(h, top_opacity, bottom_opacity)[:, None]
+    return Image.fromarray(arr, "RGBA")
+
+
+@lru_cache(maxsize=16)
+def center_fade_ramp(width: int, max_alpha: int) -> np.ndarray:
+    """
+    Alpha uint8 (shape (width,)): max_alpha en el centro y 0 en los extremos.
+    """
+    denom = width - 1 if width > 1 else 1
+    rel = np.arange(width, dtype=np.float64) / denom
+    dist_center = np.abs(rel - 0.5) / 0.5
+    alpha = (max_alpha * (1.0 - dist_center)).astype(np.int64)
+    return np.clip(alpha, 0, 255).astype(np.uint8)
+
+
+@lru_cache(maxsize=128)
+def horizontal_fade_layer(
+    width: int,
+    height: int,
+    color: tuple[int, int, int],
+    max_alpha: int,
+) -> Image.Image:
+    """
+    Capa RGBA width x height con `color` y alpha center_fade_ramp en cada fila.
+    maxsize alto: durante el fade-in de la línea max_alpha cambia cada frame.
+    """
+    arr = np.empty((height, width, 4), dtype=np.uint8)
+    arr[..., :3] = color
+    arr[..., 3] = center_fade_ramp(width, max_alpha)[None, :]
+    return Image.fromarray(arr, "RGBA")
@@ -1,4 +1,5 @@
 import random
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 from datetime import datetime, date
@@ -12,13 +13,18 @@ from moviepy.editor import ImageClip, VideoFileClip, CompositeVideoClip, vfx
 from moviepy.video.io.ImageSequenceClip import ImageSequenceClip
 
 from content.destinations import get_city  # para convertir IATA → ciudad
-
-import uuid
-
-try:
-    import boto3
-except ImportError:
-    boto3 = None  # por si este módulo se importa en un entorno sin boto3
+from media import masks
+from media import image_index
+from media import render_profiler as rp
+from media.video_generator import (
+    DEFAULT_ENCODE_PROFILE,
+    BG_OVERSAMPLE,
+    get_encode_profile,
+    _output_size,
+    _write_videofile_kwargs,
+    _fit_font_to_width,
+    upload_reel_to_s3,
+)
 
 
 
@@ -34,7 +40,7 @@ FPS = 30
 # Paths
 # ---------------------------------------------------------------------------
 
-IMAGES_DIR = Path("media/images")
+IMAGES_DIR = image_index.IMAGES_DIR
 
 FONT_DEFAULT_PATH = "media/fonts/Montserrat-Regular.ttf"   # o la que uses
 FONT_ROUTE_PATH   = "media/fonts/DejaVuSans.ttf"           # nueva, con ✈
@@ -52,19 +58,14 @@ def pick_image_for_destination(
     - Si no hay, intenta DEFAULT*
     - Si tampoco, devuelve None
     """
-    images_dir = Path(images_dir)
-
-    if not images_dir.exists():
-        return None
+    index = image_index.get_index(images_dir)
 
     # 1) Intentar con el código IATA
-    candidates = sorted(
-        list(images_dir.glob(f"{destination_iata.upper()}*.*"))
-    )
+    candidates = index.candidates(destination_iata)
 
     # 2) Fallback a DEFAULT
     if not candidates:
-        candidates = sorted(list(images_dir.glob("DEFAULT*.*")))
+        candidates = index.candidates("DEFAULT")
 
     if not candidates:
         return None
@@ -193,6 +194,7 @@ def _find_font_path() -> Optional[str]:
 _FONT_PATH = _find_font_path()
 
 
+@lru_cache(maxsize=128)
 def _font(size: int, kind: str = "default") -> ImageFont.FreeTypeFont:
     """
     kind:
@@ -411,80 +413,25 @@ def _draw_horizontal_fade_line(
     else:
         r, g, b = color
 
-    grad = Image.new("RGBA", (line_w, line_h), (0, 0, 0, 0))
-    pixels = grad.load()
-
-    for i in range(line_w):
-        # 0 en la izquierda, 1 en la derecha
-        rel = i / (line_w - 1 if line_w > 1 else 1)
-        # distancia al centro (0 en el centro, 1 en los bordes)
-        dist_center = abs(rel - 0.5) / 0.5
-        alpha = int(max_alpha * (1.0 - dist_center))  # máximo en el centro, 0 en los bordes
-        if alpha < 0:
-            alpha = 0
-        pixels[i, 0] = (r, g, b, alpha)
-        # copiamos al resto de filas si width > 1
-        for j in range(1, line_h):
-            pixels[i, j] = (r, g, b, alpha)
+    # Capa precalculada (cacheada por tamaño/color/alpha)
+    grad = masks.horizontal_fade_layer(line_w, line_h, (r, g, b), int(max_alpha))
 
     # centramos verticalmente la línea alrededor de y
     paste_y = int(y - line_h / 2)
     base_img.alpha_composite(grad, (int(x0), paste_y))
     
 
-def _fit_cover(img: Image.Image, target_w: int, target_h: int) -> Image.Image:
-    """
-    Resize estilo 'cover':
-    - Mantiene proporción
-    - Asegura que la imagen cubra completamente target_w x target_h
-    - Recorta el exceso por los lados
-    """
-    src_w, src_h = img.size
-    src_ratio = src_w / src_h
-    target_ratio = target_w / target_h
-
-    # Determinar si escalamos por ancho o por alto
-    if src_ratio > target_ratio:
-        # Imagen demasiado ancha → ajustar por altura
-        new_h = target_h
-        new_w = int(new_h * src_ratio)
-    else:
-        # Imagen demasiado alta → ajustar por anchura
-        new_w = target_w
-        new_h = int(new_w / src_ratio)
-
-    # Resize con alta calidad
-    img_resized = img.resize((new_w, new_h), Image.LANCZOS)
-
-    # Recorte centrado
-    x0 = (new_w - target_w) // 2
-    y0 = (new_h - target_h) // 2
-    x1 = x0 + target_w
-    y1 = y0 + target_h
-
-    return img_resized.crop((x0, y0, x1, y1))
-
 def _apply_vertical_gradient(base: Image.Image) -> Image.Image:
     """
     Aplica un degradado negro de arriba (poco) a abajo (más opaco)
     para que la banda y el texto respiren.
     """
     base = base.convert("RGBA")
-    w, h = base.size
-
-    gradient = Image.new("L", (1, h))
-    for y in range(h):
-        t = y / (h - 1)
-        alpha_float = (
-            GRADIENT_TOP_OPACITY * (1 - t)
-            + GRADIENT_BOT_OPACITY * t
-        )
-        gradient.putpixel((0, y), int(alpha_float * 255))
-
-    alpha = gradient.resize((w, h))
-    black = Image.new("RGBA", (w, h), (0, 0, 0, 255))
-    black.putalpha(alpha)
 
+    # Capa negra con el degradado ya calculado (cacheada por tamaño/opacidades)
+    black = masks.vertical_gradient_layer(
+        base.size, GRADIENT_TOP_OPACITY, GRADIENT_BOT_OPACITY
+    )
     return Image.alpha_composite(base, black)
 
 def _rounded_rect(draw: ImageDraw.ImageDraw, xy, radius, fill, outline=None, width: int = 1):
@@ -492,13 +439,12 @@ def _rounded_rect(draw: ImageDraw.ImageDraw, xy, radius, fill, outline=None, wid
     draw.rounded_rectangle(xy, radius=radius, fill=fill, outline=outline, width=width)
 
 def _draw_centered_text(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.FreeTypeFont, center_x: int, y: int, fill):
-    bbox = font.getbbox(text)
-    w = bbox[2] - bbox[0]
-    h = bbox[3] - bbox[1]
+    w, h = _measure_text(font, text)
     x = center_x - w // 2
     draw.text((x, y), text, font=font, fill=fill)
     return h
 
+@lru_cache(maxsize=4096)
 def _measure_text(font: ImageFont.FreeTypeFont, text: str):
     bbox = font.getbbox(text)
     return bbox[2] - bbox[0], bbox[3] - bbox[1]
@@ -574,6 +520,8 @@ def _compose_frame(
     - píldora de categoría con sombra, solapando la tarjeta
     - @escapadasgo_mallorca abajo
     """
+    laps = rp.laps("compose")
+
     # --- Fondo ---
     bg = bg.convert("RGB")
     bg = bg.resize((WIDTH, HEIGHT), Image.LANCZOS)
@@ -582,6 +530,7 @@ def _compose_frame(
 
     frame = bg.copy().convert("RGBA")
     draw = ImageDraw.Draw(frame, "RGBA")
+    laps.split("bg")
 
     center_x = WIDTH // 2
 
@@ -606,6 +555,7 @@ def _compose_frame(
 
         frame.alpha_composite(glow_layer, (logo_x, logo_y))
         frame.alpha_composite(logo, (logo_x, logo_y))
+    laps.split("logo")
 
     # ============================================================
     # BANDA CENTRAL (tarjeta)
@@ -628,6 +578,7 @@ def _compose_frame(
     )
     shadow = shadow.filter(ImageFilter.GaussianBlur(18))
     frame.alpha_composite(shadow, (card_x0 - 20, card_y0 - 20))
+    laps.split("card_shadow")
 
     # Tarjeta principal
     _rounded_rect(
@@ -638,6 +589,7 @@ def _compose_frame(
         outline=COLORS["card_border"],
         width=2,
     )
+    laps.split("card")
 
     # ============================================================
     # PÍLDORA DE CATEGORÍA (con sombra, solapando la tarjeta)
@@ -661,6 +613,7 @@ def _compose_frame(
             text_color=COLORS.get("pill_text", (255, 255, 255)),
             border_color=COLORS.get("pill_border_soft", (255, 255, 255, 60)),
         )
+    laps.split("pill")
 
     # ============================================================
     # TIPOGRAFÍAS Y TEXTOS PRINCIPALES
@@ -677,16 +630,10 @@ def _compose_frame(
     min_route_size  = 58   # no bajaremos de aquí
     max_route_width = int(card_w * 0.82)  # margen lateral dentro de la tarjeta
 
-    current_size = base_route_size
-    route_main_font = _font(current_size, kind="default")
-
-    w_route_main, _ = _measure_text(route_main_font, route_main_text)
-
-    # Reducimos tamaño poco a poco hasta que quepa
-    while w_route_main > max_route_width and current_size > min_route_size:
-        current_size -= 2
-        route_main_font = _font(current_size, kind="default")
-        w_route_main, _ = _measure_text(route_main_font, route_main_text)
+    # Reducimos tamaño poco a poco hasta que quepa (cacheado por reel)
+    route_main_font = _fit_font_to_width(
+        route_main_text, "default", base_route_size, min_route_size, max_route_width
+    )
 
     # 2) Resto de fuentes (pueden quedarse fijas)
     route_codes_font = _font(50,  kind="route")
@@ -832,6 +779,7 @@ def _compose_frame(
             int(y),
             COLORS["red"],
         )
+    laps.split("texts")
 
     # ============================================================
     # BRAND LINE ABAJO
@@ -841,50 +789,16 @@ def _compose_frame(
         _, h_brand = _measure_text(brand_font, brand_line)
         brand_y = HEIGHT - SAFE_AREA - h_brand - 90
         _draw_centered_text(draw, brand_line, brand_font, center_x, brand_y, COLORS["brand"])
+    laps.split("brand")
 
     return frame
 
 
-def upload_reel_to_s3(
-    local_path: str,
-    bucket: str,
-    prefix: str = "reels/",
-    public: bool = True,
-) -> str:
-    """
-    Sube el MP4 a S3 y devuelve la URL pública (o la URL normal del bucket).
-    Requiere que boto3 esté configurado con credenciales válidas.
-    """
-    if boto3 is None:
-        raise RuntimeError("boto3 no está instalado en este entorno.")
-
-    s3 = boto3.client("s3")
-
-    lp = Path(local_path)
-    ext = lp.suffix or ".mp4"
-    # nombre único para evitar colisiones
-    key = f"{prefix}{uuid.uuid4().hex}{ext}"
-
-    extra_args = {"ContentType": "video/mp4"}
-    if public:
-        extra_args["ACL"] = "public-read"
-
-    s3.upload_file(
-        Filename=str(lp),
-        Bucket=bucket,
-        Key=key,
-        ExtraArgs=extra_args,
-    )
-
-    # URL pública estilo estándar; si usas CloudFront, aquí se cambia
-    url = f"https://{bucket}.s3.amazonaws.com/{key}"
-    return url
-    
-
 # ---------------------------------------------------------------------------
 # Creación del reel
 # ---------------------------------------------------------------------------
 
+@rp.profiled("old")
 def create_reel_v4(
     bg_image_path: str,
     out_mp4_path: str,
@@ -898,19 +812,26 @@ def create_reel_v4(
     brand_line: Optional[str] = None,
     discount_pct: Optional[float] = None,
     category_label: Optional[str] = None,
+    encode_profile: str = DEFAULT_ENCODE_PROFILE,
 ):
     """
     Genera un reel 1080x1920 con:
     - fondo con zoom/pan suave
     - overlay de degradado + banda + textos + logo
     usando _render_frame en cada fotograma.
+
+    encode_profile: clave de ENCODE_PROFILES ("publish" o "preview").
+    profile=True (kwarg del decorador) escribe <reel>.profile.json con tiempos por etapa.
     """
+    profile = get_encode_profile(encode_profile)
+    out_size = _output_size(profile)
 
-    # 1) Cargamos la imagen base y la adaptamos a 1080x1920 (cover)
-    base = Image.open(Path(bg_image_path)).convert("RGB")
-    base = _fit_cover(base, WIDTH, HEIGHT)  # debe quedar exactamente (WIDTH, HEIGHT)
+    # 1) Fondo ya adaptado a 1080x1920 (cover), desde la caché de fondos
+    with rp.stage("load_bg"):
+        base = image_index.fitted_background(bg_image_path, WIDTH, HEIGHT, BG_OVERSAMPLE)
 
     total_frames = int(round(duration * fps))
+    rp.set_meta(frames=total_frames, fps=fps, encode_profile=encode_profile, bg=str(bg_image_path))
     frames = []
 
     # Parámetros del zoom “loopable”: zoom sinusoidal, mismo valor al inicio y al final
@@ -925,18 +846,20 @@ def create_reel_v4(
         z = zoom_center + zoom_amp * math.sin(2 * math.pi * t / duration)
 
         # 3) Reescalamos y recortamos al centro
-        w0, h0 = base.size
+        # (relativo al lienzo final: con BG_OVERSAMPLE > 1 base es mayor)
+        w0, h0 = WIDTH, HEIGHT
         new_w, new_h = int(w0 * z), int(h0 * z)
 
         # Resize con LANCZOS (equivalente moderno de ANTIALIAS)
-        zoomed = base.resize((new_w, new_h), Image.LANCZOS)
+        with rp.stage("zoom"):
+            zoomed = base.resize((new_w, new_h), Image.LANCZOS)
 
-        # Recorte centrado a 1080x1920
-        left = max(0, (new_w - WIDTH) // 2)
-        top = max(0, (new_h - HEIGHT) // 2)
-        right = left + WIDTH
-        bottom = top + HEIGHT
-        zoomed_cropped = zoomed.crop((left, top, right, bottom))
+            # Recorte centrado a 1080x1920
+            left = max(0, (new_w - WIDTH) // 2)
+            top = max(0, (new_h - HEIGHT) // 2)
+            right = left + WIDTH
+            bottom = top + HEIGHT
+            zoomed_cropped = zoomed.crop((left, top, right, bottom))
 
         # 4) Aplicamos overlay completo para este frame
         frame_pil = _compose_frame(
@@ -951,8 +874,13 @@ def create_reel_v4(
             category_label=category_label,
         )
 
-        # MoviePy trabaja con arrays numpy
-        frame_np = np.array(frame_pil.convert("RGB"))
+        with rp.stage("to_numpy"):
+            frame_rgb = frame_pil.convert("RGB")
+            if frame_rgb.size != out_size:
+                frame_rgb = frame_rgb.resize(out_size, Image.BILINEAR)
+
+            # MoviePy trabaja con arrays numpy
+            frame_np = np.array(frame_rgb)
         frames.append(frame_np)
 
     # 5) Montamos el clip de secuencia de imágenes
@@ -960,15 +888,12 @@ def create_reel_v4(
 
     # 6) Exportamos el mp4
     Path(out_mp4_path).parent.mkdir(parents=True, exist_ok=True)
-    clip.write_videofile(
-        out_mp4_path,
-        fps=fps,
-        codec="libx264",
-        audio=False,
-        preset="medium",
-        threads=4,
-        bitrate="6000k",
-    )
+    with rp.stage("encode"):
+        clip.write_videofile(
+            out_mp4_path,
+            fps=fps,
+            **_write_videofile_kwargs(profile),
+        )
     
 
 # ---------------------------------------------------------------------------
@@ -984,6 +909,8 @@ def create_reel_for_flight(
     s3_bucket: Optional[str] = None,
     s3_prefix: str = "reels/",
     s3_public: bool = True,
+    encode_profile: str = DEFAULT_ENCODE_PROFILE,
+    bg_image_path: Optional[str] = None,
 ) -> str:
     """
     Genera el reel para un vuelo:
@@ -1018,7 +945,7 @@ def create_reel_for_flight(
     dates = format_dates_dd_mmm(start_date, end_date)
     price_str = f"{int(round(price_value))} € i/v"
 
-    bg_path = pick_image_for_destination(destination) or pick_image_for_destination("DEFAULT")
+    bg_path = bg_image_path or pick_image_for_destination(destination) or pick_image_for_destination("DEFAULT")
     if not bg_path:
         raise FileNotFoundError(
             "No se ha encontrado ninguna imagen para el destino ni DEFAULT en media/images"
@@ -1037,6 +964,7 @@ def create_reel_for_flight(
         brand_line=brand_line,
         discount_pct=discount_pct,
         category_label=category_label,
+        encode_profile=encode_profile,
     )
 
     # 2) Si hay bucket de S3, subirlo y devolver la URL
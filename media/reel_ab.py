@@ -6,6 +6,7 @@ from typing import Optional, Literal, Any
 
 import media.video_generator as vg_new
 import media.old_video_generator as vg_old
+from media import render_profiler as rp
 
 
 Variant = Literal["auto", "new", "old"]
@@ -18,6 +19,13 @@ def _get_field(obj: Any, name: str, default=None):
     return getattr(obj, name, default)
 
 
+def _log_render_profile() -> None:
+    # Solo hay informe si el render se perfiló (ESCAPADAS_RENDER_PROFILE)
+    report = rp.pop_last_report()
+    if report:
+        rp.log_report(report)
+
+
 def choose_variant_deterministic(
     flight: Any,
     ratio_new: float = 0.5,
@@ -67,6 +75,9 @@ def create_reel_for_flight_ab(
     # ✅ NUEVO: A/B pill de origen (on/off)
     origin_pill_ab_ratio: float = 0.5,
     force_origin_pill: Optional[bool] = None,
+    # Encode: "preview" (revisión rápida) o "publish" (calidad final)
+    encode_profile: str = vg_new.DEFAULT_ENCODE_PROFILE,
+    bg_image_path: Optional[str] = None,
 ) -> tuple[str, str, str]:
     """
     Devuelve (result_path_or_url, chosen_variant, origin_pill_variant)
@@ -95,7 +106,10 @@ def create_reel_for_flight_ab(
             origin_pill_ab_ratio=origin_pill_ab_ratio,
             force_origin_pill=force_origin_pill,
             return_origin_pill_variant=True,
+            encode_profile=encode_profile,
+            bg_image_path=bg_image_path,
         )
+        _log_render_profile()
         return res, "new", origin_pill_variant
 
     # "old"
@@ -108,5 +122,8 @@ def create_reel_for_flight_ab(
         s3_bucket=s3_bucket,
         s3_prefix=s3_prefix,
         s3_public=s3_public,
+        encode_profile=encode_profile,
+        bg_image_path=bg_image_path,
     )
+    _log_render_profile()
     return res, "old", "origin_pill_off"
@@ -0,0 +1,131 @@
+# media/reel_uploader.py
+"""
+Subida de reels (MP4) a S3.
+
+- Un único cliente boto3 por proceso (crear el cliente cuesta ~100 ms y
+  no reutiliza conexiones entre llamadas).
+- TransferConfig ajustado: multipart en trozos de 8 MB subidos en paralelo.
+- boto3 se importa en la primera subida, no al importar el módulo.
+- Clave = hash SHA-256 del contenido: el mismo MP4 siempre va a la misma
+  clave, así que re-aprobar o reintentar un publish hace solo un HEAD y
+  no vuelve a subir los bytes.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import offline
+from offline.services import local_s3_put
+
+MULTIPART_THRESHOLD = 8 * 2**20
+MULTIPART_CHUNKSIZE = 8 * 2**20
+MAX_CONCURRENCY = 8
+
+_client = None
+_client_lock = threading.Lock()
+
+# (ruta, mtime_ns, tamaño) → sha256; evita re-hashear el mismo fichero
+_HASH_CACHE: Dict[Tuple[str, int, int], str] = {}
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                try:
+                    import boto3
+                except ImportError:
+                    raise RuntimeError("boto3 no está instalado en este entorno.")
+                _client = boto3.client("s3")
+    return _client
+
+
+def _transfer_config():
+    from boto3.s3.transfer import TransferConfig
+
+    return TransferConfig(
+        multipart_threshold=MULTIPART_THRESHOLD,
+        multipart_chunksize=MULTIPART_CHUNKSIZE,
+        max_concurrency=MAX_CONCURRENCY,
+        use_threads=True,
+    )
+
+
+def file_sha256(path: str | Path) -> str:
+    p = Path(path)
+    st = p.stat()
+    cache_key = (str(p.resolve()), st.st_mtime_ns, st.st_size)
+    digest = _HASH_CACHE.get(cache_key)
+    if digest is not None:
+        return digest
+
+    h = hashlib.sha256()
+    with p.open("rb") as f:
+        for chunk in iter(lambda: f.read(2**20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    _HASH_CACHE[cache_key] = digest
+    return digest
+
+
+def _existing_size(s3, bucket: str, key: str) -> Optional[int]:
+    """
+    ContentLength del objeto si ya existe, None si no (o si no se puede
+    saber: sin s3:ListBucket, S3 responde 403 al HEAD de una clave que no
+    existe, y para subir basta con PutObject).
+    """
+    from botocore.exceptions import ClientError
+
+    try:
+        head = s3.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        code = str(e.response.get("Error", {}).get("Code", ""))
+        if code in ("404", "NoSuchKey", "NotFound", "403", "Forbidden", "AccessDenied"):
+            return None
+        raise
+    return head.get("ContentLength")
+
+
+def upload_reel(
+    local_path: str | Path,
+    bucket: str,
+    prefix: str = "reels/",
+    public: bool = True,
+) -> str:
+    """
+    Sube el MP4 a S3 (si no estaba ya) y devuelve su URL pública.
+    Requiere que boto3 esté configurado con credenciales válidas.
+    En modo offline se copia a disco y se devuelve una URL file://.
+    """
+    lp = Path(local_path)
+    ext = lp.suffix or ".mp4"
+    key = f"{prefix}{file_sha256(lp)}{ext}"
+
+    if offline.is_offline():
+        return local_s3_put(bucket, key, src=lp)
+
+    s3 = get_client()
+    url = f"https://{bucket}.s3.amazonaws.com/{key}"
+
+    if _existing_size(s3, bucket, key) == lp.stat().st_size:
+        print(f"♻️ Reel ya estaba en S3, no se vuelve a subir: {key}")
+        return url
+
+    extra_args = {"ContentType": "video/mp4"}
+    if public:
+        extra_args["ACL"] = "public-read"
+
+    s3.upload_file(
+        Filename=str(lp),
+        Bucket=bucket,
+        Key=key,
+        ExtraArgs=extra_args,
+        Config=_transfer_config(),
+    )
+
+    # URL pública estilo estándar; si usas CloudFront, aquí se cambia
+    return url
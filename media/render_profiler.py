@@ -0,0 +1,258 @@
+# media/render_profiler.py
+"""
+Profiler opcional del render de reels.
+
+Se activa por llamada (create_reel_v4(..., profile=True)) o para todo el
+proceso con la variable de entorno:
+    ESCAPADAS_RENDER_PROFILE=1       → tiempos wall/CPU por etapa
+    ESCAPADAS_RENDER_PROFILE=alloc   → además, memoria asignada (tracemalloc)
+
+Si no hay ningún render perfilándose, stage()/laps() no hacen nada, así que
+los generadores pueden dejar la instrumentación puesta sin coste apreciable.
+
+Al terminar se escribe <reel>.profile.json junto al MP4, y el informe queda
+para que reel_ab lo loguee con pop_last_report() (junto con el acumulado
+AGGREGATE).
+
+El bot renderiza en varios hilos a la vez (executor, pre-render): el
+profiler activo y el último informe son por hilo, y el CPU es el del hilo.
+"""
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+ENV_VAR = "ESCAPADAS_RENDER_PROFILE"
+
+# Profiler del render en curso y último informe terminado, por hilo
+_local = threading.local()
+
+# Acumulado de todos los renders del proceso
+AGGREGATE: Dict[str, Dict[str, float]] = {}
+AGGREGATE_RENDERS = 0
+_aggregate_lock = threading.Lock()
+
+
+def _active() -> Optional["RenderProfiler"]:
+    return getattr(_local, "active", None)
+
+
+def profiling_requested(profile: Optional[bool] = None) -> bool:
+    """profile explícito manda; si es None, se mira la variable de entorno."""
+    if profile is not None:
+        return bool(profile)
+    return (os.getenv(ENV_VAR) or "").strip().lower() not in ("", "0", "false", "no")
+
+
+def _alloc_requested() -> bool:
+    return (os.getenv(ENV_VAR) or "").strip().lower() == "alloc"
+
+
+class RenderProfiler:
+    def __init__(self, label: str, track_allocations: bool = False):
+        self.label = label
+        self.track_allocations = track_allocations
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.meta: Dict[str, Any] = {}
+        self._t0_wall = time.perf_counter()
+        self._t0_cpu = time.thread_time()
+
+    def _now(self) -> tuple[float, float, int]:
+        mem = tracemalloc.get_traced_memory()[0] if self.track_allocations else 0
+        return time.perf_counter(), time.thread_time(), mem
+
+    def add(self, name: str, wall: float, cpu: float, alloc: int = 0) -> None:
+        st = self.stages.setdefault(
+            name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "alloc_bytes": 0}
+        )
+        st["calls"] += 1
+        st["wall_s"] += wall
+        st["cpu_s"] += cpu
+        st["alloc_bytes"] += max(alloc, 0)
+
+    @contextmanager
+    def stage(self, name: str):
+        w0, c0, m0 = self._now()
+        try:
+            yield
+        finally:
+            w1, c1, m1 = self._now()
+            self.add(name, w1 - w0, c1 - c0, m1 - m0)
+
+    def report(self) -> Dict[str, Any]:
+        total_wall = time.perf_counter() - self._t0_wall
+        total_cpu = time.thread_time() - self._t0_cpu
+        stages = {
+            name: {
+                **st,
+                "wall_s": round(st["wall_s"], 4),
+                "cpu_s": round(st["cpu_s"], 4),
+                "wall_pct": round(100.0 * st["wall_s"] / total_wall, 1) if total_wall else 0.0,
+            }
+            for name, st in sorted(self.stages.items(), key=lambda kv: -kv[1]["wall_s"])
+        }
+        return {
+            "label": self.label,
+            "total_wall_s": round(total_wall, 4),
+            "total_cpu_s": round(total_cpu, 4),
+            "track_allocations": self.track_allocations,
+            "meta": self.meta,
+            "stages": stages,
+        }
+
+
+class _Laps:
+    """
+    Cronómetro por tramos: cada split(nombre) apunta el tiempo desde el
+    split anterior como "<prefijo>.<nombre>". Útil para funciones largas
+    (p.ej. _compose_frame) sin tener que re-indentar bloques.
+    """
+
+    def __init__(self, prof: RenderProfiler, prefix: str):
+        self.prof = prof
+        self.prefix = prefix
+        self._last = prof._now()
+
+    def split(self, name: str) -> None:
+        now = self.prof._now()
+        w0, c0, m0 = self._last
+        self.prof.add(f"{self.prefix}.{name}", now[0] - w0, now[1] - c0, now[2] - m0)
+        self._last = now
+
+
+class _NoLaps:
+    def split(self, name: str) -> None:
+        pass
+
+
+_NO_LAPS = _NoLaps()
+
+
+def stage(name: str):
+    """Context manager de una etapa; no-op si no hay render perfilándose."""
+    prof = _active()
+    if prof is None:
+        return nullcontext()
+    return prof.stage(name)
+
+
+def laps(prefix: str):
+    prof = _active()
+    if prof is None:
+        return _NO_LAPS
+    return _Laps(prof, prefix)
+
+
+def set_meta(**kwargs) -> None:
+    prof = _active()
+    if prof is not None:
+        prof.meta.update(kwargs)
+
+
+def report_path_for(out_mp4_path: str | Path) -> Path:
+    p = Path(out_mp4_path)
+    return p.with_name(f"{p.stem}.profile.json")
+
+
+def _accumulate(report: Dict[str, Any]) -> None:
+    global AGGREGATE_RENDERS
+    with _aggregate_lock:
+        AGGREGATE_RENDERS += 1
+        for name, st in report["stages"].items():
+            agg = AGGREGATE.setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "alloc_bytes": 0})
+            agg["calls"] += st["calls"]
+            agg["wall_s"] += st["wall_s"]
+            agg["cpu_s"] += st["cpu_s"]
+            agg["alloc_bytes"] += st["alloc_bytes"]
+
+
+@contextmanager
+def profiling(label: str, out_mp4_path: str | Path, enabled: Optional[bool] = None):
+    """
+    Envuelve un render completo. Si está activado, al salir escribe el JSON
+    junto al MP4 y guarda el informe del hilo / actualiza AGGREGATE.
+    """
+    if not profiling_requested(enabled) or _active() is not None:
+        yield None
+        return
+
+    track = _alloc_requested()
+    started_tracemalloc = False
+    if track and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        started_tracemalloc = True
+
+    prof = RenderProfiler(label, track_allocations=track)
+    _local.active = prof
+    try:
+        yield prof
+    finally:
+        _local.active = None
+        report = prof.report()
+        if track:
+            report["peak_traced_bytes"] = tracemalloc.get_traced_memory()[1]
+        if started_tracemalloc:
+            tracemalloc.stop()
+
+        out_json = report_path_for(out_mp4_path)
+        try:
+            out_json.parent.mkdir(parents=True, exist_ok=True)
+            with out_json.open("w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            report["report_path"] = str(out_json)
+        except Exception as e:
+            print(f"⚠️ No se pudo escribir el informe de profiling: {e}")
+
+        _local.last_report = report
+        _accumulate(report)
+
+
+def pop_last_report() -> Optional[Dict[str, Any]]:
+    """Último informe terminado en este hilo (y lo olvida)."""
+    report = getattr(_local, "last_report", None)
+    _local.last_report = None
+    return report
+
+
+def log_report(report: Dict[str, Any], top: int = 8) -> None:
+    """Resumen legible del render + acumulado del proceso."""
+    print(
+        f"⏱  Render [{report['label']}] "
+        f"wall={report['total_wall_s']:.2f}s cpu={report['total_cpu_s']:.2f}s"
+    )
+    for name, st in list(report["stages"].items())[:top]:
+        print(
+            f"   {name:<24} {st['wall_s']:>8.3f}s ({st['wall_pct']:>5.1f}%) "
+            f"x{st['calls']}"
+        )
+    if report.get("report_path"):
+        print(f"   informe: {report['report_path']}")
+
+    if AGGREGATE_RENDERS > 1:
+        print(f"⏱  Acumulado ({AGGREGATE_RENDERS} renders):")
+        ranked = sorted(AGGREGATE.items(), key=lambda kv: -kv[1]["wall_s"])[:top]
+        for name, st in ranked:
+            avg = st["wall_s"] / AGGREGATE_RENDERS
+            print(f"   {name:<24} total={st['wall_s']:>8.3f}s  media/render={avg:.3f}s")
+
+
+def profiled(label_prefix: str):
+    """
+    Decorador para funciones de render con argumento out_mp4_path.
+    Añade el kwarg opcional profile=True/False/None (None → variable de entorno).
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, profile: Optional[bool] = None, **kwargs):
+            out = kwargs.get("out_mp4_path") or (args[1] if len(args) > 1 else "reel.mp4")
+            with profiling(f"{label_prefix}:{Path(out).name}", out, enabled=profile):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
@@ -1,4 +1,6 @@
+import os
 import random
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 from datetime import datetime, date
@@ -12,13 +14,10 @@ from moviepy.editor import ImageClip, VideoFileClip, CompositeVideoClip, vfx
 from moviepy.video.io.ImageSequenceClip import ImageSequenceClip
 
 from content.destinations import get_city  # para convertir IATA → ciudad
-
-import uuid
-
-try:
-    import boto3
-except ImportError:
-    boto3 = None  # por si este módulo se importa en un entorno sin boto3
+from media import masks
+from media import image_index
+from media import render_profiler as rp
+from media import reel_uploader
 
 
 
@@ -34,7 +33,11 @@ FPS = 30
 # Paths
 # ---------------------------------------------------------------------------
 
-IMAGES_DIR = Path("media/images")
+IMAGES_DIR = image_index.IMAGES_DIR
+
+# Fondos cacheados a (WIDTH, HEIGHT) * BG_OVERSAMPLE. Con 1.0 el zoom sigue
+# partiendo de 1080x1920 como siempre; >1 da más detalle al hacer zoom.
+BG_OVERSAMPLE = 1.0
 
 FONT_DEFAULT_PATH = "media/fonts/Montserrat-Regular.ttf"   # o la que uses
 FONT_ROUTE_PATH   = "media/fonts/DejaVuSans.ttf"           # nueva, con ✈
@@ -52,19 +55,14 @@ def pick_image_for_destination(
     - Si no hay, intenta DEFAULT*
     - Si tampoco, devuelve None
     """
-    images_dir = Path(images_dir)
-
-    if not images_dir.exists():
-        return None
+    index = image_index.get_index(images_dir)
 
     # 1) Intentar con el código IATA
-    candidates = sorted(
-        list(images_dir.glob(f"{destination_iata.upper()}*.*"))
-    )
+    candidates = index.candidates(destination_iata)
 
     # 2) Fallback a DEFAULT
     if not candidates:
-        candidates = sorted(list(images_dir.glob("DEFAULT*.*")))
+        candidates = index.candidates("DEFAULT")
 
     if not candidates:
         return None
@@ -72,6 +70,19 @@ def pick_image_for_destination(
     return random.choice(candidates)
 
 
+def pick_background_for_destination(destination_iata: str) -> Path:
+    """
+    Igual que pick_image_for_destination pero con fallback a DEFAULT
+    y error claro si no hay ninguna imagen.
+    """
+    bg_path = pick_image_for_destination(destination_iata) or pick_image_for_destination("DEFAULT")
+    if not bg_path:
+        raise FileNotFoundError(
+            "No se ha encontrado ninguna imagen para el destino ni DEFAULT en media/images"
+        )
+    return bg_path
+
+
 from collections.abc import Mapping
 
 def _fget(obj, key, default=None):
@@ -174,6 +185,68 @@ ORIGIN_THEME = {
 }
 
 
+# ---------------------------------------------------------------------------
+# Perfiles de encode
+# ---------------------------------------------------------------------------
+#  - "publish": calidad final del reel que se sube a Instagram
+#  - "preview": vista previa para Telegram (rápida, ligera, se puede descartar)
+#  scale: factor sobre 1080x1920 aplicado al frame ya compuesto
+#  crf:   si no es None, calidad constante (-crf) en lugar de bitrate fijo
+#  threads: None → todos los núcleos
+
+ENCODE_PROFILES = {
+    "publish": {
+        "scale": 1.0,
+        "preset": "medium",
+        "bitrate": "6000k",
+        "crf": None,
+        "threads": 4,
+    },
+    "preview": {
+        "scale": 0.5,
+        "preset": "ultrafast",
+        "bitrate": None,
+        "crf": 28,
+        "threads": None,
+    },
+}
+
+DEFAULT_ENCODE_PROFILE = "publish"
+
+
+def get_encode_profile(name: Optional[str]) -> dict:
+    name = name or DEFAULT_ENCODE_PROFILE
+    profile = ENCODE_PROFILES.get(name)
+    if profile is None:
+        raise ValueError(
+            f"Perfil de encode '{name}' desconocido. Disponibles: {', '.join(ENCODE_PROFILES)}"
+        )
+    return profile
+
+
+def _output_size(profile: dict) -> tuple[int, int]:
+    """Tamaño de salida según el perfil (siempre par, libx264 lo exige)."""
+    scale = float(profile.get("scale") or 1.0)
+    w = int(WIDTH * scale) // 2 * 2
+    h = int(HEIGHT * scale) // 2 * 2
+    return w, h
+
+
+def _write_videofile_kwargs(profile: dict) -> dict:
+    """Traduce un perfil de encode a kwargs de clip.write_videofile."""
+    kwargs = {
+        "codec": "libx264",
+        "audio": False,
+        "preset": profile.get("preset", "medium"),
+        "threads": profile.get("threads") or os.cpu_count() or 4,
+    }
+    if profile.get("crf") is not None:
+        kwargs["ffmpeg_params"] = ["-crf", str(profile["crf"])]
+    elif profile.get("bitrate"):
+        kwargs["bitrate"] = profile["bitrate"]
+    return kwargs
+
+
 GRADIENT_TOP_OPACITY = 0.15
 GRADIENT_BOT_OPACITY = 0.65
 
@@ -219,11 +292,15 @@ def _find_font_path() -> Optional[str]:
 _FONT_PATH = _find_font_path()
 
 
+@lru_cache(maxsize=128)
 def _font(size: int, kind: str = "default") -> ImageFont.FreeTypeFont:
     """
     kind:
       - "default": para fechas, precio, etc.
       - "route": para el texto PMI ✈ VIE (usa una fuente que soporte ✈)
+
+    Cacheada: la misma (size, kind) devuelve el mismo objeto, lo que permite
+    cachear también las mediciones por (font, texto).
     """
     if kind == "route":
         path = FONT_ROUTE_PATH
@@ -283,10 +360,18 @@ def _text_bbox(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.FreeTypeFon
     # bbox (x0,y0,x1,y1)
     return draw.textbbox((0, 0), text, font=font)
 
-def _text_size(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.FreeTypeFont):
-    x0, y0, x1, y1 = _text_bbox(draw, text, font)
+# Draw "de medir": el bbox no depende del lienzo, solo de (font, texto)
+_MEASURE_DRAW = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+
+
+@lru_cache(maxsize=8192)
+def _cached_text_size(font: ImageFont.FreeTypeFont, text: str):
+    x0, y0, x1, y1 = _MEASURE_DRAW.textbbox((0, 0), text, font=font)
     return (x1 - x0), (y1 - y0)
 
+def _text_size(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.FreeTypeFont):
+    return _cached_text_size(font, text)
+
 def _wrap_text_max_lines(draw, text, font, max_width, max_lines=3):
     words = (text or "").split()
     if not words:
@@ -325,57 +410,103 @@ def _ellipsize_to_width(draw, text, font, max_width):
     ell = "…"
     if _text_size(draw, text, font)[0] <= max_width:
         return text
-    # recorta hasta que quepa con elipsis
-    s = text
-    while s and _text_size(draw, s + ell, font)[0] > max_width:
-        s = s[:-1]
+    # Búsqueda binaria del prefijo más largo que cabe con elipsis
+    lo, hi = 0, len(text) - 1
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if _text_size(draw, text[:mid] + ell, font)[0] <= max_width:
+            lo = mid
+        else:
+            hi = mid - 1
+    s = text[:lo]
     return (s + ell) if s else ell
 
+def _lines_fit(draw, lines, font, max_w, max_h, line_spacing) -> bool:
+    # Medimos alto total
+    line_heights = []
+    max_line_w = 0
+    for ln in lines:
+        w, h = _text_size(draw, ln, font)
+        max_line_w = max(max_line_w, w)
+        line_heights.append(h)
+
+    total_h = 0
+    for i, h in enumerate(line_heights):
+        total_h += h
+        if i < len(line_heights) - 1:
+            total_h += int(h * (line_spacing - 1.0))
+
+    return max_line_w <= max_w and total_h <= max_h
+
+@lru_cache(maxsize=256)
+def _fit_text_layout(text, font_kind, max_w, max_h, start_size, min_size,
+                     max_lines, line_spacing):
+    """
+    Layout cacheado de _fit_text_in_box: el hook es el mismo en todos los
+    frames de un reel, así que se calcula una sola vez.
+    Devuelve (tuple(lines), font).
+    """
+    if not text:
+        return (("",), _font(min_size, kind=font_kind))
+
+    # Tamaños candidatos (de 2 en 2, como antes) y búsqueda binaria del
+    # mayor que cabe: cuanto más grande la fuente, menos cabe.
+    sizes = list(range(start_size, min_size - 1, -2))
+    best = None
+    lo, hi = 0, len(sizes) - 1
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        font = _font(sizes[mid], kind=font_kind)
+        lines = _wrap_text_max_lines(_MEASURE_DRAW, text, font, max_w, max_lines=max_lines)
+        if _lines_fit(_MEASURE_DRAW, lines, font, max_w, max_h, line_spacing):
+            best = (tuple(lines), font)
+            hi = mid - 1
+        else:
+            lo = mid + 1
+
+    if best is not None:
+        return best
+
+    # Último recurso: usa min_size y elipsiza
+    font = _font(min_size, kind=font_kind)
+    lines = _wrap_text_max_lines(_MEASURE_DRAW, text, font, max_w, max_lines=max_lines)
+    if lines:
+        lines[-1] = _ellipsize_to_width(_MEASURE_DRAW, lines[-1], font, max_w)
+    return (tuple(lines), font)
+
 def _fit_text_in_box(draw, text, font_kind="default",
                      max_w=800, max_h=260,
                      start_size=90, min_size=44,
                      max_lines=2, line_spacing=1.06):
     """
     Devuelve (lines, font) ajustados para caber en una caja max_w x max_h.
-    - Baja tamaño hasta que quepa.
+    - Elige el mayor tamaño (start_size..min_size, de 2 en 2) que cabe.
     - Wrap hasta max_lines.
     - Si aun así no cabe, elipsiza última línea.
+    El resultado se cachea por (texto, caja, kind, ...).
     """
     text = (text or "").strip()
-    if not text:
-        return ([""], _font(min_size, kind=font_kind))
+    lines, font = _fit_text_layout(
+        text, font_kind, int(max_w), int(max_h),
+        int(start_size), int(min_size), int(max_lines), float(line_spacing),
+    )
+    return (list(lines), font)
 
-    size = start_size
-    while size >= min_size:
-        font = _font(size, kind=font_kind)
-        lines = _wrap_text_max_lines(draw, text, font, max_w, max_lines=max_lines)
-
-        # Medimos alto total
-        line_heights = []
-        max_line_w = 0
-        for ln in lines:
-            w, h = _text_size(draw, ln, font)
-            max_line_w = max(max_line_w, w)
-            line_heights.append(h)
-
-        total_h = 0
-        for i, h in enumerate(line_heights):
-            total_h += h
-            if i < len(line_heights) - 1:
-                total_h += int(h * (line_spacing - 1.0))
-
-        # Cabe?
-        if max_line_w <= max_w and total_h <= max_h:
-            return (lines, font)
 
+@lru_cache(maxsize=256)
+def _fit_font_to_width(text: str, kind: str, start_size: int, min_size: int, max_width: int):
+    """
+    Fuente de una sola línea: baja de 2 en 2 desde start_size hasta que
+    el texto quepa en max_width (sin bajar de min_size). Cacheada por reel.
+    """
+    size = start_size
+    font = _font(size, kind=kind)
+    w, _ = _measure_text(font, text)
+    while w > max_width and size > min_size:
         size -= 2
-
-    # Último recurso: usa min_size y elipsiza
-    font = _font(min_size, kind=font_kind)
-    lines = _wrap_text_max_lines(draw, text, font, max_w, max_lines=max_lines)
-    if lines:
-        lines[-1] = _ellipsize_to_width(draw, lines[-1], font, max_w)
-    return (lines, font)
+        font = _font(size, kind=kind)
+        w, _ = _measure_text(font, text)
+    return font
 
 def _draw_multiline_centered(draw, lines, font, center_x, center_y, fill,
                             line_spacing=1.25, min_gap=10):
@@ -622,80 +753,25 @@ def _draw_horizontal_fade_line(
     else:
         r, g, b = color
 
-    grad = Image.new("RGBA", (line_w, line_h), (0, 0, 0, 0))
-    pixels = grad.load()
-
-    for i in range(line_w):
-        # 0 en la izquierda, 1 en la derecha
-        rel = i / (line_w - 1 if line_w > 1 else 1)
-        # distancia al centro (0 en el centro, 1 en los bordes)
-        dist_center = abs(rel - 0.5) / 0.5
-        alpha = int(max_alpha * (1.0 - dist_center))  # máximo en el centro, 0 en los bordes
-        if alpha < 0:
-            alpha = 0
-        pixels[i, 0] = (r, g, b, alpha)
-        # copiamos al resto de filas si width > 1
-        for j in range(1, line_h):
-            pixels[i, j] = (r, g, b, alpha)
+    # Capa precalculada (cacheada por tamaño/color/alpha)
+    grad = masks.horizontal_fade_layer(line_w, line_h, (r, g, b), int(max_alpha))
 
     # centramos verticalmente la línea alrededor de y
     paste_y = int(y - line_h / 2)
     base_img.alpha_composite(grad, (int(x0), paste_y))
     
 
-def _fit_cover(img: Image.Image, target_w: int, target_h: int) -> Image.Image:
-    """
-    Resize estilo 'cover':
-    - Mantiene proporción
-    - Asegura que la imagen cubra completamente target_w x target_h
-    - Recorta el exceso por los lados
-    """
-    src_w, src_h = img.size
-    src_ratio = src_w / src_h
-    target_ratio = target_w / target_h
-
-    # Determinar si escalamos por ancho o por alto
-    if src_ratio > target_ratio:
-        # Imagen demasiado ancha → ajustar por altura
-        new_h = target_h
-        new_w = int(new_h * src_ratio)
-    else:
-        # Imagen demasiado alta → ajustar por anchura
-        new_w = target_w
-        new_h = int(new_w / src_ratio)
-
-    # Resize con alta calidad
-    img_resized = img.resize((new_w, new_h), Image.LANCZOS)
-
-    # Recorte centrado
-    x0 = (new_w - target_w) // 2
-    y0 = (new_h - target_h) // 2
-    x1 = x0 + target_w
-    y1 = y0 + target_h
-
-    return img_resized.crop((x0, y0, x1, y1))
-
 def _apply_vertical_gradient(base: Image.Image) -> Image.Image:
     """
     Aplica un degradado negro de arriba (poco) a abajo (más opaco)
     para que la banda y el texto respiren.
     """
     base = base.convert("RGBA")
-    w, h = base.size
-
-    gradient = Image.new("L", (1, h))
-    for y in range(h):
-        t = y / (h - 1)
-        alpha_float = (
-            GRADIENT_TOP_OPACITY * (1 - t)
-            + GRADIENT_BOT_OPACITY * t
-        )
-        gradient.putpixel((0, y), int(alpha_float * 255))
-
-    alpha = gradient.resize((w, h))
-    black = Image.new("RGBA", (w, h), (0, 0, 0, 255))
-    black.putalpha(alpha)
 
+    # Capa negra con el degradado ya calculado (cacheada por tamaño/opacidades)
+    black = masks.vertical_gradient_layer(
+        base.size, GRADIENT_TOP_OPACITY, GRADIENT_BOT_OPACITY
+    )
     return Image.alpha_composite(base, black)
 
 def _rounded_rect(draw: ImageDraw.ImageDraw, xy, radius, fill, outline=None, width: int = 1):
@@ -703,13 +779,12 @@ def _rounded_rect(draw: ImageDraw.ImageDraw, xy, radius, fill, outline=None, wid
     draw.rounded_rectangle(xy, radius=radius, fill=fill, outline=outline, width=width)
 
 def _draw_centered_text(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.FreeTypeFont, center_x: int, y: int, fill):
-    bbox = font.getbbox(text)
-    w = bbox[2] - bbox[0]
-    h = bbox[3] - bbox[1]
+    w, h = _measure_text(font, text)
     x = center_x - w // 2
     draw.text((x, y), text, font=font, fill=fill)
     return h
 
+@lru_cache(maxsize=4096)
 def _measure_text(font: ImageFont.FreeTypeFont, text: str):
     bbox = font.getbbox(text)
     return bbox[2] - bbox[0], bbox[3] - bbox[1]
@@ -818,6 +893,7 @@ def _compose_frame(
     
     disable_origin_branding = ((origin_code or "").upper() == "PMI")
 
+    laps = rp.laps("compose")
     
     # --- Fondo ---
     bg = bg.convert("RGB")
@@ -827,6 +903,7 @@ def _compose_frame(
 
     frame = bg.copy().convert("RGBA")
     draw = ImageDraw.Draw(frame, "RGBA")
+    laps.split("bg")
 
     center_x = WIDTH // 2
 
@@ -852,6 +929,7 @@ def _compose_frame(
 
         frame.alpha_composite(glow_layer, (logo_x, logo_y))
         frame.alpha_composite(logo, (logo_x, logo_y))
+    laps.split("logo")
 
     # ============================================================
     # ORIGIN PILL (arriba izquierda)
@@ -871,6 +949,7 @@ def _compose_frame(
             text_color=theme["text"],
             border_color=(255, 255, 255, 70),
         )
+    laps.split("origin_pill")
 
     
     # ============================================================
@@ -895,6 +974,7 @@ def _compose_frame(
     )
     shadow = shadow.filter(ImageFilter.GaussianBlur(18))
     frame.alpha_composite(shadow, (card_x0 - 20, card_y0 - 20))
+    laps.split("card_shadow")
 
     # Tarjeta principal
     _rounded_rect(
@@ -923,6 +1003,7 @@ def _compose_frame(
         theme = get_origin_theme(origin_code)
         band_w = 10
         draw.rectangle((0, 0, band_w, H), fill=theme["bg"])
+    laps.split("card")
         
     # ============================================================
     # HOOK GRANDE EN LA BANDA (visible en t=0 para preview)
@@ -961,6 +1042,7 @@ def _compose_frame(
             fill=_with_alpha(COLORS["white"], a_hook),
             line_spacing=1.28,
         )
+    laps.split("hook")
 
     
 # ============================================================
@@ -1007,6 +1089,7 @@ def _compose_frame(
             text_color=COLORS.get("pill_text", (255, 255, 255)),
             border_color=COLORS.get("pill_border_soft", (255, 255, 255, 60)),
         )
+    laps.split("pill")
 
     # ============================================================
     # TIPOGRAFÍAS Y TEXTOS PRINCIPALES
@@ -1023,16 +1106,10 @@ def _compose_frame(
     min_route_size  = 58   # no bajaremos de aquí
     max_route_width = int(card_w * 0.82)  # margen lateral dentro de la tarjeta
 
-    current_size = base_route_size
-    route_main_font = _font(current_size, kind="default")
-
-    w_route_main, _ = _measure_text(route_main_font, route_main_text)
-
-    # Reducimos tamaño poco a poco hasta que quepa
-    while w_route_main > max_route_width and current_size > min_route_size:
-        current_size -= 2
-        route_main_font = _font(current_size, kind="default")
-        w_route_main, _ = _measure_text(route_main_font, route_main_text)
+    # Reducimos tamaño poco a poco hasta que quepa (cacheado por reel)
+    route_main_font = _fit_font_to_width(
+        route_main_text, "default", base_route_size, min_route_size, max_route_width
+    )
 
     # 2) Resto de fuentes (pueden quedarse fijas)
     route_codes_font = _font(50,  kind="route")
@@ -1167,6 +1244,7 @@ def _compose_frame(
     if show_discount and discount_font and a_disc > 0:
         y += gap_price_discount
         _draw_centered_text(draw, discount_text, discount_font, center_x, int(y), _with_alpha(COLORS["red"], a_disc))
+    laps.split("texts")
         
 
     # ============================================================
@@ -1177,6 +1255,7 @@ def _compose_frame(
         _, h_brand = _measure_text(brand_font, brand_line)
         brand_y = HEIGHT - SAFE_AREA - h_brand - 90
         _draw_centered_text(draw, brand_line, brand_font, center_x, brand_y, COLORS["brand"])
+    laps.split("brand")
 
     return frame
 
@@ -1189,38 +1268,22 @@ def upload_reel_to_s3(
 ) -> str:
     """
     Sube el MP4 a S3 y devuelve la URL pública (o la URL normal del bucket).
-    Requiere que boto3 esté configurado con credenciales válidas.
+    La clave es el hash del contenido: si ya estaba subido no se repite
+    (ver media/reel_uploader.py).
     """
-    if boto3 is None:
-        raise RuntimeError("boto3 no está instalado en este entorno.")
-
-    s3 = boto3.client("s3")
-
-    lp = Path(local_path)
-    ext = lp.suffix or ".mp4"
-    # nombre único para evitar colisiones
-    key = f"{prefix}{uuid.uuid4().hex}{ext}"
-
-    extra_args = {"ContentType": "video/mp4"}
-    if public:
-        extra_args["ACL"] = "public-read"
-
-    s3.upload_file(
-        Filename=str(lp),
-        Bucket=bucket,
-        Key=key,
-        ExtraArgs=extra_args,
+    return reel_uploader.upload_reel(
+        local_path=local_path,
+        bucket=bucket,
+        prefix=prefix,
+        public=public,
     )
-
-    # URL pública estilo estándar; si usas CloudFront, aquí se cambia
-    url = f"https://{bucket}.s3.amazonaws.com/{key}"
-    return url
     
 
 # ---------------------------------------------------------------------------
 # Creación del reel
 # ---------------------------------------------------------------------------
 
+@rp.profiled("new")
 def create_reel_v4(
     bg_image_path: str,
     out_mp4_path: str,
@@ -1239,19 +1302,26 @@ def create_reel_v4(
     origin_pill_text: Optional[str] = None,
     origin_code: Optional[str] = None,
     show_origin_pill: bool = False,
+    encode_profile: str = DEFAULT_ENCODE_PROFILE,
 ):
     """
     Genera un reel 1080x1920 con:
     - fondo con zoom/pan suave
     - overlay de degradado + banda + textos + logo
     usando _render_frame en cada fotograma.
+
+    encode_profile: clave de ENCODE_PROFILES ("publish" o "preview").
+    profile=True (kwarg del decorador) escribe <reel>.profile.json con tiempos por etapa.
     """
+    profile = get_encode_profile(encode_profile)
+    out_size = _output_size(profile)
 
-    # 1) Cargamos la imagen base y la adaptamos a 1080x1920 (cover)
-    base = Image.open(Path(bg_image_path)).convert("RGB")
-    base = _fit_cover(base, WIDTH, HEIGHT)  # debe quedar exactamente (WIDTH, HEIGHT)
+    # 1) Fondo ya adaptado a 1080x1920 (cover), desde la caché de fondos
+    with rp.stage("load_bg"):
+        base = image_index.fitted_background(bg_image_path, WIDTH, HEIGHT, BG_OVERSAMPLE)
 
     total_frames = int(round(duration * fps))
+    rp.set_meta(frames=total_frames, fps=fps, encode_profile=encode_profile, bg=str(bg_image_path))
     frames = []
 
     # Parámetros del zoom “loopable”: zoom sinusoidal, mismo valor al inicio y al final
@@ -1304,18 +1374,20 @@ def create_reel_v4(
         z = zoom_center + zoom_amp * math.sin(2 * math.pi * t / duration)
 
         # 3) Reescalamos y recortamos al centro
-        w0, h0 = base.size
+        # (relativo al lienzo final: con BG_OVERSAMPLE > 1 base es mayor)
+        w0, h0 = WIDTH, HEIGHT
         new_w, new_h = int(w0 * z), int(h0 * z)
 
         # Resize con LANCZOS (equivalente moderno de ANTIALIAS)
-        zoomed = base.resize((new_w, new_h), Image.LANCZOS)
-
-        # Recorte centrado a 1080x1920
-        left = max(0, (new_w - WIDTH) // 2)
-        top = max(0, (new_h - HEIGHT) // 2)
-        right = left + WIDTH
-        bottom = top + HEIGHT
-        zoomed_cropped = zoomed.crop((left, top, right, bottom))
+        with rp.stage("zoom"):
+            zoomed = base.resize((new_w, new_h), Image.LANCZOS)
+
+            # Recorte centrado a 1080x1920
+            left = max(0, (new_w - WIDTH) // 2)
+            top = max(0, (new_h - HEIGHT) // 2)
+            right = left + WIDTH
+            bottom = top + HEIGHT
+            zoomed_cropped = zoomed.crop((left, top, right, bottom))
         
         # 4) Aplicamos overlay completo para este frame
         frame_pil = _compose_frame(
@@ -1337,8 +1409,13 @@ def create_reel_v4(
             show_origin_pill=show_origin_pill,
         )
 
-        # MoviePy trabaja con arrays numpy
-        frame_np = np.array(frame_pil.convert("RGB"))
+        with rp.stage("to_numpy"):
+            frame_rgb = frame_pil.convert("RGB")
+            if frame_rgb.size != out_size:
+                frame_rgb = frame_rgb.resize(out_size, Image.BILINEAR)
+
+            # MoviePy trabaja con arrays numpy
+            frame_np = np.array(frame_rgb)
         frames.append(frame_np)
 
     # 5) Montamos el clip de secuencia de imágenes
@@ -1346,15 +1423,12 @@ def create_reel_v4(
 
     # 6) Exportamos el mp4
     Path(out_mp4_path).parent.mkdir(parents=True, exist_ok=True)
-    clip.write_videofile(
-        out_mp4_path,
-        fps=fps,
-        codec="libx264",
-        audio=False,
-        preset="medium",
-        threads=4,
-        bitrate="6000k",
-    )
+    with rp.stage("encode"):
+        clip.write_videofile(
+            out_mp4_path,
+            fps=fps,
+            **_write_videofile_kwargs(profile),
+        )
     
 
 # ---------------------------------------------------------------------------
@@ -1375,11 +1449,16 @@ def create_reel_for_flight(
     origin_pill_ab_ratio: float = 0.5,
     force_origin_pill: Optional[bool] = None,
     return_origin_pill_variant: bool = False,
+    encode_profile: str = DEFAULT_ENCODE_PROFILE,
+    bg_image_path: Optional[str] = None,
 ) -> str:
     """
     Genera el reel para un vuelo:
       - Si s3_bucket es None → devuelve la ruta local (out_mp4_path).
       - Si s3_bucket tiene valor → sube el vídeo a S3 y devuelve la URL pública.
+
+    encode_profile: "preview" para la revisión en Telegram, "publish" para IG.
+    bg_image_path: fuerza el fondo (para que preview y versión final coincidan).
     """
     origin = _get_field(flight, "origin", "PMI").upper()
     destination = _get_field(flight, "destination", "VIE")
@@ -1420,11 +1499,7 @@ def create_reel_for_flight(
     dates = format_dates_dd_mmm(start_date, end_date)
     price_str = f"{int(round(price_value))} € i/v"
 
-    bg_path = pick_image_for_destination(destination) or pick_image_for_destination("DEFAULT")
-    if not bg_path:
-        raise FileNotFoundError(
-            "No se ha encontrado ninguna imagen para el destino ni DEFAULT en media/images"
-        )
+    bg_path = bg_image_path or pick_background_for_destination(destination)
 
     # 1) Generar el vídeo local
     create_reel_v4(
@@ -1444,6 +1519,7 @@ def create_reel_for_flight(
         origin_pill_text=origin_pill_text,
         origin_code=origin,
         show_origin_pill=show_origin_pill,
+        encode_profile=encode_profile,
     )
 
     # 2) Si hay bucket de S3, subirlo y devolver la URL
@@ -0,0 +1,48 @@
+# offline/__init__.py
+"""
+Modo de ejecución respecto a los servicios externos:
+
+  "live"   → todo real (por defecto)
+  "record" → todo real, y además se guardan en fixtures las respuestas de
+             los proveedores de vuelos (vuelos normalizados + respuestas
+             crudas) y los captions del LLM
+  "replay" → sin red: vuelos y captions salen de los fixtures y Telegram,
+             S3 y Graph API se sustituyen por versiones locales
+             (offline/services.py)
+
+Se elige una vez al arrancar (main.py --record / --offline) con enable().
+El modo va también en la variable de entorno ESCAPADAS_OFFLINE_MODE para
+que lo hereden los procesos hijos (pre-render).
+"""
+from __future__ import annotations
+
+import os
+
+MODES = ("live", "record", "replay")
+ENV_VAR = "ESCAPADAS_OFFLINE_MODE"
+
+_mode = os.getenv(ENV_VAR, "live")
+
+
+def enable(mode: str) -> None:
+    global _mode
+    if mode not in MODES:
+        raise ValueError(f"Modo offline desconocido: {mode} (usa {', '.join(MODES)})")
+    _mode = mode
+    os.environ[ENV_VAR] = mode
+    if mode != "live":
+        from offline.fixtures import FIXTURES_DIR
+
+        print(f"🧪 Modo {mode}: fixtures en {FIXTURES_DIR}")
+
+
+def mode() -> str:
+    return _mode
+
+
+def is_recording() -> bool:
+    return _mode == "record"
+
+
+def is_offline() -> bool:
+    return _mode == "replay"
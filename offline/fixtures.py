@@ -0,0 +1,169 @@
+# offline/fixtures.py
+"""
+Fixtures de offline/record-replay (JSON en disco).
+
+    <OFFLINE_FIXTURES_DIR>/v<FIXTURE_VERSION>/
+        manifest.json                          ventana y markets grabados
+        flights/<proveedor>_<origen>_<ini>_<fin>.json   vuelos normalizados
+        raw/<proveedor>.jsonl                  respuestas crudas (una por línea)
+        captions/<cache_key>.json              JSON de caption del LLM
+
+FIXTURE_VERSION se sube cuando cambia el formato (o Flight de forma
+incompatible): los fixtures de otra versión no se leen.
+"""
+from __future__ import annotations
+
+import json
+import threading
+from dataclasses import fields
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from config.settings import OFFLINE_FIXTURES_DIR
+from flights.base import Flight
+
+FIXTURE_VERSION = 1
+FIXTURES_DIR = Path(OFFLINE_FIXTURES_DIR) / f"v{FIXTURE_VERSION}"
+
+_FLIGHT_FIELDS = {f.name for f in fields(Flight)}
+_raw_lock = threading.Lock()
+
+
+def to_jsonable(value: Any) -> Any:
+    """JSON de respuestas de las APIs (namedtuples de ryanair-py, datetimes...)."""
+    if isinstance(value, (datetime, date)):
+        return {"__dt__": value.isoformat()}
+    if hasattr(value, "_asdict"):
+        return {k: to_jsonable(v) for k, v in value._asdict().items()}
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [to_jsonable(v) for v in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def _write_json(path: Path, data: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+    tmp.replace(path)
+
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    if not path.exists():
+        return None
+    data = json.loads(path.read_text(encoding="utf-8"))
+    if data.get("version") != FIXTURE_VERSION:
+        print(f"⚠️ Fixture con otra versión, se ignora: {path}")
+        return None
+    return data
+
+
+# -------------------------------
+# Vuelos
+# -------------------------------
+
+def flight_to_dict(f: Flight) -> Dict[str, Any]:
+    # vars() incluye atributos añadidos fuera del dataclass (booking_token)
+    return {k: to_jsonable(v) for k, v in vars(f).items()}
+
+
+def flight_from_dict(d: Dict[str, Any]) -> Flight:
+    f = Flight(**{k: v for k, v in d.items() if k in _FLIGHT_FIELDS})
+    if f.leg_times is not None:
+        f.leg_times = tuple(f.leg_times)
+    for k, v in d.items():
+        if k not in _FLIGHT_FIELDS:
+            setattr(f, k, v)
+    return f
+
+
+def _window_of(date_pairs: List[Tuple[date, date]]) -> Tuple[date, date]:
+    return min(d for d, _ in date_pairs), max(r for _, r in date_pairs)
+
+
+def _flights_path(provider: str, origin: str, date_pairs: List[Tuple[date, date]]) -> Path:
+    start, end = _window_of(date_pairs)
+    return FIXTURES_DIR / "flights" / f"{provider}_{origin.upper()}_{start}_{end}.json"
+
+
+def save_flights(provider: str, origin: str, date_pairs, flights: List[Flight]) -> None:
+    if not date_pairs:
+        return
+    path = _flights_path(provider, origin, date_pairs)
+    _write_json(path, {
+        "version": FIXTURE_VERSION,
+        "provider": provider,
+        "origin": origin.upper(),
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+        "flights": [flight_to_dict(f) for f in flights],
+    })
+    print(f"📼 Grabados {len(flights)} vuelos de {provider} ({origin}) → {path}")
+
+
+def load_flights(provider: str, origin: str, date_pairs) -> Optional[List[Flight]]:
+    """Vuelos grabados para la ventana, o None si no hay fixture."""
+    if not date_pairs:
+        return []
+    data = _read_json(_flights_path(provider, origin, date_pairs))
+    if data is None:
+        return None
+    return [flight_from_dict(d) for d in data.get("flights", [])]
+
+
+def append_raw(provider: str, call: str, args: Any, result: Any) -> None:
+    path = FIXTURES_DIR / "raw" / f"{provider}.jsonl"
+    line = json.dumps(
+        {
+            "version": FIXTURE_VERSION,
+            "call": call,
+            "args": to_jsonable(args),
+            "result": to_jsonable(result),
+        },
+        ensure_ascii=False,
+    )
+    with _raw_lock:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a", encoding="utf-8") as fh:
+            fh.write(line + "\n")
+
+
+# -------------------------------
+# Captions
+# -------------------------------
+
+def save_caption(key: str, caption_json: Dict[str, Any]) -> None:
+    _write_json(FIXTURES_DIR / "captions" / f"{key}.json", {
+        "version": FIXTURE_VERSION,
+        "caption": caption_json,
+    })
+
+
+def load_caption(key: str) -> Optional[Dict[str, Any]]:
+    data = _read_json(FIXTURES_DIR / "captions" / f"{key}.json")
+    return data.get("caption") if data else None
+
+
+# -------------------------------
+# Manifest (ventana grabada)
+# -------------------------------
+
+def save_manifest(window: Tuple[date, date], markets: List[str]) -> None:
+    _write_json(FIXTURES_DIR / "manifest.json", {
+        "version": FIXTURE_VERSION,
+        "window": [window[0].isoformat(), window[1].isoformat()],
+        "markets": list(markets),
+        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+    })
+
+
+def recorded_window() -> Optional[Tuple[date, date]]:
+    """Ventana de la última grabación: en replay hay que buscar la misma."""
+    data = _read_json(FIXTURES_DIR / "manifest.json")
+    if not data or not data.get("window"):
+        return None
+    start, end = data["window"]
+    return date.fromisoformat(start), date.fromisoformat(end)
@@ -0,0 +1,89 @@
+# offline/providers.py
+"""
+FlightAPI de record/replay. flights.providers.build_provider los usa según
+offline.mode():
+
+- RecordingFlightAPI envuelve el proveedor real: graba los vuelos que
+  devuelve cada búsqueda y, vía el breaker, cada respuesta cruda
+  (get_cheapest_return_flights, JSON de /v2/search, ...).
+- ReplayFlightAPI no hace red: devuelve los vuelos grabados para la
+  misma ventana. Sin fixture → lista vacía (y aviso).
+"""
+from __future__ import annotations
+
+from datetime import date
+from typing import Dict, List, Set, Tuple
+
+from flights.base import Flight, FlightAPI
+import offline.fixtures as fx
+
+
+class _RecordingCaller:
+    """Se pone como breaker del API real: llama al breaker y graba la respuesta."""
+
+    def __init__(self, provider: str, inner=None):
+        self.provider = provider
+        self.inner = inner
+
+    def call(self, fn, *args, **kwargs):
+        if self.inner is not None:
+            result = self.inner.call(fn, *args, **kwargs)
+        else:
+            result = fn(*args, **kwargs)
+        fx.append_raw(self.provider, getattr(fn, "__name__", str(fn)), [args, kwargs], result)
+        return result
+
+
+class RecordingFlightAPI(FlightAPI):
+    def __init__(self, provider: str, api: FlightAPI):
+        self.provider = provider
+        self.api = api
+        self.origin = getattr(api, "origin", "")
+        api.breaker = _RecordingCaller(provider, api.breaker)
+
+    def failed_for(self, origin: str) -> Set[Tuple[date, date]]:
+        return self.api.failed_for(origin)
+
+    def search(self, depart_date, return_date) -> List[Flight]:
+        flights = self.api.search(depart_date, return_date)
+        pair = [(date.fromisoformat(str(depart_date)[:10]), date.fromisoformat(str(return_date)[:10]))]
+        fx.save_flights(self.provider, self.origin, pair, flights)
+        return flights
+
+    def search_window(self, date_pairs: List[Tuple[date, date]]) -> List[Flight]:
+        flights = self.api.search_window(date_pairs)
+        fx.save_flights(self.provider, self.origin, date_pairs, flights)
+        return flights
+
+    def search_window_multi(self, origins: List[str], date_pairs) -> Dict[str, List[Flight]]:
+        by_origin = self.api.search_window_multi(origins, date_pairs)
+        for origin in origins:
+            fx.save_flights(self.provider, origin, date_pairs, by_origin.get(origin.upper(), []))
+        return by_origin
+
+
+class ReplayFlightAPI(FlightAPI):
+    def __init__(self, provider: str, origin: str):
+        self.provider = provider
+        self.origin = origin.upper()
+
+    def _load(self, origin: str, date_pairs) -> List[Flight]:
+        flights = fx.load_flights(self.provider, origin, date_pairs)
+        if flights is None:
+            print(f"⚠️ [replay] Sin fixture de {self.provider} para {origin}; 0 vuelos")
+            return []
+        print(f"📼 [replay] {len(flights)} vuelos de {self.provider} ({origin})")
+        return [
+            f for f in flights
+            if not self._in_cooldown(f.origin, f.destination, f.start_date, f.end_date)
+        ]
+
+    def search(self, depart_date, return_date) -> List[Flight]:
+        pair = [(date.fromisoformat(str(depart_date)[:10]), date.fromisoformat(str(return_date)[:10]))]
+        return self._load(self.origin, pair)
+
+    def search_window(self, date_pairs: List[Tuple[date, date]]) -> List[Flight]:
+        return self._load(self.origin, date_pairs)
+
+    def search_window_multi(self, origins: List[str], date_pairs) -> Dict[str, List[Flight]]:
+        return {o.upper(): self._load(o.upper(), date_pairs) for o in origins}
@@ -0,0 +1,153 @@
+# offline/services.py
+"""
+Sustitutos locales de los servicios externos para el modo replay:
+
+- caption_json: captions grabados (o una plantilla) en vez de OpenAI
+- LocalBot: imprime lo que se mandaría al chat de review (Telegram)
+- local_s3_put: copia a OFFLINE_OUT_DIR/s3/<bucket>/<key> en vez de S3
+- LOCAL_GRAPH: sesión tipo requests que responde como la Graph API
+
+Photon (geocoding de distancias) no necesita sustituto: en replay no se
+construye RyanairAPI, los vuelos grabados ya llevan distance_km.
+"""
+from __future__ import annotations
+
+import itertools
+import json
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+import offline
+import offline.fixtures as fx
+from config.settings import OFFLINE_OUT_DIR
+
+OUT_DIR = Path(OFFLINE_OUT_DIR)
+
+
+# -------------------------------
+# OpenAI (captions)
+# -------------------------------
+
+def _template_caption(payload: Dict[str, Any]) -> Dict[str, Any]:
+    dest = payload.get("destination_city") or payload.get("destination_airport") or "tu destino"
+    origin = payload.get("origin_city") or payload.get("origin_airport") or ""
+    price = payload.get("price_eur")
+    tags = " ".join(payload.get("hashtags_base") or [])
+    return {
+        "hook": f"{dest} está más cerca de lo que crees",
+        "bridge": f"Vuelos desde {origin} por {price:.0f}€ ida y vuelta." if price else f"Vuelos desde {origin}.",
+        "dates_block": payload.get("dates_block") or "",
+        "itinerary_block": "",
+        "extra_block": "",
+        "cta_block": f"Reserva en {payload.get('booking_hint') or 'el enlace de la bio'}.",
+        "hashtags": tags,
+    }
+
+
+def caption_json(payload: Dict[str, Any], generate: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    record: llama al modelo y graba el JSON por clave de payload.
+    replay: JSON grabado si lo hay; si no, plantilla local.
+    """
+    from content.caption_cache import cache_key
+
+    key = cache_key(payload)
+    if offline.is_recording():
+        cj = generate(payload)
+        fx.save_caption(key, cj)
+        return cj
+
+    cj = fx.load_caption(key)
+    if cj is None:
+        print(f"⚠️ [replay] Caption sin grabar (key={key[:10]}), se usa plantilla")
+        cj = _template_caption(payload)
+    return cj
+
+
+# -------------------------------
+# Telegram
+# -------------------------------
+
+class LocalBot:
+    """Mismos métodos que telegram.Bot que usa el flujo de review."""
+
+    def __init__(self, log_path: Optional[Path] = None):
+        self.log_path = log_path or OUT_DIR / "telegram.jsonl"
+        self._ids = itertools.count(1)
+
+    def _log(self, kind: str, **data: Any) -> Dict[str, Any]:
+        entry = {"message_id": next(self._ids), "kind": kind, **data}
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.log_path.open("a", encoding="utf-8") as fh:
+            fh.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        return entry
+
+    def send_video(self, chat_id, video, reply_markup=None, **kwargs):
+        name = getattr(video, "name", str(video))
+        print(f"📨 [offline] send_video chat={chat_id} video={name}")
+        return self._log("video", chat_id=chat_id, video=name)
+
+    def send_message(self, chat_id, text, reply_markup=None, **kwargs):
+        print(f"📨 [offline] send_message chat={chat_id} ({len(text or '')} chars)")
+        return self._log("message", chat_id=chat_id, text=text)
+
+
+# -------------------------------
+# S3
+# -------------------------------
+
+def local_s3_put(bucket: str, key: str, src: Optional[Path] = None, body: Optional[bytes] = None) -> str:
+    dst = OUT_DIR / "s3" / (bucket or "bucket") / key
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if src is not None:
+        shutil.copyfile(src, dst)
+    else:
+        dst.write_bytes(body or b"")
+    print(f"🪣 [offline] S3 → {dst}")
+    return dst.resolve().as_uri()
+
+
+# -------------------------------
+# Graph API (Instagram)
+# -------------------------------
+
+class _LocalResponse:
+    def __init__(self, data: Dict[str, Any], status_code: int = 200):
+        self._data = data
+        self.status_code = status_code
+        self.text = json.dumps(data)
+
+    def json(self) -> Dict[str, Any]:
+        return self._data
+
+    def raise_for_status(self) -> None:
+        return None
+
+
+class LocalGraphSession:
+    """Responde a lo que usa instagram.ig_client (contenedor, estado, publish, permalink)."""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _new_id(self, prefix: str) -> str:
+        with self._lock:
+            return f"offline-{prefix}-{next(self._ids)}"
+
+    def post(self, url: str, data=None, **kwargs) -> _LocalResponse:
+        if url.endswith("/media_publish"):
+            return _LocalResponse({"id": self._new_id("reel")})
+        return _LocalResponse({"id": self._new_id("container")})
+
+    def get(self, url: str, params=None, **kwargs) -> _LocalResponse:
+        media_id = url.rstrip("/").rsplit("/", 1)[-1]
+        fields = (params or {}).get("fields", "")
+        if "permalink" in fields:
+            return _LocalResponse({"permalink": f"https://www.instagram.com/reel/{media_id}/"})
+        return _LocalResponse({"id": media_id, "status_code": "FINISHED", "status": "Finished"})
+
+
+LOCAL_GRAPH = LocalGraphSession()
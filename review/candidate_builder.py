@@ -0,0 +1,158 @@
+# review/candidate_builder.py
+"""
+Caption + hook + reel de un candidato, con el caption y el render en paralelo.
+
+El caption es una llamada a OpenAI (red, varios segundos) y el render es
+CPU; el render solo necesita el hook de curiosidad, que es local. Así que:
+  1) se lanza el caption en un hilo (CAPTION_POOL)
+  2) se calcula el hook y se renderiza en el hilo que llama
+  3) se espera al caption
+El tiempo por candidato pasa de LLM + render a max(LLM, render).
+
+Lo usan main.build_video_and_caption y el bot (_build_reel_for_candidate,
+también dentro de los procesos de pre-render).
+"""
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import config.lazy_import as lazy_import
+from config.lazy_import import lazy_module
+from content.destinations import get_country
+import content.video_hook_curiosity as vh
+
+cb = lazy_module("content.caption_builder")
+vg = lazy_module("media.video_generator")
+rab = lazy_module("media.reel_ab")
+
+DEFAULT_LOGO_PATH = "media/images/EscapGo_circ_logo_transparent.png"
+
+
+def preload() -> None:
+    """Carga los módulos perezosos antes de usar hilos (ver config/lazy_import.py)."""
+    lazy_import.preload(cb, vg, rab)
+
+
+# Hilos para las llamadas al LLM (I/O): no compiten con el render por CPU
+CAPTION_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="caption")
+
+
+@dataclass
+class CandidateBuild:
+    caption: str
+    video_path: str                   # ruta local (o URL si se subió a S3)
+    video_hook: str
+    variant: str                      # "new|origin_pill_on", como en los jobs
+    origin_pill_variant: str
+    bg_image_path: str
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+def _get(flight: Any, name: str, default=None):
+    if isinstance(flight, dict):
+        return flight.get(name, default)
+    return getattr(flight, name, default)
+
+
+def build_hook(flight: Any, category_label: str) -> str:
+    """Hook de curiosidad del vídeo (local, sin red)."""
+    return vh.build_video_hook_curiosity(
+        category_label=str(category_label),
+        country=get_country(_get(flight, "destination")),
+        discount_pct=_get(flight, "discount_pct"),
+        price=_get(flight, "price"),
+        start_date=str(_get(flight, "start_date", ""))[:10],
+        end_date=str(_get(flight, "end_date", ""))[:10],
+        max_len=44,
+    )
+
+
+def _timed_caption(flight: Any, caption_kwargs: Dict[str, Any]) -> tuple[str, float]:
+    t0 = time.perf_counter()
+    caption = cb.build_caption_for_flight(flight, **caption_kwargs)
+    return caption, time.perf_counter() - t0
+
+
+def build_candidate(
+    flight: Any,
+    out_path: str | Path,
+    brand_handle: str,
+    category_code: Optional[str] = None,
+    category_label: Optional[str] = None,
+    booking_hint: Optional[str] = None,
+    logo_path: Optional[str] = None,
+    ab_ratio_new: float = 0.5,
+    encode_profile: str = "preview",
+    bg_image_path: Optional[str] = None,
+) -> CandidateBuild:
+    """
+    Genera caption + hook + reel para un vuelo (Flight o dict de candidato).
+    Si falla el caption se relanza la excepción (aunque el vídeo ya esté).
+    """
+    caption_kwargs: Dict[str, Any] = {
+        "category_code": category_code,
+        "tone": "emocional",
+        "brand_handle": brand_handle,
+    }
+    if booking_hint:
+        caption_kwargs["booking_hint"] = booking_hint
+
+    t0 = time.perf_counter()
+    caption_fut = CAPTION_POOL.submit(_timed_caption, flight, caption_kwargs)
+
+    try:
+        video_hook = build_hook(flight, category_label or category_code or "")
+
+        out_path = Path(out_path)
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        if not bg_image_path:
+            bg_image_path = str(vg.pick_background_for_destination(_get(flight, "destination") or ""))
+
+        t_render = time.perf_counter()
+        video_path_or_url, variant_used, origin_pill_variant = rab.create_reel_for_flight_ab(
+            flight,
+            out_mp4_path=str(out_path),
+            logo_path=logo_path or DEFAULT_LOGO_PATH,
+            brand_line=brand_handle,
+            duration=6.0,
+            s3_bucket=None,
+            hook_text=video_hook,
+            hook_mode="band",
+            variant="auto",
+            ratio_new=ab_ratio_new,
+            key_mode="route_dates",
+            origin_pill_ab_ratio=1,  # ✅ pill A/B 50/50
+            encode_profile=encode_profile,
+            bg_image_path=bg_image_path,
+        )
+        render_s = time.perf_counter() - t_render
+    except BaseException:
+        caption_fut.cancel()
+        raise
+
+    caption, caption_s = caption_fut.result()
+    total_s = time.perf_counter() - t0
+
+    timings = {
+        "caption": round(caption_s, 3),
+        "render": round(render_s, 3),
+        "total": round(total_s, 3),
+    }
+    print(
+        f"⏱  Candidato {_get(flight, 'origin')}→{_get(flight, 'destination')}: "
+        f"caption={caption_s:.1f}s render={render_s:.1f}s total={total_s:.1f}s"
+    )
+
+    return CandidateBuild(
+        caption=caption,
+        video_path=str(video_path_or_url or out_path),
+        video_hook=video_hook,
+        variant=f"{variant_used}|{origin_pill_variant}",
+        origin_pill_variant=origin_pill_variant,
+        bg_image_path=bg_image_path,
+        timings=timings,
+    )
@@ -0,0 +1,129 @@
+# review/job_executor.py
+"""
+Ejecutor de acciones pesadas del bot de revisión (búsqueda de vuelos,
+OpenAI, render, S3, espera de Instagram).
+
+Los handlers de Telegram solo validan, contestan al botón y hacen submit();
+el trabajo real corre en un pool de hilos, así el bot sigue atendiendo
+otros clics/markets mientras tanto.
+
+- Una sola tarea en curso por clave (normalmente el job_id): un doble clic
+  no lanza dos publicaciones.
+- Cancelación cooperativa por tarea: la tarea comprueba ctx.check_cancelled()
+  entre pasos (y puede pasar ctx.cancel_event a esperas largas).
+- ctx.progress(texto) envía mensajes de progreso al chat de la tarea.
+"""
+from __future__ import annotations
+
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, Dict, Optional
+
+
+class JobCancelled(Exception):
+    """La tarea se ha cancelado desde Telegram (botón ❌ Cancelar)."""
+
+
+class TaskContext:
+    def __init__(self, key: str, bot: Any = None, chat_id: Optional[int] = None):
+        self.key = key
+        self.bot = bot
+        self.chat_id = chat_id
+        self.cancel_event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self) -> None:
+        if self.cancel_event.is_set():
+            raise JobCancelled(self.key)
+
+    def progress(self, text: str, **kwargs) -> None:
+        """Mensaje de progreso al chat; si falla Telegram, solo se loguea."""
+        print(f"[{self.key}] {text}")
+        if self.bot is None or self.chat_id is None:
+            return
+        try:
+            self.bot.send_message(chat_id=self.chat_id, text=text, **kwargs)
+        except Exception as e:
+            print(f"⚠️ No se pudo enviar progreso a Telegram: {e}")
+
+
+class JobExecutor:
+    def __init__(self, max_workers: int = 4):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="review-job")
+        self._lock = threading.Lock()
+        self._running: Dict[str, TaskContext] = {}
+
+    def is_running(self, key: str) -> bool:
+        with self._lock:
+            return key in self._running
+
+    def submit(
+        self,
+        key: str,
+        fn: Callable[..., Any],
+        *args,
+        bot: Any = None,
+        chat_id: Optional[int] = None,
+        on_cancel: Optional[Callable[[TaskContext], None]] = None,
+        on_error: Optional[Callable[[TaskContext], None]] = None,
+        **kwargs,
+    ) -> Optional[Future]:
+        """
+        Lanza fn(ctx, *args, **kwargs) en el pool.
+        Devuelve None si ya hay una tarea en curso con esa clave.
+        on_cancel(ctx) se llama si la tarea termina por JobCancelled;
+        on_error(ctx), si termina por cualquier otra excepción.
+        """
+        ctx = TaskContext(key, bot=bot, chat_id=chat_id)
+        with self._lock:
+            if key in self._running:
+                return None
+            self._running[key] = ctx
+
+        def _run():
+            try:
+                return fn(ctx, *args, **kwargs)
+            except JobCancelled:
+                ctx.progress("⛔ Acción cancelada.")
+                if on_cancel is not None:
+                    try:
+                        on_cancel(ctx)
+                    except Exception as e:
+                        print(f"⚠️ Error en on_cancel de {key}: {e}")
+            except Exception as e:
+                traceback.print_exc()
+                ctx.progress(f"❌ Error inesperado: {e}")
+                if on_error is not None:
+                    try:
+                        on_error(ctx)
+                    except Exception as e2:
+                        print(f"⚠️ Error en on_error de {key}: {e2}")
+            finally:
+                with self._lock:
+                    self._running.pop(key, None)
+
+        return self._pool.submit(_run)
+
+    def cancel(self, key: str) -> bool:
+        """Marca la tarea para cancelar. False si no había ninguna en curso."""
+        with self._lock:
+            ctx = self._running.get(key)
+        if ctx is None:
+            return False
+        ctx.cancel_event.set()
+        return True
+
+    def shutdown(self, wait: bool = True, cancel: bool = False) -> None:
+        """
+        Cierra el pool. Por defecto las tareas en curso terminan (una
+        publicación a medias no se aborta); cancel=True las marca para cancelar.
+        """
+        if cancel:
+            with self._lock:
+                for ctx in self._running.values():
+                    ctx.cancel_event.set()
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,309 @@
+# review/job_store.py
+"""
+Almacén de jobs de revisión en SQLite (un único fichero, compartido entre
+main.py y el bot).
+
+Sustituye a review_jobs/<uuid>.json + el dict PENDING_JOBS por proceso:
+  - lectura por job_id y por market (índices)
+  - estado del job con transiciones atómicas (UPDATE ... WHERE state IN ...),
+    así dos procesos/clics no pueden publicar el mismo job dos veces
+  - GC por antigüedad según estado (gc()), que además avisa para borrar
+    los vídeos asociados
+
+Estados:
+  pending    → registrado, aún no enviado a Telegram
+  rendering  → generando otro candidato ("🔁 Otro")
+  sent       → en el chat de revisión, esperando botón
+  approved   → aprobado, publicándose
+  published  → publicado en IG (terminal)
+  failed     → falló la publicación (terminal)
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+DB_PATH = Path("review_jobs/jobs.sqlite3")
+
+STATES = ("pending", "rendering", "sent", "approved", "published", "failed")
+OPEN_STATES = ("pending", "rendering", "sent", "approved")
+TERMINAL_STATES = ("published", "failed")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id      TEXT PRIMARY KEY,
+    market      TEXT,
+    state       TEXT NOT NULL,
+    data        TEXT NOT NULL,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_market_state ON jobs(market, state);
+CREATE INDEX IF NOT EXISTS idx_jobs_state_updated ON jobs(state, updated_at);
+"""
+
+_initialized: set[str] = set()
+
+
+@contextmanager
+def _connect(db_path: Path = DB_PATH):
+    """
+    Conexión corta por operación (sqlite3 no comparte conexiones entre
+    hilos). WAL + busy_timeout para convivir con el otro proceso.
+    """
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    try:
+        key = str(db_path.resolve())
+        if key not in _initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            _initialized.add(key)
+        yield conn
+    finally:
+        conn.close()
+
+
+@contextmanager
+def _transaction(conn: sqlite3.Connection):
+    # IMMEDIATE: reserva la escritura desde el principio (read-modify-write seguro)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _check_state(state: str) -> None:
+    if state not in STATES:
+        raise ValueError(f"Estado de job desconocido: {state!r}")
+
+
+# ---------------------------------------------------------------------------
+# CRUD
+# ---------------------------------------------------------------------------
+
+def put(
+    job_id: str,
+    data: Dict[str, Any],
+    state: Optional[str] = None,
+    db_path: Path = DB_PATH,
+) -> None:
+    """
+    Inserta o actualiza los datos del job. Si state es None se conserva el
+    estado actual (o "pending" si el job es nuevo).
+    """
+    now = time.time()
+    payload = json.dumps(data, ensure_ascii=False)
+    market = data.get("market")
+    if state is not None:
+        _check_state(state)
+
+    with _connect(db_path) as conn:
+        conn.execute(
+            """
+            INSERT INTO jobs (job_id, market, state, data, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(job_id) DO UPDATE SET
+                market = excluded.market,
+                data = excluded.data,
+                state = COALESCE(?, jobs.state),
+                updated_at = excluded.updated_at
+            """,
+            (job_id, market, state or "pending", payload, now, now, state),
+        )
+
+
+def get(job_id: str, db_path: Path = DB_PATH) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Devuelve (state, data) o None si no existe."""
+    with _connect(db_path) as conn:
+        row = conn.execute(
+            "SELECT state, data FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+    if row is None:
+        return None
+    return row["state"], json.loads(row["data"])
+
+
+def get_state(job_id: str, db_path: Path = DB_PATH) -> Optional[str]:
+    with _connect(db_path) as conn:
+        row = conn.execute("SELECT state FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return row["state"] if row else None
+
+
+def update(
+    job_id: str,
+    mutate: Callable[[Dict[str, Any]], None],
+    db_path: Path = DB_PATH,
+) -> bool:
+    """
+    Read-modify-write atómico de data: mutate(data) modifica el dict in-place.
+    False si el job no existe.
+    """
+    with _connect(db_path) as conn, _transaction(conn):
+        row = conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return False
+        data = json.loads(row["data"])
+        mutate(data)
+        conn.execute(
+            "UPDATE jobs SET data = ?, updated_at = ? WHERE job_id = ?",
+            (json.dumps(data, ensure_ascii=False), time.time(), job_id),
+        )
+    return True
+
+
+def transition(
+    job_id: str,
+    from_states: Iterable[str],
+    to_state: str,
+    error: Optional[str] = None,
+    db_path: Path = DB_PATH,
+) -> bool:
+    """
+    Cambia el estado solo si el actual está en from_states.
+    Devuelve True si se aplicó (es la "reserva" del job para quien lo llama).
+    """
+    _check_state(to_state)
+    from_states = tuple(from_states)
+    for st in from_states:
+        _check_state(st)
+    marks = ",".join("?" for _ in from_states)
+
+    with _connect(db_path) as conn:
+        cur = conn.execute(
+            f"""
+            UPDATE jobs SET state = ?, error = ?, updated_at = ?
+            WHERE job_id = ? AND state IN ({marks})
+            """,
+            (to_state, error, time.time(), job_id, *from_states),
+        )
+        return cur.rowcount == 1
+
+
+def delete(job_id: str, db_path: Path = DB_PATH) -> None:
+    with _connect(db_path) as conn:
+        conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+
+def list_jobs(
+    market: Optional[str] = None,
+    states: Optional[Iterable[str]] = None,
+    db_path: Path = DB_PATH,
+) -> List[Dict[str, Any]]:
+    """Jobs (más recientes primero) como dicts con job_id/market/state/updated_at/data."""
+    sql = "SELECT job_id, market, state, data, updated_at FROM jobs WHERE 1=1"
+    params: List[Any] = []
+    if market:
+        sql += " AND market = ?"
+        params.append(market)
+    if states:
+        states = tuple(states)
+        sql += f" AND state IN ({','.join('?' for _ in states)})"
+        params.extend(states)
+    sql += " ORDER BY updated_at DESC"
+
+    with _connect(db_path) as conn:
+        rows = conn.execute(sql, params).fetchall()
+    return [
+        {
+            "job_id": r["job_id"],
+            "market": r["market"],
+            "state": r["state"],
+            "updated_at": r["updated_at"],
+            "data": json.loads(r["data"]),
+        }
+        for r in rows
+    ]
+
+
+# ---------------------------------------------------------------------------
+# GC + migración
+# ---------------------------------------------------------------------------
+
+def gc(
+    ttl_by_state: Dict[str, float],
+    on_delete: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    now: Optional[float] = None,
+    db_path: Path = DB_PATH,
+) -> int:
+    """
+    Borra jobs cuyo updated_at es más antiguo que ttl_by_state[state]
+    (segundos). on_delete(job_id, data) se llama después de borrar cada uno
+    (para limpiar vídeos). Devuelve cuántos se han borrado.
+
+    El DELETE vuelve a comprobar estado y antigüedad: si entre la lectura y
+    el borrado un clic ha movido el job (p.ej. a "approved"), no se toca.
+    """
+    now = now or time.time()
+    expired: List[Tuple[str, str, float, Dict[str, Any]]] = []
+
+    with _connect(db_path) as conn:
+        for state, ttl in ttl_by_state.items():
+            _check_state(state)
+            cutoff = now - ttl
+            rows = conn.execute(
+                "SELECT job_id, data FROM jobs WHERE state = ? AND updated_at < ?",
+                (state, cutoff),
+            ).fetchall()
+            expired.extend((r["job_id"], state, cutoff, json.loads(r["data"])) for r in rows)
+
+    n = 0
+    for job_id, state, cutoff, data in expired:
+        with _connect(db_path) as conn:
+            cur = conn.execute(
+                "DELETE FROM jobs WHERE job_id = ? AND state = ? AND updated_at < ?",
+                (job_id, state, cutoff),
+            )
+        if cur.rowcount == 0:
+            continue
+        n += 1
+        if on_delete is not None:
+            try:
+                on_delete(job_id, data)
+            except Exception as e:
+                print(f"⚠️ Error limpiando media del job {job_id}: {e}")
+
+    return n
+
+
+def migrate_json_dir(jobs_dir: Path, state: str = "sent", db_path: Path = DB_PATH) -> int:
+    """
+    Importa los antiguos review_jobs/<uuid>.json (y los borra una vez
+    guardados en la base). Se conserva el mtime como fecha del job, para
+    que el GC se encargue de los abandonados.
+    """
+    jobs_dir = Path(jobs_dir)
+    if not jobs_dir.exists():
+        return 0
+
+    n = 0
+    for path in sorted(jobs_dir.glob("*.json")):
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            mtime = path.stat().st_mtime
+            with _connect(db_path) as conn:
+                conn.execute(
+                    """
+                    INSERT OR IGNORE INTO jobs
+                        (job_id, market, state, data, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    (path.stem, data.get("market"), state,
+                     json.dumps(data, ensure_ascii=False), mtime, mtime),
+                )
+            path.unlink()
+            n += 1
+        except Exception as e:
+            print(f"⚠️ No se pudo migrar {path.name}: {e}")
+    return n
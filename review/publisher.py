@@ -0,0 +1,282 @@
+# review/publisher.py
+"""
+Orquestador de la publicación de un reel (botón "✅ Publicar" y
+main.publish_to_instagram_and_update_web).
+
+Antes todo iba en serie. Ahora:
+  - cadena IG (en el hilo que llama):
+        S3 upload → contenedor → wait_until_ready → publish → permalink
+  - en paralelo con la cadena IG: URL de afiliado + entrada de la web
+    (no dependen del permalink; no escriben nada hasta que el reel está
+    publicado)
+  - tras publicar (con permalink o, si falla, con la URL del vídeo en S3),
+    en paralelo: JSONs de la web (+ 2 subidas a S3)
+    y registro en el histórico
+
+Cada paso queda cronometrado en PublishResult.timings y se añade una
+línea a PUBLISH_TIMINGS_LOG para seguir el tiempo aprobación → publicado.
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import affiliates.affiliates as af
+import web.exporter as ex
+import web.uploader as up
+from media import reel_uploader
+from flights.published_history import register_publication
+from instagram.ig_client import InstagramClient
+from review.job_executor import JobCancelled
+
+S3_BUCKET_REELS = "escapadasgo-reels"
+PUBLISH_TIMINGS_LOG = Path("review_jobs/publish_timings.jsonl")
+
+
+@dataclass
+class PublishRequest:
+    video_path: str | Path
+    caption: str
+    ig_user_id: Optional[str]
+    page_token: Optional[str]
+    flight: Any                        # candidato (dict) o Flight: afiliado + histórico
+    main_item: Dict[str, Any]          # formato de exporter (flight/category/score/...)
+    market: str
+    web_key_prefix: str
+    category_code: str = ""
+    ig_handle: Optional[str] = None
+    s3_bucket: str = S3_BUCKET_REELS
+    s3_prefix: str = ""
+    web_root: str = "web"
+    max_web_entries: int = 5
+    label: str = ""                    # p.ej. job_id, solo para logs
+
+
+@dataclass
+class PublishResult:
+    reel_id: Optional[str] = None      # el reel está publicado en IG
+    permalink: Optional[str] = None
+    video_url: Optional[str] = None
+    error: Optional[str] = None
+    web_key: Optional[str] = None
+    warnings: List[str] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        # Sin permalink el reel sigue publicado: web e histórico deben seguir
+        return self.reel_id is not None
+
+
+class _Clock:
+    def __init__(self, result: PublishResult):
+        self.result = result
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def step(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.result.timings[name] = round(time.perf_counter() - t0, 3)
+
+
+def _check_cancelled(cancel_event: Optional[threading.Event], label: str) -> None:
+    if cancel_event is not None and cancel_event.is_set():
+        raise JobCancelled(label)
+
+
+def _prepare_web(req: PublishRequest, clock: _Clock) -> Dict[str, Any]:
+    with clock.step("affiliate_url"):
+        affiliate_url = af.build_affiliate_url_for_flight(req.flight)
+    with clock.step("web_prepare"):
+        return ex.prepare_market_web_update(
+            main_item=req.main_item,
+            market=req.market,
+            web_root=req.web_root,
+            affiliate_url=affiliate_url,
+            max_entries=req.max_web_entries,
+        )
+
+
+def _publish_ig(
+    req: PublishRequest,
+    res: PublishResult,
+    clock: _Clock,
+    progress: Callable[[str], None],
+    cancel_event: Optional[threading.Event],
+) -> None:
+    # Guardas para evitar publicar con defaults del .env por accidente
+    if not req.ig_user_id or not req.page_token:
+        raise RuntimeError(
+            "Faltan ig_user_id/page_token. "
+            "Esto causaría publicar con defaults del .env en la cuenta incorrecta."
+        )
+
+    _check_cancelled(cancel_event, req.label)
+    with clock.step("s3_upload"):
+        res.video_url = reel_uploader.upload_reel(
+            local_path=req.video_path,
+            bucket=req.s3_bucket,
+            prefix=req.s3_prefix,
+        )
+
+    _check_cancelled(cancel_event, req.label)
+    ig = InstagramClient(ig_user_id=req.ig_user_id, page_token=req.page_token)
+    with clock.step("ig_container"):
+        creation_id = ig.create_reel_container(video_url=res.video_url, caption=req.caption)
+
+    progress("⏳ Instagram está procesando el vídeo…")
+    with clock.step("ig_processing"):
+        ready = ig.wait_until_ready(
+            creation_id,
+            cancel_event=cancel_event,
+            video_bytes=Path(req.video_path).stat().st_size,
+        )
+    _check_cancelled(cancel_event, req.label)
+    if not ready:
+        res.error = "Instagram no ha podido procesar el vídeo."
+        return
+
+    token = req.page_token or ""
+    print(
+        f"[PUBLISH] market={req.market} handle={req.ig_handle} "
+        f"ig_user_id={req.ig_user_id} token_suffix={token[-10:] if token else 'NONE'}"
+    )
+
+    # A partir de aquí ya no se cancela: el reel se publica
+    with clock.step("ig_publish"):
+        res.reel_id = ig.publish_reel(creation_id)
+    with clock.step("ig_permalink"):
+        try:
+            res.permalink = ig.get_media_permalink(res.reel_id)
+        except Exception as e:
+            print(f"⚠️ get_media_permalink({res.reel_id}) falló: {e}")
+    if not res.permalink:
+        # el reel está publicado: se sigue con web (vídeo de S3) e histórico
+        res.warnings.append(f"sin permalink del reel {res.reel_id}; la web enlaza el vídeo de S3")
+
+
+def _update_web(
+    req: PublishRequest,
+    res: PublishResult,
+    clock: _Clock,
+    pool: ThreadPoolExecutor,
+    prepared: Dict[str, Any],
+    progress: Callable[[str], None],
+) -> None:
+    with clock.step("web_write"):
+        results = ex.apply_market_web_update(prepared, reel_url=res.permalink or res.video_url)
+
+    def _upload(name: str) -> str:
+        key = f"{req.web_key_prefix}{name}.json"
+        with clock.step(f"s3_{name}"):
+            up.upload_flights_json(results[name], key=key)
+        return key
+
+    uploads = {name: pool.submit(_upload, name) for name in ("flights_of_the_day", "flights")}
+    for name, fut in uploads.items():
+        try:
+            key = fut.result()
+        except Exception as e:
+            res.warnings.append(f"S3 {name}: {e}")
+            continue
+        if name == "flights_of_the_day":
+            res.web_key = key
+            progress(f"🗂 Web actualizada y JSON subido a S3 (key={key}).")
+
+
+def _register_history(req: PublishRequest, clock: _Clock) -> None:
+    with clock.step("history"):
+        register_publication(req.flight, category_code=req.category_code or "")
+
+
+def publish(
+    req: PublishRequest,
+    progress: Callable[[str], None] = print,
+    cancel_event: Optional[threading.Event] = None,
+    started_at: Optional[float] = None,
+) -> PublishResult:
+    """
+    Publica el reel y actualiza web + histórico.
+
+    - progress(texto): mensajes de progreso (ctx.progress en el bot, print en main).
+    - cancel_event: cancela hasta justo antes de publish_reel (lanza JobCancelled).
+    - started_at: time.perf_counter() del clic en "Publicar", para medir
+      aprobación → publicado incluyendo el render final.
+
+    Los errores de IG van a result.error; los de web/histórico/permalink
+    (con el reel ya publicado, result.reel_id) a result.warnings.
+    """
+    res = PublishResult()
+    clock = _Clock(res)
+    t0 = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=4, thread_name_prefix="publish") as pool:
+        prep_fut = pool.submit(_prepare_web, req, clock)
+
+        try:
+            _publish_ig(req, res, clock, progress, cancel_event)
+        except JobCancelled:
+            raise
+        except Exception as e:
+            res.error = str(e)
+
+        if not res.ok:
+            _finish(req, res, t0, started_at)
+            return res
+
+        if started_at is not None:
+            res.timings["approval_to_live"] = round(time.perf_counter() - started_at, 3)
+        progress(f"✅ Reel publicado en Instagram:\n{res.permalink or f'id={res.reel_id}'}")
+
+        hist_fut = pool.submit(_register_history, req, clock)
+
+        try:
+            prepared = prep_fut.result()
+            _update_web(req, res, clock, pool, prepared, progress)
+        except Exception as e:
+            res.warnings.append(f"web: {e}")
+
+        wait([hist_fut])
+        try:
+            hist_fut.result()
+            progress("📝 Publicación registrada en historial (published_deals).")
+        except Exception as e:
+            res.warnings.append(f"historial: {e}")
+
+    _finish(req, res, t0, started_at)
+    return res
+
+
+def _finish(req: PublishRequest, res: PublishResult, t0: float, started_at: Optional[float]) -> None:
+    res.timings["total"] = round(time.perf_counter() - t0, 3)
+    if started_at is not None:
+        res.timings["since_approval"] = round(time.perf_counter() - started_at, 3)
+
+    steps = ", ".join(f"{k}={v:.1f}s" for k, v in res.timings.items())
+    status = "OK" if res.ok else f"ERROR ({res.error})"
+    print(f"⏱  Publicación {req.label or req.market} {status}: {steps}")
+
+    try:
+        PUBLISH_TIMINGS_LOG.parent.mkdir(parents=True, exist_ok=True)
+        with PUBLISH_TIMINGS_LOG.open("a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "at": datetime.now().isoformat(timespec="seconds"),
+                "label": req.label,
+                "market": req.market,
+                "ok": res.ok,
+                "error": res.error,
+                "timings": res.timings,
+            }, ensure_ascii=False) + "\n")
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar el log de tiempos: {e}")
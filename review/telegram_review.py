@@ -3,50 +3,84 @@ from datetime import date, timedelta
 from telegram.ext import MessageHandler, Filters
 
 import os
-import json
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from typing import Dict, Any, List
 import uuid
 from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Updater, CallbackQueryHandler, CommandHandler
 
-from instagram.ig_client import InstagramClient
 # from storage.uploader import get_public_url
 
-# IMPORTS NUEVOS: usa los que ya tienes en tu proyecto
-import content.caption_builder as cb
-import media.video_generator as vg
-import flights.aggregator as ag
+from config.lazy_import import lazy_module, preload
 
-import affiliates.affiliates as af
-import web.exporter as ex
-import web.uploader as up
-from flights.published_history import register_publication
-
-from content.destinations import get_country
-import content.video_hook_curiosity as vh
-import media.reel_ab as rab
+# Módulos pesados (MoviePy/NumPy, pandas/geopy/ryanair): se cargan en el
+# primer uso, no al arrancar el bot.
+ag = lazy_module("flights.aggregator")
+rab = lazy_module("media.reel_ab")
+from review.job_executor import JobExecutor, JobCancelled
+import review.job_store as js
+import review.publisher as pub
+import review.candidate_builder as candidate_builder
 
 from config.markets import MARKETS
+import offline
+from offline.services import LocalBot
 
 from config.settings import BOT_TOKEN,REVIEW_CHAT_ID 
+from config.settings import PRERENDER_AHEAD, REVIEW_POOL_MAX, REVIEW_POOL_PER_CATEGORY
+from config.settings import LIVE_CHECK_TOP_K
 
-S3_BUCKET_REELS = "escapadasgo-reels"
+S3_BUCKET_REELS = pub.S3_BUCKET_REELS
 # S3_PREFIX_REELS = "pmi/"   # si algún día tienes más markets, lo paramos
 # MARKET = "PMI"  # más adelante lo podrás hacer dinámico
 # LOGO_PATH = "media/images/EscapGo_circ_logo_transparent.png"
 
 
-# Carpeta para guardar los jobs en disco (compartida entre procesos)
+# Los jobs viven en SQLite (review/job_store.py), compartido entre main.py
+# y el bot. JOBS_DIR solo se mira para migrar los antiguos <uuid>.json.
 JOBS_DIR = Path("review_jobs")
-JOBS_DIR.mkdir(exist_ok=True)
-
-# Opcional: cache en memoria (solo útil dentro de cada proceso)
-PENDING_JOBS: Dict[str, Dict[str, Any]] = {}
-
-
-def _job_path(job_id: str) -> Path:
-    return JOBS_DIR / f"{job_id}.json"
+_LEGACY_MIGRATED = False
+
+# Días que se conserva un job según su estado antes de que gc_jobs() lo
+# borre junto con sus vídeos (los "sent" abandonados incluidos).
+JOB_TTL_DAYS = {
+    "pending": 2,
+    "rendering": 2,
+    "sent": 3,
+    "approved": 2,
+    "published": 7,
+    "failed": 7,
+}
+JOB_GC_INTERVAL_SEC = 6 * 3600
+
+# Reels de review ("🔁 Otro", "vuelo X Y") y versión final: un fichero por
+# job/candidato, que hay varios jobs renderizando/publicando a la vez.
+REVIEW_VIDEO_DIR = Path("media/videos")
+
+# Reels de los candidatos alternativos, renderizados en segundo plano
+# para que "🔁 Otro" sea un simple cambio de vídeo.
+PRERENDER_DIR = Path("media/videos/prerender")
+PRERENDER_WORKERS = 2
+# Un solo pool para todos los jobs (_prerender_pool): como mucho
+# PRERENDER_WORKERS renders a la vez, da igual cuántos markets o "🔁 Otro"
+# haya en marcha. Se crea al primer uso (los workers también importan
+# este módulo).
+_PRERENDER_POOL: ProcessPoolExecutor | None = None
+# jobs con un pre-render en marcha en este proceso (evita renders dobles)
+_prerender_running: set = set()
+# hilos de start_prerender vivos (shutdown_prerender los espera)
+_prerender_threads: set = set()
+_prerender_lock = threading.Lock()
+
+# Acciones pesadas (publicar, "Otro", "vuelo X Y") fuera de los handlers:
+# el bot sigue respondiendo a otros clics mientras se ejecutan.
+JOB_WORKERS = 4
+BOT_WORKERS = 8
+EXECUTOR = JobExecutor(max_workers=JOB_WORKERS)
 
 
 def _serialize_job(job: Dict[str, Any]) -> Dict[str, Any]:
@@ -66,9 +100,13 @@ def _serialize_job(job: Dict[str, Any]) -> Dict[str, Any]:
         "video_path": str(job["video_path"]),
         "video_hook": job.get("video_hook"),
         "variant": job.get("variant"),
+        "encode_profile": job.get("encode_profile"),
+        "bg_image_path": job.get("bg_image_path"),
+        "preview_path": str(job["preview_path"]) if job.get("preview_path") else None,
 
         "candidates": job.get("candidates", []),
         "current_index": job.get("current_index", 0),
+        "prerendered": job.get("prerendered", {}),
     }
 
 
@@ -89,30 +127,101 @@ def _deserialize_job(data: Dict[str, Any]) -> Dict[str, Any]:
         "video_path": Path(data["video_path"]),
         "video_hook": data.get("video_hook"),
         "variant": data.get("variant"),
+        "encode_profile": data.get("encode_profile"),
+        "bg_image_path": data.get("bg_image_path"),
+        "preview_path": Path(data["preview_path"]) if data.get("preview_path") else None,
 
         "candidates": data.get("candidates", []),
         "current_index": data.get("current_index", 0),
+        "prerendered": data.get("prerendered", {}),
     }
 
 
-def save_job(job_id: str, job: Dict[str, Any]) -> None:
-    with _job_path(job_id).open("w", encoding="utf-8") as f:
-        json.dump(_serialize_job(job), f, ensure_ascii=False, indent=2)
+def _ensure_migrated() -> None:
+    global _LEGACY_MIGRATED
+    if _LEGACY_MIGRATED:
+        return
+    _LEGACY_MIGRATED = True
+    n = js.migrate_json_dir(JOBS_DIR)
+    if n:
+        print(f"📦 Migrados {n} jobs de {JOBS_DIR}/*.json a {js.DB_PATH}")
+
+
+def save_job(job_id: str, job: Dict[str, Any], state: str | None = None) -> None:
+    """Guarda los datos del job; state=None conserva el estado actual."""
+    _ensure_migrated()
+    js.put(job_id, _serialize_job(job), state=state)
 
 
-def load_job(job_id: str) -> Dict[str, Any] | None:
-    path = _job_path(job_id)
-    if not path.exists():
+def load_job(job_id: str, include_closed: bool = False) -> Dict[str, Any] | None:
+    """
+    Devuelve el job o None. Los publicados/fallidos cuentan como
+    inexistentes salvo include_closed=True.
+    """
+    _ensure_migrated()
+    row = js.get(job_id)
+    if row is None:
+        return None
+    state, data = row
+    if state in js.TERMINAL_STATES and not include_closed:
         return None
-    with path.open("r", encoding="utf-8") as f:
-        data = json.load(f)
     return _deserialize_job(data)
 
 
 def delete_job(job_id: str) -> None:
-    path = _job_path(job_id)
-    if path.exists():
-        path.unlink()
+    job = load_job(job_id, include_closed=True)
+    if job:
+        _cleanup_prerendered(job)
+    js.delete(job_id)
+
+
+def _close_job(job_id: str, job: Dict[str, Any], state: str, error: str | None = None) -> None:
+    """approved → published/failed. Los pre-renders ya no sirven."""
+    js.transition(job_id, ("approved",), state, error=error)
+    _cleanup_prerendered(job)
+
+
+def _job_media_paths(data: Dict[str, Any]) -> List[Path]:
+    paths = []
+    if data.get("video_path"):
+        vp = Path(data["video_path"])
+        paths.append(vp)
+        if data.get("preview_path"):
+            # el preview del que salió la versión final
+            paths.append(Path(data["preview_path"]))
+        elif vp.stem.endswith("_final"):
+            # jobs antiguos: el final era <preview>_final.mp4
+            paths.append(vp.with_name(f"{vp.stem[:-len('_final')]}{vp.suffix}"))
+    for item in (data.get("prerendered") or {}).values():
+        if item.get("video_path"):
+            paths.append(Path(item["video_path"]))
+    return paths
+
+
+def gc_jobs(now: float | None = None) -> int:
+    """
+    Borra los jobs caducados (JOB_TTL_DAYS) y sus vídeos. Un vídeo que
+    siga referenciado por un job vivo no se borra (los jobs antiguos de
+    main.py compartían cfg.video_path).
+    """
+    _ensure_migrated()
+    now = now or time.time()
+    ttl = {state: days * 86400 for state, days in JOB_TTL_DAYS.items()}
+
+    live_paths = set()
+    for row in js.list_jobs():
+        if row["updated_at"] >= now - ttl.get(row["state"], 0):
+            live_paths.update(str(p) for p in _job_media_paths(row["data"]))
+
+    def _cleanup(job_id: str, data: Dict[str, Any]) -> None:
+        for p in _job_media_paths(data):
+            if str(p) not in live_paths:
+                p.unlink(missing_ok=True)
+
+    n = js.gc(ttl, on_delete=_cleanup, now=now)
+    if n:
+        print(f"🧹 GC de jobs: {n} borrados")
+    return n
 
 def _flight_to_dict(f: Any) -> Any:
     """
@@ -149,45 +258,87 @@ def _extract_origin_from_text(text: str, default_origin: str | None = None) -> s
     return default_origin
 
 
-def to_review_candidates(best_by_cat):
+def _only_date(dt_str) -> str:
+    """Solo fecha (YYYY-MM-DD)."""
+    s = str(dt_str)
+    if "T" in s:
+        s = s.split("T")[0]
+    if " " in s:
+        s = s.split(" ")[0]
+    return s[:10]
+
+
+def _candidate_from_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    f = item["flight"]
+    cat = item["category"]
+    return {
+        "category_code": cat["code"],
+        "category_label": cat["label"],
+
+        "origin": f.origin,
+        "destination": f.destination,
+        "start_date": _only_date(f.start_date),
+        "end_date": _only_date(f.end_date),
+        "price": float(f.price),
+        "airline": f.airline,
+        "link": f.link,
+
+        # opcionales por si los quieres luego en caption:
+        "distance_km": getattr(f, "distance_km", None),
+        "price_per_km": getattr(f, "price_per_km", None),
+        "score": item.get("score"),
+        "discount_pct": getattr(f, "discount_pct", None),
+        "route_typical_price": getattr(f, "route_typical_price", None),
+        "provider": getattr(f, "provider", None),
+        "sources": getattr(f, "sources", None),
+    }
+
+
+def to_review_candidates(best_by_cat, pool=None, max_candidates: int = REVIEW_POOL_MAX):
     """
     Utilidad opcional: convertir la lista best_by_cat en candidatos JSON-friendly.
     Cada item de best_by_cat es:
       {"flight": Flight(...), "category": {"code":..., "label":...}, "score": ...}
+
+    Con pool ({categoría: items ordenados}, de ag.get_top_by_category_scored)
+    se añaden detrás más alternativas, una categoría cada vez (round-robin),
+    sin repetir destino y hasta max_candidates en total. Los de best_by_cat
+    van primero y en el mismo orden (send_to_review reordena por índice).
+    De los top LIVE_CHECK_TOP_K de cada categoría solo se ofrecen los que
+    pasaron por live_check y siguen vivos; los de más abajo no se comprueban.
     """
-    candidates = []
-    for item in best_by_cat:
-        f = item["flight"]
-        cat = item["category"]
-
-        # opcional: solo fecha (YYYY-MM-DD)
-        def only_date(dt_str):
-            s = str(dt_str)
-            if "T" in s:
-                s = s.split("T")[0]
-            if " " in s:
-                s = s.split(" ")[0]
-            return s[:10]
-
-        candidates.append({
-            "category_code": cat["code"],
-            "category_label": cat["label"],
-
-            "origin": f.origin,
-            "destination": f.destination,
-            "start_date": only_date(f.start_date),
-            "end_date": only_date(f.end_date),
-            "price": float(f.price),
-            "airline": f.airline,
-            "link": f.link,
-
-            # opcionales por si los quieres luego en caption:
-            "distance_km": getattr(f, "distance_km", None),
-            "price_per_km": getattr(f, "price_per_km", None),
-            "score": item.get("score"),
-            "discount_pct": getattr(f, "discount_pct", None),
-            "route_typical_price": getattr(f, "route_typical_price", None),
-        })
+    candidates = [_candidate_from_item(item) for item in best_by_cat]
+    if not pool:
+        return candidates
+
+    taken = {id(item["flight"]) for item in best_by_cat}
+    dests = {item["flight"].destination for item in best_by_cat}
+    queues = [
+        [
+            item for rank, item in enumerate(items)
+            if rank >= LIVE_CHECK_TOP_K or item.get("live_checked")
+        ]
+        for items in pool.values()
+    ]
+
+    while queues and len(candidates) < max_candidates:
+        next_round = []
+        for queue in queues:
+            while queue:
+                item = queue.pop(0)
+                f = item["flight"]
+                if item.get("dropped") or id(f) in taken or f.destination in dests:
+                    continue
+                taken.add(id(f))
+                dests.add(f.destination)
+                candidates.append(_candidate_from_item(item))
+                break
+            if queue:
+                next_round.append(queue)
+            if len(candidates) >= max_candidates:
+                break
+        queues = next_round
+
     return candidates
 
 
@@ -208,6 +359,8 @@ def register_job(
     logo_path: str | None = None,
     ab_ratio_new: float = 0.5,
     variant: str | None = None,
+    encode_profile: str | None = None,
+    bg_image_path: str | Path | None = None,
 ):
     job = {
         "market": market,
@@ -226,12 +379,14 @@ def register_job(
         "video_path": Path(video_path),
         "video_hook": video_hook,
         "variant": variant,
+        "encode_profile": encode_profile,
+        "bg_image_path": str(bg_image_path) if bg_image_path else None,
 
         "candidates": candidates or [],
         "current_index": 0,
+        "prerendered": {},
     }
-    PENDING_JOBS[job_id] = job
-    save_job(job_id, job)
+    save_job(job_id, job, state="pending")
 
 
 def send_review_candidate(job_id: str):
@@ -239,20 +394,17 @@ def send_review_candidate(job_id: str):
     Envía al Telegram de revisión el vídeo + caption con botones de Aprobado/Otro.
     Usa la info desde disco por si se llama desde otro proceso.
     """
-    if not BOT_TOKEN or not REVIEW_CHAT_ID:
+    if offline.is_offline():
+        bot = LocalBot()
+    elif not BOT_TOKEN or not REVIEW_CHAT_ID:
         raise ValueError("Faltan TELEGRAM_BOT_TOKEN o TELEGRAM_REVIEW_CHAT_ID en .env")
-
-    bot = Bot(token=BOT_TOKEN)
-    job = PENDING_JOBS.get(job_id) or load_job(job_id)
+    else:
+        bot = Bot(token=BOT_TOKEN)
+    job = load_job(job_id)
     if not job:
         raise ValueError(f"Job {job_id} no encontrado para enviar a revisión.")
 
-    keyboard = InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton("✅ Publicar", callback_data=f"approve:{job_id}"),
-            InlineKeyboardButton("🔁 Otro", callback_data=f"another:{job_id}"),
-        ]
-    ])
+    keyboard = _review_keyboard(job_id)
 
     with job["video_path"].open("rb") as f:
         # 1) Enviamos el vídeo con los botones, pero SIN caption
@@ -269,6 +421,23 @@ def send_review_candidate(job_id: str):
         text=job["caption"],
     )
 
+    js.transition(job_id, ("pending",), "sent")
+
+
+def _review_keyboard(job_id: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton("✅ Publicar", callback_data=f"approve:{job_id}"),
+            InlineKeyboardButton("🔁 Otro", callback_data=f"another:{job_id}"),
+        ]
+    ])
+
+
+def _cancel_keyboard(task_key: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("❌ Cancelar", callback_data=f"cancel:{task_key}")]
+    ])
+
 
 # ---------- Helpers para "Otro" ----------
 
@@ -297,69 +466,250 @@ def _get_current_candidate(job: Dict[str, Any]) -> Dict[str, Any] | None:
     return candidates[idx]
 
 
-def _build_reel_for_candidate(candidate: Dict[str, Any], job: Dict[str, Any]) -> tuple[str, Path, str, str]:
-    # 1) Caption
+def _build_reel_for_candidate(
+    candidate: Dict[str, Any],
+    job: Dict[str, Any],
+    out_path: Path | None = None,
+    encode_profile: str = "preview",
+) -> tuple[str, Path, str, str, str]:
+    """
+    Genera caption + hook + reel para un candidato (caption y render en
+    paralelo, ver review/candidate_builder.py).
+    Devuelve (caption, video_path, video_hook, variant, bg_image_path).
+    Por defecto renderiza en perfil "preview"; la versión final se genera
+    al aprobar (_render_final_reel) con el mismo fondo, hook y variante.
+    """
     brand_handle = job.get("ig_handle") or "@escapadasgo"
     # booking_hint por mercado: si guardas uno explícito en job, úsalo. Si no:
     booking_hint = "escapadasgo.com o el enlace de la bio"
     if brand_handle == "@escapadasgo_mallorca":
         booking_hint = "escapadasgo.com/mallorca o el enlace de la bio"
-    
-    caption = cb.build_caption_for_flight(
+
+    if out_path is None:
+        out_path = REVIEW_VIDEO_DIR / f"reel_{uuid.uuid4().hex[:12]}.mp4"
+    out_path = Path(out_path)
+
+    build = candidate_builder.build_candidate(
         candidate,
-        category_code=candidate.get("category_code"),
-        tone="emocional",
+        out_path=out_path,
         brand_handle=brand_handle,
+        category_code=candidate.get("category_code"),
+        category_label=candidate.get("category_label"),
         booking_hint=booking_hint,
-    ).replace("\n\n\n", "\n\n")
-
-    # 2) Hook (curiosidad, premium)
-    category_label = candidate.get("category_label") or candidate.get("category_code") or ""
-    video_hook = vh.build_video_hook_curiosity(
-        category_label=str(category_label),
-        country=get_country(candidate.get("destination")),
-        discount_pct=candidate.get("discount_pct"),
-        price=candidate.get("price"),
-        start_date=str(candidate.get("start_date", ""))[:10],
-        end_date=str(candidate.get("end_date", ""))[:10],
-        max_len=44,
+        logo_path=job.get("logo_path"),
+        ab_ratio_new=float(job.get("ab_ratio_new", 0.5)),
+        encode_profile=encode_profile,
     )
 
-    # 3) Vídeo
-    out_dir = Path("media/videos")
-    out_dir.mkdir(parents=True, exist_ok=True)
-    out_path = out_dir / "reel.mp4"
+    caption = build.caption.replace("\n\n\n", "\n\n")
+    return caption, out_path, build.video_hook, build.variant, build.bg_image_path
+
+
+def review_video_path(job_id: str, idx: int) -> Path:
+    """Reel de review del candidato idx del job (main.py usa el idx 0)."""
+    return REVIEW_VIDEO_DIR / f"{job_id}_{idx}.mp4"
 
-    # vg.create_reel_for_flight(
-    #     flight=candidate,               # dict compatible
-    #     out_mp4_path=str(out_path),
-    #     logo_path=LOGO_PATH,
-    #     duration=6.0,
-    #     hook_text=video_hook,           # ✅ AQUÍ
-    #     hook_mode="band",               # ✅ AQUÍ
-    # )
 
+def _render_final_reel(job_id: str, candidate: Dict[str, Any], job: Dict[str, Any]) -> Path:
+    """
+    Re-encode en calidad "publish" del reel que se ha revisado en preview:
+    mismo fondo, hook, variante A/B y pill de origen.
+    """
+    variant, _, pill_variant = (job.get("variant") or "").partition("|")
+    if variant not in ("new", "old"):
+        variant = "auto"
+
+    brand_handle = job.get("ig_handle") or "@escapadasgo"
     logo_path = job.get("logo_path") or "media/images/EscapGo_circ_logo_transparent.png"
-    ratio_new = float(job.get("ab_ratio_new", 0.5))
-    
-    video_path_or_url, variant_used, origin_pill_variant = rab.create_reel_for_flight_ab(
+
+    out_path = REVIEW_VIDEO_DIR / f"{job_id}_final.mp4"
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    rab.create_reel_for_flight_ab(
         candidate,
         out_mp4_path=str(out_path),
         logo_path=logo_path,
         brand_line=brand_handle,
         duration=6.0,
         s3_bucket=None,
-        hook_text=video_hook,
+        hook_text=job.get("video_hook"),
         hook_mode="band",
-        variant="auto",
-        ratio_new=ratio_new,
+        variant=variant,
+        ratio_new=float(job.get("ab_ratio_new", 0.5)),
         key_mode="route_dates",
-        origin_pill_ab_ratio=1,  # ✅ pill A/B 50/50
+        force_origin_pill=(pill_variant == "origin_pill_on"),
+        encode_profile="publish",
+        bg_image_path=job.get("bg_image_path"),
     )
-    
-    combined_variant = f"{variant_used}|{origin_pill_variant}"
-    return caption, out_path, video_hook, combined_variant
+    return out_path
+
+
+
+# ---------- Pre-render de candidatos alternativos ----------
+
+def _prerender_path(job_id: str, idx: int) -> Path:
+    return PRERENDER_DIR / f"{job_id}_{idx}.mp4"
+
+
+def _prerender_pool() -> ProcessPoolExecutor:
+    global _PRERENDER_POOL
+    with _prerender_lock:
+        if _PRERENDER_POOL is None:
+            # "spawn": un fork desde el bot/main.py (con hilos) heredaría
+            # CAPTION_POOL sin sus hilos y el caption no terminaría nunca
+            _PRERENDER_POOL = ProcessPoolExecutor(
+                max_workers=PRERENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _PRERENDER_POOL
+
+
+def _prerender_worker(candidate: Dict[str, Any], job: Dict[str, Any], out_path: str) -> Dict[str, Any]:
+    """
+    Se ejecuta en un proceso aparte: caption + hook + vídeo de un candidato.
+    Devuelve un dict JSON-friendly para guardar en el job.
+    """
+    candidate_builder.preload()
+    caption, video_path, video_hook, variant, bg_path = _build_reel_for_candidate(
+        candidate, job, out_path=Path(out_path)
+    )
+    return {
+        "caption": caption,
+        "video_path": str(video_path),
+        "video_hook": video_hook,
+        "variant": variant,
+        "bg_image_path": bg_path,
+    }
+
+
+def _store_prerendered(job_id: str, idx: int, result: Dict[str, Any]) -> None:
+    """
+    Guarda el resultado en el job con un read-modify-write atómico (el bot
+    puede haber cambiado current_index mientras renderizábamos).
+    Si el job ya no existe (publicado/descartado), borra el vídeo.
+    """
+    def _add(data: Dict[str, Any]) -> None:
+        data.setdefault("prerendered", {})[str(idx)] = result
 
+    if js.get_state(job_id) not in js.OPEN_STATES or not js.update(job_id, _add):
+        Path(result["video_path"]).unlink(missing_ok=True)
+
+
+def _merge_prerendered(job_id: str, job: Dict[str, Any]) -> None:
+    """
+    Añade al job en memoria los pre-renders que otro proceso haya guardado
+    en disco, para no pisarlos al hacer save_job.
+    """
+    on_disk = load_job(job_id) or {}
+    merged = dict(on_disk.get("prerendered") or {})
+    merged.update(job.get("prerendered") or {})
+    job["prerendered"] = merged
+
+
+def _cleanup_prerendered(job: Dict[str, Any]) -> None:
+    for item in (job.get("prerendered") or {}).values():
+        try:
+            Path(item["video_path"]).unlink(missing_ok=True)
+        except Exception:
+            pass
+
+
+def prerender_candidates(job_id: str) -> int:
+    """
+    Renderiza (caption + reel) los PRERENDER_AHEAD candidatos siguientes al
+    actual (en el orden de "🔁 Otro") en el pool de pre-render y los va guardando
+    en job["prerendered"][idx]. Con pools grandes no se renderiza todo de
+    golpe: _another_job vuelve a lanzarlo al avanzar.
+    Devuelve cuántos candidatos se han pre-renderizado.
+    """
+    with _prerender_lock:
+        if job_id in _prerender_running:
+            return 0
+        _prerender_running.add(job_id)
+    try:
+        return _prerender_ahead(job_id)
+    finally:
+        with _prerender_lock:
+            _prerender_running.discard(job_id)
+
+
+def _prerender_ahead(job_id: str) -> int:
+    job = load_job(job_id)
+    if not job:
+        return 0
+
+    candidates = job.get("candidates") or []
+    done = job.get("prerendered") or {}
+    current = job.get("current_index", 0)
+    n = len(candidates)
+    ahead = [(current + step) % n for step in range(1, min(PRERENDER_AHEAD, n - 1) + 1)] if n else []
+    todo = [(i, candidates[i]) for i in ahead if str(i) not in done]
+    if not todo:
+        return 0
+
+    PRERENDER_DIR.mkdir(parents=True, exist_ok=True)
+    print(f"🧵 Pre-render de {len(todo)} candidatos para job={job_id}")
+
+    n_ok = 0
+    pool = _prerender_pool()
+    futures = {
+        pool.submit(_prerender_worker, c, job, str(_prerender_path(job_id, i))): i
+        for i, c in todo
+    }
+    for fut in as_completed(futures):
+        idx = futures[fut]
+        try:
+            result = fut.result()
+        except Exception as e:
+            print(f"⚠️ Pre-render idx={idx} falló: {e}")
+            continue
+        _store_prerendered(job_id, idx, result)
+        n_ok += 1
+        print(f"   ✔ Pre-render listo idx={idx} ({result['video_path']})")
+
+    return n_ok
+
+
+def _prerender_thread(job_id: str) -> None:
+    try:
+        prerender_candidates(job_id)
+    except Exception as e:
+        print(f"⚠️ Pre-render job={job_id} falló: {e}")
+    finally:
+        with _prerender_lock:
+            _prerender_threads.discard(threading.current_thread())
+
+
+def start_prerender(job_id: str) -> threading.Thread:
+    """
+    Lanza prerender_candidates en un hilo. Quien lo use debe llamar a
+    shutdown_prerender() antes de salir: al terminar el hilo principal,
+    concurrent.futures ya no acepta trabajos nuevos.
+    """
+    t = threading.Thread(
+        target=_prerender_thread,
+        args=(job_id,),
+        name=f"prerender-{job_id[:8]}",
+    )
+    with _prerender_lock:
+        _prerender_threads.add(t)
+    t.start()
+    return t
+
+
+def shutdown_prerender() -> None:
+    """Espera a los pre-renders en marcha y cierra el pool de pre-render."""
+    global _PRERENDER_POOL
+    with _prerender_lock:
+        threads = list(_prerender_threads)
+    if threads:
+        print(f"⏳ Esperando a {len(threads)} pre-render(s) en curso…")
+    for t in threads:
+        t.join()
+    with _prerender_lock:
+        pool, _PRERENDER_POOL = _PRERENDER_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=True)
 
 
 # --------- Handlers ----------
@@ -370,7 +720,7 @@ def start(update, context):
 
 def handle_button(update, context):
     query = update.callback_query
-    data = query.data  # "approve:<job_id>" o "another:<job_id>"
+    data = query.data  # "approve:<job_id>", "another:<job_id>" o "cancel:<task_key>"
 
     try:
         action, job_id = data.split(":", 1)
@@ -378,201 +728,257 @@ def handle_button(update, context):
         query.answer("Botón inválido.")
         return
 
-    # Intentamos memoria, y si no, disco
-    job = PENDING_JOBS.get(job_id) or load_job(job_id)
+    if action == "cancel":
+        if EXECUTOR.cancel(job_id):
+            query.answer("Cancelando…")
+            query.edit_message_reply_markup(reply_markup=None)
+        else:
+            query.answer("No hay ninguna acción en curso.")
+        return
+
+    job = load_job(job_id)
     if not job:
         query.answer("Este trabajo ya no existe.")
         return
 
+    if EXECUTOR.is_running(job_id):
+        query.answer("⏳ Ya hay una acción en curso para este job.")
+        return
+
     if action == "approve":
         query.answer("Publicando en Instagram…")
-        # quitamos los botones para que no se vuelva a pulsar
-        query.edit_message_reply_markup(reply_markup=None)
+        task, start_text = _approve_job, "🚀 Publicando en Instagram…"
+    elif action == "another":
+        query.answer("Buscando otra opción…")
+        task, start_text = _another_job, "🔁 Preparando otra opción…"
+    else:
+        query.answer("Acción desconocida.")
+        return
 
-        # ✅ Candidato actualmente seleccionado
-        cand = _get_current_candidate(job) or {}
+    # quitamos los botones para que no se vuelva a pulsar
+    query.edit_message_reply_markup(reply_markup=None)
+
+    fut = EXECUTOR.submit(
+        job_id,
+        task,
+        job_id,
+        start_text,
+        bot=context.bot,
+        chat_id=query.message.chat_id,
+        on_cancel=_resend_review_buttons,
+        on_error=_resend_review_buttons,
+    )
+    if fut is None:
+        query.message.reply_text("⏳ Ya hay una acción en curso para este job.")
 
-        # ------------------------------------------------------------------
-        # 1) Subir MP4 a S3 y publicar en Instagram
-        # ------------------------------------------------------------------
-        permalink = None
-        video_url = None
-        try:
-            # 1.1) Subir el vídeo local actual a S3
-            video_url = vg.upload_reel_to_s3(
-                local_path=job["video_path"],
-                bucket=S3_BUCKET_REELS,
-                prefix=job.get("s3_prefix_reels") or "",
-            )
 
-            # 1.2) Crear contenedor de Reel en IG usando la URL de S3
-            ig = InstagramClient(
-                ig_user_id=job.get("ig_user_id"),
-                page_token=job.get("page_token"),
-            )            
-            creation_id = ig.create_reel_container(
-                video_url=video_url,
-                caption=job["caption"],
-            )
+def _resend_review_buttons(ctx) -> None:
+    """
+    Tras cancelar (o un error inesperado) el job sigue pendiente: vuelve a
+    "sent" desde approved/rendering y se ofrecen otra vez los botones.
+    """
+    js.transition(ctx.key, ("approved", "rendering"), "sent")
+    if load_job(ctx.key):
+        ctx.progress("¿Qué hacemos con este candidato?", reply_markup=_review_keyboard(ctx.key))
 
-            # 1.3) Esperar a que IG procese el vídeo y publicar
-            if ig.wait_until_ready(creation_id):
-                # Logging correcto (usa job)
-                token = job.get("page_token") or ""
-                print(
-                    f"[PUBLISH] market={job.get('market')} "
-                    f"handle={job.get('ig_handle')} "
-                    f"ig_user_id={job.get('ig_user_id')} "
-                    f"token_suffix={token[-10:] if token else 'NONE'}"
-                )
-                
-                # Guardas para evitar publicar con defaults por accidente
-                if not job.get("ig_user_id") or not job.get("page_token"):
-                    raise RuntimeError(
-                        "Faltan ig_user_id/page_token en el job. "
-                        "Esto causaría publicar con defaults del .env en la cuenta incorrecta."
-                    )
-
-                reel_id = ig.publish_reel(creation_id)
-                permalink = ig.get_media_permalink(reel_id)
-                query.message.reply_text(f"✅ Reel publicado en Instagram:\n{permalink}")
-            else:
-                query.message.reply_text("❌ Instagram no ha podido procesar el vídeo.")
-                PENDING_JOBS.pop(job_id, None)
-                delete_job(job_id)
-                return
 
-        except Exception as e:
-            query.message.reply_text(f"❌ Error publicando en Instagram: {e}")
-            PENDING_JOBS.pop(job_id, None)
-            delete_job(job_id)
-            return
+def _main_item_for_candidate(cand: Dict[str, Any], job: Dict[str, Any]) -> Dict[str, Any]:
+    """main_item mínimo (formato de exporter) a partir del candidato actual."""
+    flight = cand or job.get("flight") or {}
+    return {
+        "flight": flight,
+        "category": {
+            "code": cand.get("category_code")
+                    or getattr(flight, "category_code", None),
+            "label": cand.get("category_label")
+                     or getattr(flight, "category_label", None),
+        },
+        "score": cand.get("score"),
+        "discount_pct": cand.get("discount_pct")
+                         or getattr(flight, "discount_pct", None),
+    }
 
-        # ------------------------------------------------------------------
-        # 2) Actualizar flights_of_the_day.json + subir a S3
-        # ------------------------------------------------------------------
-        try:
-            # Usamos SIEMPRE el candidato actual como base
-            flight_for_affiliate = cand or job.get("flight") or {}
-
-            # build_affiliate_url_for_flight ahora acepta Flight o dict
-            affiliate_url = af.build_affiliate_url_for_flight(flight_for_affiliate)
-
-            # Construimos un main_item mínimo para exporter.update_flights_json
-            main_item = {
-                "flight": cand or flight_for_affiliate,
-                "category": {
-                    "code": cand.get("category_code")
-                            or getattr(flight_for_affiliate, "category_code", None),
-                    "label": cand.get("category_label")
-                             or getattr(flight_for_affiliate, "category_label", None),
-                },
-                "score": cand.get("score"),
-                "discount_pct": cand.get("discount_pct")
-                                 or getattr(flight_for_affiliate, "discount_pct", None),
-            }
-
-            market = job.get("market") or "UNK"
-            web_key_prefix = job.get("web_key_prefix") or f"{market.lower()}/"
-            
-            # ✅ Actualiza los JSONs en la carpeta local del market: web/<slug>/
-            results = ex.update_market_web_jsons(
-                main_item=main_item,
-                market=market,
-                web_root="web",
-                reel_url=permalink or video_url,
-                affiliate_url=affiliate_url,
-                max_entries=5,
-            )
-            
-            # ✅ Subimos a S3 SOLO el flights_of_the_day.json (como haces hoy)
-            data_today = results["flights_of_the_day"]
-            key = f"{web_key_prefix}flights_of_the_day.json"
-            up.upload_flights_json(data_today, key=key)
-            
-            query.message.reply_text(
-                f"🗂 Web actualizada y JSON subido a S3 (key={key})."
-            )
 
-            data_flights = results["flights"]
-            key2 = f"{web_key_prefix}flights.json"
-            up.upload_flights_json(data_flights, key=key2)
+def _approve_job(ctx, job_id: str, start_text: str) -> None:
+    """
+    Publica el candidato actual del job (se ejecuta en EXECUTOR).
+    Cancelable hasta justo antes de publish_reel.
+    """
+    started_at = time.perf_counter()
 
-        except Exception as e:
-            query.message.reply_text(f"⚠️ Publicado en IG, pero error actualizando S3: {e}")
+    # Reserva atómica del job: otro proceso/clic no puede publicarlo a la vez
+    if not js.transition(job_id, ("sent", "pending"), "approved"):
+        ctx.progress("⚠️ Este job ya se está procesando o ya no está pendiente.")
+        return
+
+    ctx.progress(start_text, reply_markup=_cancel_keyboard(job_id))
 
-        # ------------------------------------------------------------------
-        # 3) Registrar publicación en histórico (published_deals.json)
-        # ------------------------------------------------------------------
+    job = load_job(job_id)
+    if not job:
+        ctx.progress("Este trabajo ya no existe.")
+        return
+
+    # ✅ Candidato actualmente seleccionado
+    cand = _get_current_candidate(job) or {}
+
+    # 1) Lo revisado era un preview → encode final en calidad "publish"
+    if job.get("encode_profile") == "preview":
+        ctx.check_cancelled()
+        ctx.progress("🎞 Generando versión final del reel…")
         try:
-            flight_for_history = cand or job.get("flight") or {}
-            category_code = (
-                cand.get("category_code")
-                or getattr(flight_for_history, "category_code", "")
-                or ""
-            )
-            register_publication(flight_for_history, category_code=category_code)
-            query.message.reply_text("📝 Publicación registrada en historial (published_deals).")
+            final_path = _render_final_reel(job_id, cand or job.get("flight") or {}, job)
         except Exception as e:
-            query.message.reply_text(f"⚠️ Error registrando en historial: {e}")
+            ctx.progress(f"❌ Error generando la versión final: {e}")
+            _close_job(job_id, job, "failed", error=str(e))
+            return
+        job["preview_path"] = job["video_path"]
+        job["video_path"] = final_path
+        job["encode_profile"] = "publish"
+        save_job(job_id, job)
 
-        # ------------------------------------------------------------------
-        # 4) Limpiar el job
-        # ------------------------------------------------------------------
-        PENDING_JOBS.pop(job_id, None)
-        delete_job(job_id)
+    # 2) S3 + Instagram, con web e histórico en paralelo (review/publisher.py)
+    market = job.get("market") or "UNK"
+    flight = cand or job.get("flight") or {}
+    req = pub.PublishRequest(
+        video_path=job["video_path"],
+        caption=job["caption"],
+        ig_user_id=job.get("ig_user_id"),
+        page_token=job.get("page_token"),
+        ig_handle=job.get("ig_handle"),
+        flight=flight,
+        main_item=_main_item_for_candidate(cand, job),
+        market=market,
+        web_key_prefix=job.get("web_key_prefix") or f"{market.lower()}/",
+        category_code=(
+            cand.get("category_code")
+            or getattr(flight, "category_code", "")
+            or ""
+        ),
+        s3_bucket=S3_BUCKET_REELS,
+        s3_prefix=job.get("s3_prefix_reels") or "",
+        label=job_id,
+    )
+    result = pub.publish(
+        req,
+        progress=ctx.progress,
+        cancel_event=ctx.cancel_event,
+        started_at=started_at,
+    )
 
-    elif action == "another":
-        query.answer("Buscando otra opción…")
-        query.edit_message_reply_markup(reply_markup=None)
+    if not result.ok:
+        ctx.progress(f"❌ Error publicando en Instagram: {result.error}")
+        _close_job(job_id, job, "failed", error=result.error)
+        return
 
-        next_cand = _pick_next_candidate(job)
-        if not next_cand:
-            query.message.reply_text("⚠️ No hay más opciones alternativas definidas.")
-            print("Sin más candidatos para este job.")
-            return
+    for w in result.warnings:
+        ctx.progress(f"⚠️ Publicado en IG, pero con errores: {w}")
 
-        print(f"Siguiente candidato: {next_cand.get('destination')} idx={job.get('current_index')}")
+    # 3) Cerrar el job (el GC lo borrará pasado JOB_TTL_DAYS)
+    _close_job(job_id, job, "published")
 
-        new_caption, new_video_path, new_hook, variant_used = _build_reel_for_candidate(next_cand, job)
-        job["variant"] = variant_used        
-        job["video_hook"] = new_hook
-        print(f"Nuevo video generado en: {new_video_path}")
 
-        job["caption"] = new_caption
-        job["video_path"] = new_video_path
-        job["video_hook"] = new_hook
+def _another_job(ctx, job_id: str, start_text: str) -> None:
+    """Pasa al siguiente candidato del job y lo envía a revisión (en EXECUTOR)."""
+    if not js.transition(job_id, ("sent", "pending"), "rendering"):
+        ctx.progress("⚠️ Este job ya se está procesando o ya no está pendiente.")
+        return
 
-        PENDING_JOBS[job_id] = job
-        save_job(job_id, job)
+    ctx.progress(start_text, reply_markup=_cancel_keyboard(job_id))
+
+    job = load_job(job_id)
+    if not job:
+        ctx.progress("Este trabajo ya no existe.")
+        return
 
-        keyboard = InlineKeyboardMarkup([
-            [
-                InlineKeyboardButton("✅ Publicar", callback_data=f"approve:{job_id}"),
-                InlineKeyboardButton("🔁 Otro", callback_data=f"another:{job_id}"),
-            ]
-        ])
+    next_cand = _pick_next_candidate(job)
+    if not next_cand:
+        js.transition(job_id, ("rendering",), "sent")
+        ctx.progress("⚠️ No hay más opciones alternativas definidas.")
+        print("Sin más candidatos para este job.")
+        return
 
+    print(f"Siguiente candidato: {next_cand.get('destination')} idx={job.get('current_index')}")
+
+    rendered_now = False
+    pre = (job.get("prerendered") or {}).get(str(job.get("current_index")))
+    if pre and Path(pre["video_path"]).exists():
+        # ⚡ Ya estaba renderizado en segundo plano
+        new_caption = pre["caption"]
+        new_video_path = Path(pre["video_path"])
+        new_hook = pre.get("video_hook")
+        variant_used = pre.get("variant")
+        bg_path = pre.get("bg_image_path")
+        print(f"Usando pre-render: {new_video_path}")
+    else:
+        ctx.progress("🎬 Generando el reel…")
         try:
-            with new_video_path.open("rb") as f:
-                # 1) Vídeo con botones, sin caption
-                context.bot.send_video(
-                    chat_id=query.message.chat_id,
-                    video=f,
-                    reply_markup=keyboard,
-                    supports_streaming=True,
-                )
-            
-            # 2) Caption en mensaje aparte
-            context.bot.send_message(
-                chat_id=query.message.chat_id,
-                text=new_caption,
+            new_caption, new_video_path, new_hook, variant_used, bg_path = _build_reel_for_candidate(
+                next_cand, job, out_path=review_video_path(job_id, job["current_index"])
             )
-            
-            print("Enviado nuevo candidato para revisión.")
         except Exception as e:
-            print(f"❌ Error enviando nuevo candidato: {e}")
-            query.message.reply_text(f"❌ Error enviando vídeo: {e}")
+            js.transition(job_id, ("rendering",), "sent")
+            ctx.progress(f"❌ Error generando el reel: {e}", reply_markup=_review_keyboard(job_id))
+            return
+        rendered_now = True
+        print(f"Nuevo video generado en: {new_video_path}")
+
+    # Si se canceló durante el render, el job en disco sigue en el candidato
+    # anterior: el MP4 recién generado no lo referencia nadie (los
+    # pre-renders se conservan hasta cerrar el job)
+    try:
+        ctx.check_cancelled()
+    except JobCancelled:
+        if rendered_now:
+            Path(new_video_path).unlink(missing_ok=True)
+        raise
+
+    job["variant"] = variant_used
+    job["video_hook"] = new_hook
+    job["bg_image_path"] = bg_path
+    job["encode_profile"] = "preview"
+
+    old_video_path = Path(job["video_path"])
+    job["caption"] = new_caption
+    job["video_path"] = new_video_path
+    job["video_hook"] = new_hook
+
+    _merge_prerendered(job_id, job)
+    save_job(job_id, job, state="sent")
+
+    # el render anterior de este job ya no se usa (los pre-renders, en
+    # PRERENDER_DIR, se conservan hasta cerrar el job)
+    if (
+        old_video_path != Path(new_video_path)
+        and old_video_path.parent == REVIEW_VIDEO_DIR
+        and old_video_path.name.startswith(f"{job_id}_")
+    ):
+        old_video_path.unlink(missing_ok=True)
+
+    # mantener pre-renderizados los siguientes PRERENDER_AHEAD
+    start_prerender(job_id)
+
+    keyboard = _review_keyboard(job_id)
+
+    try:
+        with new_video_path.open("rb") as f:
+            # 1) Vídeo con botones, sin caption
+            ctx.bot.send_video(
+                chat_id=ctx.chat_id,
+                video=f,
+                reply_markup=keyboard,
+                supports_streaming=True,
+            )
+        
+        # 2) Caption en mensaje aparte
+        ctx.bot.send_message(
+            chat_id=ctx.chat_id,
+            text=new_caption,
+        )
+        
+        print("Enviado nuevo candidato para revisión.")
+    except Exception as e:
+        print(f"❌ Error enviando nuevo candidato: {e}")
+        ctx.progress(f"❌ Error enviando vídeo: {e}")
 
 def _format_date_range(start, end) -> str:
     """Convierte fechas a 'YYYY-MM-DD – YYYY-MM-DD'."""
@@ -600,6 +1006,8 @@ def handle_text_query(update, context):
       - elige main candidate
       - genera reel + caption
       - registra job y lo envía a revisión
+
+    El trabajo pesado se ejecuta en EXECUTOR; el handler solo valida el texto.
     """
     raw_text = (update.message.text or "").strip()
     text_up = raw_text.upper()
@@ -622,36 +1030,58 @@ def handle_text_query(update, context):
     if not origin_iata:
         origin_iata = "PMI"  # cambia aquí si quieres otro default
 
-    update.message.reply_text(
+    EXECUTOR.submit(
+        f"query:{update.message.chat_id}:{update.message.message_id}",
+        _run_text_query,
+        origin_iata,
+        start,
+        end,
+        bot=context.bot,
+        chat_id=update.message.chat_id,
+    )
+
+
+def _run_text_query(ctx, origin_iata: str, start: date, end: date) -> None:
+    """Cuerpo de handle_text_query, ejecutado en EXECUTOR (cancelable)."""
+    ctx.progress(
         f"🔎 Buscando vuelos con salida desde {origin_iata}…\n"
-        f"Rango: {start} → {end}"
+        f"Rango: {start} → {end}",
+        reply_markup=_cancel_keyboard(ctx.key),
     )
 
     # 1) Buscar vuelos
     try:
         flights = ag.get_flights_in_period(start, end, origin_iata=origin_iata)
     except Exception as e:
-        update.message.reply_text(f"❌ Error obteniendo vuelos: {e}")
+        ctx.progress(f"❌ Error obteniendo vuelos: {e}")
         return
 
+    ctx.check_cancelled()
+
     if not flights:
-        update.message.reply_text(f"🔍 No se han encontrado vuelos entre {start} y {end}.")
+        ctx.progress(f"🔍 No se han encontrado vuelos entre {start} y {end}.")
         return
 
     # 2) Mejor por categoría
     try:
-        best_by_cat = ag.get_best_by_category_scored(
+        pool = ag.get_top_by_category_scored(
             flights,
             min_discount_pct=40.0,
+            top_k=REVIEW_POOL_PER_CATEGORY,
+        )
+        best_by_cat = ag.get_best_by_category_live(
+            flights,
+            min_discount_pct=40.0,
+            pool=pool,
         )
     except Exception as e:
-        update.message.reply_text(
+        ctx.progress(
             f"Se han encontrado {len(flights)} vuelos, pero ha fallado scoring: {e}"
         )
         return
 
     if not best_by_cat:
-        update.message.reply_text(
+        ctx.progress(
             f"✈️ Encontrados {len(flights)} vuelos, pero ninguno cumple el descuento mínimo."
         )
         return
@@ -660,7 +1090,7 @@ def handle_text_query(update, context):
     try:
         main_item = ag.choose_main_candidate_prob(best_by_cat)
     except Exception as e:
-        update.message.reply_text(f"❌ Error eligiendo candidato principal: {e}")
+        ctx.progress(f"❌ Error eligiendo candidato principal: {e}")
         return
 
     main_flight = main_item["flight"]
@@ -668,7 +1098,7 @@ def handle_text_query(update, context):
     main_cat_code = main_cat.get("code")
 
     # 4) Convertir a candidatos review-friendly
-    review_candidates = to_review_candidates(best_by_cat)
+    review_candidates = to_review_candidates(best_by_cat, pool=pool)
 
     # Reordenar para que el principal quede primero (evitar `is`)
     def _key_from_cand(c):
@@ -702,7 +1132,7 @@ def handle_text_query(update, context):
     # 5) Resolver cfg/market según origin_iata (PMI, BCN, MAD, VLC...)
     cfg = MARKETS.get(origin_iata)
     if not cfg:
-        update.message.reply_text(
+        ctx.progress(
             f"❌ Mercado/origen '{origin_iata}' no configurado en MARKETS.\n"
             f"Disponibles: {', '.join(MARKETS.keys())}"
         )
@@ -722,17 +1152,26 @@ def handle_text_query(update, context):
 
     # Validación temprana para que no llegue un job incompleto a aprobación
     if not tmp_job["ig_user_id"] or not tmp_job["page_token"]:
-        update.message.reply_text(
+        ctx.progress(
             f"❌ El market {cfg.code} no tiene ig_user_id/page_token.\n"
             f"Revisa tu .env y config/markets.py"
         )
         return
 
     # 6) Generar reel + caption para main_candidate usando el branding del market
-    new_caption, new_video_path, new_hook, variant_used = _build_reel_for_candidate(main_candidate, tmp_job)
+    ctx.check_cancelled()
+    ctx.progress("🎬 Generando reel y caption…")
+    job_id = str(uuid.uuid4())
+    new_caption, new_video_path, new_hook, variant_used, bg_path = _build_reel_for_candidate(
+        main_candidate, tmp_job, out_path=review_video_path(job_id, 0)
+    )
+
+    # Cancelado durante el render: no registramos el job
+    if ctx.cancelled:
+        Path(new_video_path).unlink(missing_ok=True)
+        ctx.check_cancelled()
 
     # 7) Registrar job completo y enviar a revisión
-    job_id = str(uuid.uuid4())
     register_job(
         job_id=job_id,
         caption=new_caption,
@@ -750,15 +1189,18 @@ def handle_text_query(update, context):
         web_key_prefix=tmp_job["web_key_prefix"],
         logo_path=tmp_job["logo_path"],
         ab_ratio_new=tmp_job["ab_ratio_new"],
+        encode_profile="preview",
+        bg_image_path=bg_path,
     )
     send_review_candidate(job_id)
+    start_prerender(job_id)
 
     # 7) Resumen
     dates_str = _format_date_range(main_candidate.get("start_date"), main_candidate.get("end_date"))
     price_val = main_candidate.get("price")
     price_str = f"{price_val:.2f} €" if price_val is not None else "N/D"
 
-    update.message.reply_text(
+    ctx.progress(
         f"✅ Generado y enviado a revisión.\n"
         f"Candidato principal:\n"
         f"  {main_cat.get('label', '')}\n"
@@ -773,7 +1215,7 @@ def run_bot():
     if not BOT_TOKEN:
         raise ValueError("Falta TELEGRAM_BOT_TOKEN en .env")
 
-    updater = Updater(BOT_TOKEN, use_context=True)
+    updater = Updater(BOT_TOKEN, use_context=True, workers=BOT_WORKERS)
     dp = updater.dispatcher
 
     dp.add_handler(CommandHandler("start", start))
@@ -782,10 +1224,27 @@ def run_bot():
     # 🔹 nuevo handler para mensajes "vuelo 10 180"
     dp.add_handler(MessageHandler(Filters.text & ~Filters.command, handle_text_query))
 
+    # Módulos perezosos cargados antes de que los usen varios hilos a la vez
+    preload(ag, rab)
+    candidate_builder.preload()
+
+    # Limpieza de jobs/vídeos abandonados: al arrancar y luego periódicamente
+    gc_jobs()
+    updater.job_queue.run_repeating(
+        lambda _ctx: gc_jobs(),
+        interval=JOB_GC_INTERVAL_SEC,
+        first=JOB_GC_INTERVAL_SEC,
+    )
+
     print("🤖 Bot de revisión escuchando (polling)…")
     updater.start_polling()
     updater.idle()
 
+    # Las acciones en curso (p.ej. una publicación) terminan antes de salir
+    print("⏳ Esperando a que terminen las acciones en curso…")
+    EXECUTOR.shutdown(wait=True)
+    shutdown_prerender()
+
 
 if __name__ == "__main__":
     run_bot()
@@ -148,6 +148,31 @@ def update_flights_json(
     - market: código de mercado ("PMI", "BCN"...).
     """
 
+    new_entry = _build_flight_entry(
+        main_item,
+        market=market,
+        reel_url=reel_url,
+        affiliate_url=affiliate_url,
+    )
+    return _write_entry_to_json(
+        new_entry,
+        json_path=json_path,
+        market=market,
+        max_entries=max_entries,
+        dedupe_by_id=dedupe_by_id,
+        dedupe_by_route_dates=dedupe_by_route_dates,
+    )
+
+
+def _write_entry_to_json(
+    new_entry: Dict[str, Any],
+    json_path: Path | str,
+    market: str,
+    max_entries: int = 10,
+    dedupe_by_id: bool = True,
+    dedupe_by_route_dates: bool = True,
+) -> Dict[str, Any]:
+    """Inserta new_entry al principio del JSON (con dedupe) y lo guarda."""
     json_path = Path(json_path)
     json_path.parent.mkdir(parents=True, exist_ok=True)
 
@@ -164,13 +189,6 @@ def update_flights_json(
     if not isinstance(flights, list):
         flights = []
 
-    new_entry = _build_flight_entry(
-        main_item,
-        market=market,
-        reel_url=reel_url,
-        affiliate_url=affiliate_url,
-    )
-
     new_id = new_entry["id"]
 
     if dedupe_by_id:
@@ -251,3 +269,51 @@ def update_market_web_jsons(
     )
 
     return {"flights": r1, "flights_of_the_day": r2}
+
+
+# ---------------------------------------------------------------------------
+# En dos fases (para publicar en paralelo con Instagram)
+# ---------------------------------------------------------------------------
+
+def prepare_market_web_update(
+    main_item: Dict[str, Any],
+    market: str,
+    web_root: str | Path = "web",
+    affiliate_url: Optional[str] = None,
+    max_entries: int = 10,
+) -> Dict[str, Any]:
+    """
+    Fase 1 (no depende del permalink): construye la entrada y resuelve
+    las rutas. No escribe nada, así que se puede descartar si IG falla.
+    """
+    out_dir = get_market_web_dir(market, web_root=web_root)
+    return {
+        "market": market,
+        "entry": _build_flight_entry(main_item, market=market, affiliate_url=affiliate_url),
+        "paths": {
+            "flights": out_dir / "flights.json",
+            "flights_of_the_day": out_dir / "flights_of_the_day.json",
+        },
+        "max_entries": max_entries,
+    }
+
+
+def apply_market_web_update(
+    prepared: Dict[str, Any],
+    reel_url: Optional[str] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Fase 2: rellena reel_url y escribe los dos JSON (releyéndolos ahora,
+    por si han cambiado mientras IG procesaba). Mismo resultado que
+    update_market_web_jsons.
+    """
+    entry = dict(prepared["entry"], reel_url=reel_url)
+    return {
+        name: _write_entry_to_json(
+            entry,
+            json_path=path,
+            market=prepared["market"],
+            max_entries=prepared["max_entries"],
+        )
+        for name, path in prepared["paths"].items()
+    }
@@ -1,18 +1,29 @@
 import json
-import boto3
+from functools import lru_cache
 
 from config.settings import AWS_ACCESS_KEY_ID,AWS_SECRET_ACCESS_KEY,AWS_REGION,S3_BUCKET
+import offline
+from offline.services import local_s3_put
 
-s3 = boto3.client(
-    "s3",
-    region_name=AWS_REGION,
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-)
+
+@lru_cache(maxsize=1)
+def _s3():
+    # boto3 tarda en importarse: solo cuando de verdad se sube algo
+    import boto3
+
+    return boto3.client(
+        "s3",
+        region_name=AWS_REGION,
+        aws_access_key_id=AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+    )
 
 def upload_flights_json(data: dict, key: str):
     body = json.dumps(data, ensure_ascii=False, indent=2)
-    s3.put_object(
+    if offline.is_offline():
+        local_s3_put(S3_BUCKET, key, body=body.encode("utf-8"))
+        return
+    _s3().put_object(
         Bucket=S3_BUCKET,
         Key=key,
         Body=body.encode("utf-8"),